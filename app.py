@@ -1,61 +1,152 @@
 import streamlit as st
-import pickle
 import numpy as np
-import websockets
-import json
 import asyncio
-
-# Load the trained model
-model = pickle.load(open('EE_model.pkl', 'rb'))
+import os
+import time
+from inference import CHANNELS, predict_batch
+from ingest import IngestService, predict_stream, streams_from_env
+from features import FeatureExtractor, BANDS
+from worker import BackgroundWorker, ResultStore
+from model_registry import get_model
+from patient_models import PatientModelStore, PATIENT_MODEL_DIR
+from history import result_records
+from encoding import SAMPLE_DTYPE
+from segment_log import SegmentLog
+import metrics
+
+# Load the trained model once per process (shared with the other pages, hot-swapped on change)
+get_model()
+
+# From the sample's server timestamp to its prediction being published
+END_TO_END = metrics.histogram("eeg_end_to_end_seconds", "Sample timestamp to published prediction")
 
 def risk_potability_prediction(input_data):
     """
     Predicts if the patient is affected by an epileptic seizure based on EEG sensor data.
     """
-    input_as_array = np.array(input_data).reshape(1, -1)  # Reshape to match model input
-    prediction = model.predict(input_as_array)[0]  # Predict the outcome
-    return prediction
+    prediction, _ = predict_batch(get_model(), input_data)  # A single sample is a batch of one
+    return prediction[0]
 
-async def fetch_and_predict(uri):
+async def fetch_and_predict(streams, store):
     """
-    Fetch data from the WebSocket continuously and make predictions in real-time.
+    Follow every patient's WebSocket stream concurrently and make predictions in real-time,
+    one vectorized model call for everything that arrived since the last one. Runs on the
+    background worker and publishes into the shared store until cancelled.
     """
+    # WS_COMPRESSION=none skips permessage-deflate, e.g. when the delta format is already small enough
+    service = IngestService(streams, compression=os.getenv("WS_COMPRESSION", "deflate"))
+    # EEG_FEATURES=1 adds the sliding-window feature stage (1 s windows every 250 ms at 256 Hz)
+    extractor = FeatureExtractor() if os.getenv("EEG_FEATURES") == "1" else None
+    # EEG_LOG_DIR keeps every received frame and prediction in an on-disk segment log
+    log_dir = os.getenv("EEG_LOG_DIR")
+    frame_log = SegmentLog(os.path.join(log_dir, "frames"), "frames") if log_dir else None
+    prediction_log = SegmentLog(os.path.join(log_dir, "predictions"), "predictions") if log_dir else None
+
+    def on_features(patient_id, timestamp, features):
+        # Latest statistical and band-power features per patient
+        store.publish_features(patient_id, features)
+
+    def on_result(patient_id, values, timestamps, predictions, probabilities, classes):
+        seizure_column = list(classes).index(0)  # Label 0 means seizure
+        latencies = np.where(timestamps > 0, (time.time_ns() - timestamps) / 1e9, np.nan)  # 0 means no timestamp
+        records = result_records(timestamps, predictions, probabilities[:, seizure_column], latencies)
+        END_TO_END.record_many(latencies * 1e9)
+        store.publish_results(patient_id, values[-1].tolist(), records)
+        if frame_log is not None:
+            frames = np.empty(len(values), dtype=SAMPLE_DTYPE)
+            frames["values"] = values
+            frames["timestamp"] = timestamps
+            frame_log.append(patient_id, frames)
+            prediction_log.append(patient_id, records)
+
+    ingest = asyncio.create_task(service.run())
+    # PATIENT_MODEL_DIR scores patients that have a <patient_id>.npz/.pkl there with their own model
+    models = PatientModelStore(PATIENT_MODEL_DIR) if PATIENT_MODEL_DIR else get_model
+    predict = asyncio.create_task(predict_stream(service.queue, models, on_result, extractor=extractor, on_features=on_features))
     try:
-        async with websockets.connect(uri) as websocket:
-            while True:
-                if not st.session_state.fetching_data:
-                    break
-
-                # Receive data from WebSocket
-                data = await websocket.recv()  
-                data = json.loads(data)  # Parse the JSON data
-
-                # Update EEG data in session state
-                for key in st.session_state.eeg_data.keys():
-                    st.session_state.eeg_data[key] = data.get(key, 0.0)
-
-                # Perform prediction
-                input_data = list(st.session_state.eeg_data.values())
-                prediction = risk_potability_prediction(input_data)
-                result = (
-                    f"**<span style='color:#FF4D4D;'>The Patient is affected by an Epileptic Seizure.</span>**"
-                    if prediction == 0
-                    else "**The Patient is not affected by an Epileptic Seizure.**"
-                )
-
-                # Append the prediction result to session state
-                st.session_state.prediction_results.insert(0, result)  # Add to the top of the list
-
-                # Sleep for 10 seconds before fetching new data
-                await asyncio.sleep(10)
+        while not predict.done():
+            store.publish_stats(service.stats, models.stats() if PATIENT_MODEL_DIR else None)
+            if frame_log is not None:
+                # Batched writes and fsyncs, off the event loop
+                await asyncio.to_thread(frame_log.flush)
+                await asyncio.to_thread(prediction_log.flush)
+            await asyncio.sleep(0.5)
+        predict.result()  # Surface a crashed predictor
+    except asyncio.CancelledError:
+        raise
     except Exception as e:
-        st.error(f"WebSocket connection error: {e}")
+        store.publish_error(f"Prediction error: {e}")
+    finally:
+        service.stop()
+        ingest.cancel()
+        predict.cancel()
+        if frame_log is not None:
+            frame_log.close()
+            prediction_log.close()
+
+@st.cache_resource
+def prediction_worker():
+    """
+    One ingestion/prediction worker per process, shared by every browser session and rerun.
+    """
+    return BackgroundWorker()
 
-def start_background_task(uri):
+@st.cache_resource
+def metrics_endpoint():
+    """
+    Starts the Prometheus endpoint once per process when METRICS_PORT is set.
+    """
+    return metrics.serve()
+
+@st.cache_resource
+def result_store():
+    # RESULT_SPILL_DIR keeps results older than the in-memory window on disk
+    return ResultStore(spill_dir=os.getenv("RESULT_SPILL_DIR"))
+
+def render_result(patient_id, record):
+    if record["prediction"] == 0:
+        return f"**<span style='color:#FF4D4D;'>Patient {patient_id}: The Patient is affected by an Epileptic Seizure.</span>**"
+    return f"**Patient {patient_id}: The Patient is not affected by an Epileptic Seizure.**"
+
+def render_stream_stats(patient_id, stats):
+    status = "connected" if stats["connected"] else "disconnected"
+    line = (f"Stream {patient_id}: {status}, {stats['samples']:,} samples, "
+            f"lag {stats['lag'] * 1e3:.0f} ms (max {stats['max_lag'] * 1e3:.0f} ms), {stats['reconnects']} reconnects")
+    if stats["last_error"]:
+        line += f", last error: {stats['last_error']}"
+    return line
+
+def render_features(patient_id, features):
+    # Band powers come last, channel by channel (see features.feature_names); shown averaged over channels
+    powers = features[-len(CHANNELS) * len(BANDS):].reshape(len(CHANNELS), len(BANDS)).mean(axis=0)
+    return f"Patient {patient_id} band power (last 1 s): " + ", ".join(
+        f"{band} {power:.2e}" for band, power in zip(BANDS, powers))
+
+@st.fragment(run_every=1)
+def live_results():
     """
-    Start the background task to fetch and predict data.
+    Re-renders only the live section once a second from the shared store; it never
+    connects or predicts itself.
     """
-    asyncio.run(fetch_and_predict(uri))
+    snapshot = result_store().snapshot(max_results=10)
+    if snapshot["error"]:
+        st.error(snapshot["error"])
+    for patient_id, stats in snapshot["stream_stats"].items():
+        st.caption(render_stream_stats(patient_id, stats))
+    for patient_id, sample in snapshot["latest_samples"].items():
+        st.caption(f"Patient {patient_id} latest sample: " + ", ".join(f"{value:.7f}" for value in sample))
+    for patient_id, features in snapshot["latest_features"].items():
+        st.caption(render_features(patient_id, features))
+    if snapshot["results"]:
+        for patient_id, records in snapshot["results"].items():  # The latest 10 predictions per patient, newest first
+            st.markdown(render_result(patient_id, records[0]), unsafe_allow_html=True)
+            st.caption(
+                f"Seizure probability {records['probability'][0]:.2f} "
+                f"(max {records['probability'].max():.2f} over the last {len(records)}), "
+                f"latency {records['latency'][0] * 1e3:.0f} ms"
+            )
+    else:
+        st.info("No predictions yet. Start fetching data to see results.")
 
 def main():
     """
@@ -84,17 +175,13 @@ def main():
             "# FP1-F7": 0.0, "C3-P3": 0.0, "P3-O1": 0.0, "P4-O2": 0.0,
             "P7-O1": 0.0, "P7-T7": 0.0, "T8-P8-0": 0.0, "T8-P8-1": 0.0
         }
-    if 'prediction_results' not in st.session_state:
-        st.session_state.prediction_results = []
-    if 'fetching_data' not in st.session_state:
-        st.session_state.fetching_data = False
 
     # Layout for EEG data
     st.subheader("Real-Time EEG Data (Adjustable)")
     st.markdown(
         """
         <p style="font-size:15px;">
-        You can adjust the EEG values manually for testing or allow real-time data fetching to update them automatically.
+        You can adjust the EEG values manually for testing; real-time samples appear with the predictions below.
         </p>
         """, unsafe_allow_html=True
     )
@@ -110,16 +197,22 @@ def main():
 
     # Start/Stop Data Fetching
     uri = "wss://167f-2401-4900-61bd-4a98-4c2-3a71-2634-8639.ngrok-free.app"
+    streams = streams_from_env(uri)  # EEG_STREAMS="patient1=wss://...,patient2=wss://..." monitors several patients
 
     st.markdown("---")
-    if st.session_state.fetching_data:
+    metrics_endpoint()
+    worker = prediction_worker()
+    if worker.running:
         if st.button("Stop Fetching Data"):
-            st.session_state.fetching_data = False
+            worker.stop()
+            st.rerun()
     else:
         if st.button("Start Fetching and Predicting"):
-            st.session_state.fetching_data = True
-            st.write("Fetching and predicting data in real-time...")
-            asyncio.create_task(start_background_task(uri))  # Start the async task
+            result_store().clear_error()  # Before the rerun, so a previous run's error isn't shown again
+            worker.start(fetch_and_predict, streams, result_store())  # Runs on the shared background worker
+            st.rerun()
+    if worker.running:
+        st.write("Fetching and predicting data in real-time...")
 
     # Display Prediction Results
     st.subheader("Prediction Results")
@@ -131,11 +224,7 @@ def main():
         </p>
         """, unsafe_allow_html=True
     )
-    if st.session_state.prediction_results:
-        for result in st.session_state.prediction_results[:10]:  # Show the latest 10 predictions
-            st.markdown(f"{result}", unsafe_allow_html=True)
-    else:
-        st.info("No predictions yet. Start fetching data to see results.")
+    live_results()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,108 @@
+"""
+Holds many local WebSocket clients on the shared broadcast stream and reports delivery.
+
+    python -m benchmarks.broadcast --clients 1000 --rate 256 --frame 32 --seconds 10
+"""
+import argparse
+import asyncio
+import multiprocessing
+import time
+import numpy as np
+import websockets
+from broadcast import Broadcaster
+from encoding import select_subprotocol, BINARY_PROTOCOL, JSON_PROTOCOL
+from replay import ReplaySettings
+from benchmarks.common import synthetic_samples
+
+def run_clients(port, protocol, compression, n_clients, seconds, results):
+    async def reader(ws, counts, i):
+        try:
+            async for _ in ws:
+                counts[i] += 1
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+    async def run():
+        # Connect everyone first, so the measured window is steady state rather than handshakes
+        counts = [0] * n_clients
+        connections, readers = [], []
+        for i in range(n_clients):
+            ws = await websockets.connect(f"ws://127.0.0.1:{port}", subprotocols=[protocol], max_queue=None, compression=compression)
+            connections.append(ws)
+            readers.append(asyncio.create_task(reader(ws, counts, i)))
+        await asyncio.sleep(1)
+        before = list(counts)
+        await asyncio.sleep(seconds)
+        received = [after - start for after, start in zip(counts, before)]
+        for ws in connections:
+            await ws.close()
+        await asyncio.gather(*readers)
+        return received
+    results.extend(asyncio.run(run()))
+
+async def serve(args):
+    settings = ReplaySettings(rate_hz=args.rate, speed=args.speed, samples_per_frame=args.frame)
+    data = synthetic_samples(args.frame * 1024)
+    frames = lambda: (data[i:i + args.frame] for i in range(0, len(data), args.frame))
+    broadcaster = Broadcaster(queue_size=args.queue)
+
+    async def handler(websocket):
+        subscription = broadcaster.subscribe(websocket.subprotocol == BINARY_PROTOCOL)
+        try:
+            while (frame := await subscription.get()) is not None:
+                await websocket.send(frame)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+    compression = None if args.compression == "none" else args.compression
+    async with websockets.serve(handler, "127.0.0.1", 0, select_subprotocol=select_subprotocol, compression=compression, backlog=4096) as server:
+        port = server.sockets[0].getsockname()[1]
+        producer = asyncio.create_task(broadcaster.run(frames, settings))
+        manager = multiprocessing.Manager()
+        results = manager.list()
+        per_process = -(-args.clients // args.processes)
+        processes = [
+            multiprocessing.Process(target=run_clients, args=(port, args.protocol, compression, min(per_process, args.clients - i * per_process), args.seconds, results))
+            for i in range(args.processes)
+        ]
+        for process in processes:
+            process.start()
+        # Measure server CPU only once every client is subscribed, i.e. steady-state fan-out
+        while len(broadcaster.subscribers) < args.clients:
+            await asyncio.sleep(0.05)
+        cpu, start = time.process_time(), time.monotonic()
+        await asyncio.sleep(args.seconds)
+        cpu = (time.process_time() - cpu) / (time.monotonic() - start)
+        await asyncio.to_thread(lambda: [process.join() for process in processes])
+        dropped = broadcaster.total_dropped
+        producer.cancel()
+        broadcaster.close()
+    return list(results), cpu, dropped, broadcaster.clock.lag()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--processes", type=int, default=4, help="client processes")
+    parser.add_argument("--rate", type=float, default=256)
+    parser.add_argument("--speed", type=float, default=1)
+    parser.add_argument("--frame", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--queue", type=int, default=64)
+    parser.add_argument("--compression", choices=["deflate", "none"], default="none",
+                        help="per-connection permessage-deflate defeats encode-once fan-out")
+    parser.add_argument("--protocol", choices=[JSON_PROTOCOL, BINARY_PROTOCOL], default=BINARY_PROTOCOL)
+    args = parser.parse_args()
+
+    received, cpu, dropped, lag = asyncio.run(serve(args))
+    expected = args.seconds * args.rate * args.speed / args.frame
+    received = np.array(received)
+    print(f"clients connected : {len(received)}")
+    print(f"frames per client : median {np.median(received):.0f}, min {received.min()} (expected ~{expected:.0f})")
+    print(f"messages delivered: {received.sum() / args.seconds:,.0f} msgs/sec")
+    print(f"server CPU        : {cpu * 100:.0f}% of a core ({cpu / len(received) * 1e6:.0f} us/s per client), producer lag {lag * 1e3:.1f} ms")
+    print(f"frames dropped    : {dropped}")
+
+if __name__ == "__main__":
+    main()
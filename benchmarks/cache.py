@@ -0,0 +1,41 @@
+"""
+Compares cold-start time of parsing the EEG CSV against mapping the binary cache.
+
+    python -m benchmarks.cache --rows 5000000
+"""
+import argparse
+import os
+import tempfile
+import numpy as np
+from dataset import build_cache, load_cache, iter_chunks
+from benchmarks.common import write_synthetic_csv, Timer
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--csv", help="Existing CSV to measure instead of generating one")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.csv or os.path.join(tmp, "synthetic.csv")
+        if not args.csv:
+            write_synthetic_csv(path, args.rows)
+
+        with Timer() as parse:
+            rows = sum(len(block) for block in iter_chunks(path))
+        with Timer() as build:
+            build_cache(path)
+        with Timer() as start:
+            data = load_cache(path)
+            first = np.asarray(data[:256])  # what a client needs before its first frame
+        with Timer() as scan:
+            checksum = float(np.asarray(data, dtype=np.float64).sum())
+
+        print(f"rows                  : {rows:,}")
+        print(f"parse CSV             : {parse.seconds * 1e3:10.1f} ms")
+        print(f"build cache (one-off) : {build.seconds * 1e3:10.1f} ms")
+        print(f"map cache + 1st frame : {start.seconds * 1e3:10.3f} ms")
+        print(f"full scan of mapping  : {scan.seconds * 1e3:10.1f} ms  (checksum {checksum:.6g}, first {first.shape})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import time
+import numpy as np
+
+# Per-channel value ranges, taken from the input bounds on the Prediction page
+CHANNEL_MIN = np.array([-0.0000811, -0.0000119, -0.00000449, 0.0000174, 0.00000567, -0.000067, -0.000179145, -0.000179145])
+CHANNEL_MAX = np.array([0.000174457, 0.0000584, 0.000126789, 0.000163907, 0.000145934, 0.0000127, 0.000115067, 0.000115067])
+
+def synthetic_samples(n_rows, seed=0):
+    """
+    Generates an (n_rows, 8) float32 block of EEG-like values inside the real channel ranges.
+    """
+    rng = np.random.default_rng(seed)
+    return rng.uniform(CHANNEL_MIN, CHANNEL_MAX, size=(n_rows, len(CHANNEL_MIN))).astype(np.float32)
+
+def rate(n, seconds):
+    return n / seconds if seconds > 0 else float("inf")
+
+class Timer:
+    """
+    Context manager that records the elapsed wall-clock time in .seconds.
+    """
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self.start
+
+def write_synthetic_csv(path, n_rows, chunk_rows=1_000_000, seed=0):
+    """
+    Writes a CHB-MIT-shaped CSV (8 channel columns plus Outcome) in chunks, so multi-GB
+    files can be produced without holding them in memory.
+    """
+    import pandas as pd
+    from inference import CHANNELS
+
+    rng = np.random.default_rng(seed)
+    with open(path, "w", newline="") as f:
+        for start in range(0, n_rows, chunk_rows):
+            rows = min(chunk_rows, n_rows - start)
+            frame = pd.DataFrame(synthetic_samples(rows, seed=seed + start).astype(np.float64), columns=CHANNELS)
+            frame["Outcome"] = rng.integers(0, 2, rows)
+            frame.to_csv(f, header=start == 0, index=False, float_format="%.15f")
@@ -0,0 +1,90 @@
+"""
+Bytes per sample, bytes/sec at the replay rate and client decode throughput for the JSON,
+binary and quantized delta wire formats, with and without permessage-deflate, plus the
+delta format's worst reconstruction error against its bound.
+
+    python -m benchmarks.delta --rows 100000 --frame 32
+"""
+import argparse
+import zlib
+import numpy as np
+from encoding import (JSON_PROTOCOL, BINARY_PROTOCOL, DELTA_PROTOCOL, DeltaEncoder, DeltaDecoder,
+                      encode_json_prefixes, encode_json_frame, encode_binary, decode_message, sample_timestamps)
+from benchmarks.common import synthetic_samples, rate, Timer, CHANNEL_MIN, CHANNEL_MAX
+
+def smooth_samples(n_rows, rate_hz, seed=0):
+    """
+    EEG-like block: a few sinusoids per channel plus a slow random walk and a little noise,
+    inside the real channel ranges. Neighbouring samples are close, as in a real recording.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(n_rows)[:, None] / rate_hz
+    signal = np.zeros((n_rows, len(CHANNEL_MIN)))
+    for hz in (2.0, 6.0, 10.0, 21.0):
+        signal += rng.uniform(0.2, 1.0, len(CHANNEL_MIN)) * np.sin(2 * np.pi * hz * t + rng.uniform(0, 2 * np.pi, len(CHANNEL_MIN)))
+    signal += np.cumsum(rng.normal(0, 0.02, signal.shape), axis=0) + rng.normal(0, 0.05, signal.shape)
+    signal = (signal - signal.min(axis=0)) / np.ptp(signal, axis=0)
+    return (CHANNEL_MIN + signal * (CHANNEL_MAX - CHANNEL_MIN)).astype(np.float32)
+
+def encode_stream(block, protocol, frame_rows, period_ns):
+    """
+    Encodes the block the way server.iter_frames does; returns the list of messages.
+    """
+    messages = []
+    prefixes = encode_json_prefixes(block) if protocol == JSON_PROTOCOL else None
+    encoder = DeltaEncoder(block.min(axis=0), block.max(axis=0)) if protocol == DELTA_PROTOCOL else None
+    for start in range(0, len(block), frame_rows):
+        frame = block[start:start + frame_rows]
+        timestamps = sample_timestamps(len(frame), period_ns)
+        if protocol == BINARY_PROTOCOL:
+            messages.append(encode_binary(frame, timestamps))
+        elif protocol == DELTA_PROTOCOL:
+            messages.append(encoder.encode(frame, timestamps))
+        else:
+            messages.append(encode_json_frame(prefixes[start:start + frame_rows], timestamps))
+    return messages, encoder
+
+def deflated_bytes(messages):
+    # permessage-deflate with context takeover: one raw deflate stream, flushed per message
+    compressor = zlib.compressobj(wbits=-15)
+    total = 0
+    for message in messages:
+        data = message.encode() if isinstance(message, str) else message
+        total += len(compressor.compress(data)) + len(compressor.flush(zlib.Z_SYNC_FLUSH)) - 4
+    return total
+
+def decode_stream(messages, protocol):
+    if protocol == DELTA_PROTOCOL:
+        decode = DeltaDecoder().decode
+        return [decode(message) for message in messages]
+    return [decode_message(message) for message in messages]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--frame", type=int, default=32, help="samples per frame")
+    parser.add_argument("--rate", type=float, default=256.0, help="replay rate in Hz, for bytes/sec")
+    args = parser.parse_args()
+    period_ns = int(1e9 / args.rate)
+
+    for name, block in [("uniform random", synthetic_samples(args.rows)), ("smooth EEG-like", smooth_samples(args.rows, args.rate))]:
+        print(f"{name}, {args.rows:,} samples, {args.frame} samples/frame:")
+        json_bytes = None
+        for protocol in (JSON_PROTOCOL, BINARY_PROTOCOL, DELTA_PROTOCOL):
+            messages, encoder = encode_stream(block, protocol, args.frame, period_ns)
+            raw = sum(len(m.encode()) if isinstance(m, str) else len(m) for m in messages)
+            deflated = deflated_bytes(messages)
+            json_bytes = json_bytes or raw
+            with Timer() as t:
+                decoded = decode_stream(messages, protocol)
+            line = (f"  {protocol:10s}: {raw / args.rows:6.1f} B/sample ({raw / args.rows * args.rate / 1024:6.1f} KiB/s), "
+                    f"deflate {deflated / args.rows:6.1f} B/sample ({deflated / args.rows * args.rate / 1024:6.1f} KiB/s), "
+                    f"{json_bytes / raw:5.1f}x smaller than JSON; decode {rate(args.rows, t.seconds):12,.0f} samples/s")
+            if encoder is not None:
+                values = np.concatenate([v for v, _ in decoded])
+                error = np.abs(values.astype(np.float64) - block).max(axis=0)
+                line += f"; max error {(error / encoder.max_error).max():.3f} of bound"
+            print(line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Measures messages/sec and server CPU per message for the JSON and binary wire formats.
+
+    python -m benchmarks.encoding --rows 50000 --clients 4
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import time
+import pandas as pd
+import websockets
+from inference import CHANNELS
+from encoding import SUBPROTOCOLS, JSON_PROTOCOL, BINARY_PROTOCOL, encode_json_prefixes, finish_json, encode_binary
+from benchmarks.common import synthetic_samples, rate, Timer
+
+def encode_iterrows(block):
+    # The original eeg_handler loop, minus the print and the sleep
+    frame = pd.DataFrame(block.astype(float), columns=CHANNELS)
+    for _, row in frame.iterrows():
+        eeg_values = {channel: row.get(channel, 0.0) for channel in CHANNELS}
+        eeg_values["timestamp"] = str(pd.Timestamp.now())
+        json.dumps(eeg_values)
+
+def encode_bulk_json(block):
+    for prefix in encode_json_prefixes(block):
+        finish_json(prefix)
+
+def encode_bulk_binary(block):
+    for i in range(len(block)):
+        encode_binary(block[i:i + 1])
+
+def run_clients(port, protocol, n_clients, expected):
+    async def client():
+        async with websockets.connect(f"ws://127.0.0.1:{port}", subprotocols=[protocol], max_queue=None) as ws:
+            for _ in range(expected):
+                await ws.recv()
+
+    async def run():
+        await asyncio.gather(*(client() for _ in range(n_clients)))
+    asyncio.run(run())
+
+async def serve_block(block, protocol, n_clients):
+    """
+    Streams the block to n_clients (in a separate process) as fast as possible; returns
+    (seconds, server CPU seconds).
+    """
+    async def handler(websocket):
+        if websocket.subprotocol == BINARY_PROTOCOL:
+            for i in range(len(block)):
+                await websocket.send(encode_binary(block[i:i + 1]))
+        else:
+            for prefix in encode_json_prefixes(block):
+                await websocket.send(finish_json(prefix))
+
+    async with websockets.serve(handler, "127.0.0.1", 0, subprotocols=SUBPROTOCOLS) as server:
+        port = server.sockets[0].getsockname()[1]
+        clients = multiprocessing.Process(target=run_clients, args=(port, protocol, n_clients, len(block)))
+        cpu = time.process_time()
+        start = time.perf_counter()
+        clients.start()
+        await asyncio.to_thread(clients.join)
+        return time.perf_counter() - start, time.process_time() - cpu
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--clients", type=int, default=4)
+    args = parser.parse_args()
+    block = synthetic_samples(args.rows)
+
+    print("encode only:")
+    for name, encode in [("iterrows + json.dumps", encode_iterrows), ("bulk json", encode_bulk_json), ("binary", encode_bulk_binary)]:
+        with Timer() as t:
+            encode(block)
+        print(f"  {name:22s}: {rate(len(block), t.seconds):12,.0f} msgs/sec")
+
+    print(f"loopback, {args.clients} clients:")
+    for protocol in (JSON_PROTOCOL, BINARY_PROTOCOL):
+        seconds, cpu = asyncio.run(serve_block(block, protocol, args.clients))
+        messages = len(block) * args.clients
+        print(f"  {protocol:12s}: {rate(messages, seconds):12,.0f} msgs/sec  "
+              f"server CPU {cpu / messages * 1e6:6.1f} us/msg  ({cpu / args.clients:.2f}s CPU per client)")
+
+if __name__ == "__main__":
+    main()
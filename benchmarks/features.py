@@ -0,0 +1,38 @@
+"""
+Throughput of the sliding-window feature stage, in samples/sec on one core.
+
+    python -m benchmarks.features --streams 100 --window 256 --hop 64 --frame 32
+"""
+import argparse
+import numpy as np
+from features import FeatureExtractor
+from benchmarks.common import synthetic_samples, rate, Timer
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--streams", type=int, default=100)
+    parser.add_argument("--window", type=int, default=256)
+    parser.add_argument("--hop", type=int, default=64)
+    parser.add_argument("--frame", type=int, default=32, help="samples per stream per batch")
+    parser.add_argument("--seconds-of-eeg", type=float, default=30, help="per stream, at 256 Hz")
+    args = parser.parse_args()
+
+    extractor = FeatureExtractor(window=args.window, hop=args.hop)
+    n_samples = int(args.seconds_of_eeg * 256)
+    data = synthetic_samples(n_samples).astype(np.float64)
+    timestamps = np.arange(n_samples, dtype=np.int64)
+
+    windows = 0
+    with Timer() as t:
+        for start in range(0, n_samples, args.frame):
+            # One drained batch: the next frame from every stream
+            batch = [(stream, data[start:start + args.frame], timestamps[start:start + args.frame]) for stream in range(args.streams)]
+            windows += len(extractor.push(batch)[0])
+
+    total = n_samples * args.streams
+    print(f"{args.streams} streams, window {args.window}, hop {args.hop}, {args.frame}-sample frames")
+    print(f"throughput : {rate(total, t.seconds):12,.0f} samples/sec/core")
+    print(f"windows    : {rate(windows, t.seconds):12,.0f} windows/sec ({windows} total)")
+
+if __name__ == "__main__":
+    main()
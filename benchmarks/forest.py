@@ -0,0 +1,52 @@
+"""
+Compares per-batch latency of the flat NumPy forest against sklearn, plus import cost.
+
+    python forest.py export EE_model.pkl EE_model.npz
+    python -m benchmarks.forest --flat EE_model.npz
+"""
+import argparse
+import pickle
+import subprocess
+import sys
+import warnings
+from forest import FlatForest
+from benchmarks.common import synthetic_samples, Timer
+
+def import_seconds(statement):
+    """
+    Times a statement in a fresh interpreter, so module caches don't hide import cost.
+    """
+    with Timer() as t:
+        subprocess.run([sys.executable, "-W", "ignore", "-c", statement], check=True)
+    return t.seconds
+
+def batch_latency(model, X, repeats):
+    with Timer() as t:
+        for _ in range(repeats):
+            model.predict_proba(X)
+    return t.seconds / repeats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="EE_model.pkl")
+    parser.add_argument("--flat", default="EE_model.npz")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 16, 256, 1024, 8192])
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+    sklearn_load = import_seconds(f"import pickle; pickle.load(open({args.model!r}, 'rb'))")
+    flat_load = import_seconds(f"from forest import FlatForest; FlatForest.load({args.flat!r})")
+    print(f"load sklearn pickle : {sklearn_load:.3f}s")
+    print(f"load flat forest    : {flat_load:.3f}s")
+
+    model = pickle.load(open(args.model, "rb"))
+    flat = FlatForest.load(args.flat)
+    for batch_size in args.batch_sizes:
+        X = synthetic_samples(batch_size)
+        repeats = max(3, 20_000 // batch_size)
+        sk = batch_latency(model, X, min(repeats, 50))
+        fl = batch_latency(flat, X, repeats)
+        print(f"batch {batch_size:6d}: sklearn {sk * 1e3:9.2f} ms   flat {fl * 1e3:9.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Cost of keeping the prediction history: prepending HTML strings to a list (the old
+session_state approach) against the per-patient ring buffer of compact records.
+
+    python -m benchmarks.history --results 1000000 --capacity 10000
+"""
+import argparse
+import os
+import tempfile
+import tracemalloc
+import numpy as np
+from history import RingBuffer, result_records
+from benchmarks.common import rate, Timer
+
+def list_baseline(n):
+    results = []
+    for i in range(n):
+        results.insert(0, f"**Patient 0: The Patient is not affected by an Epileptic Seizure.** {i}")
+    return results
+
+def records(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return result_records(np.arange(n, dtype=np.int64), rng.integers(0, 2, n), rng.random(n), rng.random(n) / 100)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--results", type=int, default=1_000_000)
+    parser.add_argument("--capacity", type=int, default=10_000)
+    parser.add_argument("--block", type=int, default=256, help="records per extend() call")
+    parser.add_argument("--list-max", type=int, default=100_000, help="largest run for the list baseline")
+    args = parser.parse_args()
+
+    n_list = min(args.results, args.list_max)
+    tracemalloc.start()
+    with Timer() as t:
+        kept = list_baseline(n_list)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"list.insert(0)    {rate(n_list, t.seconds):>12,.0f} results/s   {peak / 2**20:8.1f} MB for {len(kept):,} results")
+    del kept
+
+    data = records(args.results)
+    buffer = RingBuffer(args.capacity)
+    with Timer() as t:
+        for row in data[:n_list]:
+            buffer.append(*row.item())
+    print(f"ring append       {rate(n_list, t.seconds):>12,.0f} results/s   {buffer.records.nbytes / 2**20:8.1f} MB for {len(buffer):,} results")
+
+    buffer = RingBuffer(args.capacity)
+    with Timer() as t:
+        for start in range(0, args.results, args.block):
+            buffer.extend(data[start:start + args.block])
+    print(f"ring extend({args.block})  {rate(args.results, t.seconds):>12,.0f} results/s")
+
+    with Timer() as t:
+        for _ in range(10_000):
+            buffer.latest(10)
+    print(f"latest(10)        {t.seconds / 10_000 * 1e6:12.2f} us")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        buffer = RingBuffer(args.capacity, spill_path=os.path.join(tmp, "0.results"))
+        with Timer() as t:
+            for start in range(0, args.results, args.block):
+                buffer.extend(data[start:start + args.block])
+        spilled = buffer.read_spilled()
+        assert len(spilled) + len(buffer) == args.results
+        assert (np.concatenate([spilled, buffer.oldest(len(buffer))]) == data).all()
+        print(f"ring extend+spill {rate(args.results, t.seconds):>12,.0f} results/s   {len(spilled):,} records spilled")
+
+if __name__ == "__main__":
+    main()
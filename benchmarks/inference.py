@@ -0,0 +1,75 @@
+"""
+Compares samples/sec for the one-row-per-call path against batched inference.
+
+    python -m benchmarks.inference --rows 200000 --single-rows 2000
+"""
+import argparse
+import asyncio
+import pickle
+import warnings
+import numpy as np
+from inference import predict_batch
+from ingest import predict_stream
+from benchmarks.common import synthetic_samples, rate, Timer
+
+def bench_single(model, X):
+    with Timer() as t:
+        for row in X:
+            model.predict(np.array(row).reshape(1, -1))[0]
+    return rate(len(X), t.seconds)
+
+def bench_batched(model, X, batch_size):
+    with Timer() as t:
+        for start in range(0, len(X), batch_size):
+            predict_batch(model, X[start:start + batch_size])
+    return rate(len(X), t.seconds)
+
+def bench_micro_batched(model, X, n_streams, block_rows, batch_size):
+    async def stream(queue, patient_id, blocks):
+        for block in blocks:
+            await queue.put((patient_id, block, np.zeros(len(block), dtype=np.int64)))
+            await asyncio.sleep(0)  # Interleave the streams, as their sockets would
+
+    async def run():
+        queue = asyncio.Queue()
+        done = asyncio.Event()
+        predicted = {"rows": 0}
+
+        def on_result(patient_id, values, timestamps, predictions, probabilities, classes):
+            predicted["rows"] += len(predictions)
+            if predicted["rows"] == len(X):
+                done.set()
+
+        blocks = [X[i:i + block_rows] for i in range(0, len(X), block_rows)]
+        predictor = asyncio.create_task(predict_stream(queue, model, on_result, max_rows=batch_size, max_delay=0.005))
+        await asyncio.gather(*(stream(queue, s, blocks[s::n_streams]) for s in range(n_streams)))
+        await done.wait()
+        predictor.cancel()
+
+    with Timer() as t:
+        asyncio.run(run())
+    return rate(len(X), t.seconds)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="EE_model.pkl")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--single-rows", type=int, default=2_000)
+    parser.add_argument("--batch-size", type=int, default=8192)
+    parser.add_argument("--streams", type=int, default=100)
+    parser.add_argument("--block-rows", type=int, default=256)
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")  # sklearn feature-name / version warnings
+    model = pickle.load(open(args.model, "rb"))
+    X = synthetic_samples(args.rows)
+
+    single = bench_single(model, X[:args.single_rows])
+    batched = bench_batched(model, X, args.batch_size)
+    micro = bench_micro_batched(model, X, args.streams, args.block_rows, args.batch_size)
+    print(f"single-row   : {single:12,.0f} samples/sec")
+    print(f"batched      : {batched:12,.0f} samples/sec  ({batched / single:.0f}x)")
+    print(f"micro-batched: {micro:12,.0f} samples/sec  ({args.streams} streams x {args.block_rows}-row blocks)")
+
+if __name__ == "__main__":
+    main()
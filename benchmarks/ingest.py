@@ -0,0 +1,103 @@
+"""
+Runs the multi-stream ingestion service against local simulated patient streams and
+reports throughput and per-stream lag.
+
+    python -m benchmarks.ingest --streams 100 --rate 256 --frame 32 --seconds 10
+"""
+import argparse
+import asyncio
+import multiprocessing
+import pickle
+import time
+import warnings
+import numpy as np
+import websockets
+from forest import FlatForest
+from encoding import select_subprotocol, encode_frame, sample_timestamps, JSON_PROTOCOL
+from ingest import IngestService, predict_stream
+from replay import ReplayClock
+from benchmarks.common import synthetic_samples
+
+def run_server(port, rate, frame, ready):
+    """
+    Simulated upstream: every connection streams synthetic EEG at `rate` Hz in `frame`-sample frames.
+    """
+    data = synthetic_samples(frame * 256)
+    period_ns = int(1e9 / rate)
+
+    async def handler(websocket):
+        protocol = websocket.subprotocol or JSON_PROTOCOL  # The delta format, as the ingest service prefers it
+        clock = ReplayClock(frame / rate)
+        try:
+            for i in range(10**9):
+                await clock.wait()
+                start = (i * frame) % len(data)
+                block = data[start:start + frame]
+                await websocket.send(encode_frame(block, protocol, sample_timestamps(len(block), period_ns)))
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+    async def serve():
+        async with websockets.serve(handler, "127.0.0.1", port, select_subprotocol=select_subprotocol, compression=None):
+            ready.set()
+            await asyncio.Future()
+    asyncio.run(serve())
+
+async def ingest(args, port):
+    model = pickle.load(open(args.model, "rb")) if args.model.endswith(".pkl") else FlatForest.load(args.model)
+    streams = {f"p{i:03d}": f"ws://127.0.0.1:{port}/{i}" for i in range(args.streams)}
+    service = IngestService(streams)
+    predicted = {"rows": 0}
+
+    def on_result(patient_id, values, timestamps, predictions, probabilities, classes):
+        predicted["rows"] += len(predictions)
+
+    tasks = [asyncio.create_task(service.run()), asyncio.create_task(predict_stream(service.queue, model, on_result))]
+    while sum(stats.connected for stats in service.stats.values()) < args.streams:
+        await asyncio.sleep(0.1)
+    await asyncio.sleep(1)
+    for stats in service.stats.values():
+        stats.max_lag = 0.0
+    rows, cpu, start = predicted["rows"], time.process_time(), time.monotonic()
+
+    lags = []
+    while time.monotonic() - start < args.seconds:
+        await asyncio.sleep(0.25)
+        lags.extend(stats.lag for stats in service.stats.values())
+    elapsed = time.monotonic() - start
+    rows, cpu = predicted["rows"] - rows, time.process_time() - cpu
+
+    service.stop()
+    for task in tasks:
+        task.cancel()
+    return rows / elapsed, cpu / elapsed, np.array(lags), service
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--streams", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=256)
+    parser.add_argument("--frame", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--model", default="EE_model.pkl", help=".pkl, or an exported .npz flat forest")
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+
+    ready = multiprocessing.Event()
+    server = multiprocessing.Process(target=run_server, args=(args.port, args.rate, args.frame, ready), daemon=True)
+    server.start()
+    ready.wait()
+    try:
+        throughput, cpu, lags, service = asyncio.run(ingest(args, args.port))
+    finally:
+        server.terminate()
+
+    max_lags = np.array([stats.max_lag for stats in service.stats.values()])
+    print(f"streams           : {args.streams} x {args.rate:g} Hz (target {args.streams * args.rate:,.0f} samples/sec)")
+    print(f"predicted         : {throughput:,.0f} samples/sec")
+    print(f"ingest CPU        : {cpu * 100:.0f}% of a core")
+    print(f"lag (all streams) : p50 {np.percentile(lags, 50) * 1e3:.1f} ms, p99 {np.percentile(lags, 99) * 1e3:.1f} ms")
+    print(f"worst stream lag  : {max_lags.max() * 1e3:.1f} ms, reconnects {sum(s.reconnects for s in service.stats.values())}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Measures peak RSS of loading the EEG CSV whole versus streaming it in chunks.
+
+    python -m benchmarks.loader --rows 30000000   # ~5 GB CSV
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from benchmarks.common import write_synthetic_csv, Timer
+
+STRATEGIES = {
+    "read_csv": "import pandas as pd; pd.read_csv(PATH)",
+    "iter_chunks": "from dataset import iter_chunks\nfor block in iter_chunks(PATH): pass",
+}
+
+def measure(statement, path):
+    """
+    Runs one loading strategy in a fresh process; returns (seconds, peak RSS in MB).
+    """
+    # VmHWM is reset on exec, unlike ru_maxrss which can inherit the parent's peak
+    script = f"PATH = {path!r}\n{statement}\nprint(open('/proc/self/status').read().split('VmHWM:')[1].split()[0])"
+    with Timer() as t:
+        output = subprocess.run([sys.executable, "-c", script], check=True, capture_output=True, text=True).stdout
+    return t.seconds, int(output.split()[-1]) / 1024  # VmHWM is in kB
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--csv", help="Existing CSV to measure instead of generating one")
+    parser.add_argument("--skip-full", action="store_true", help="Don't run the whole-file read_csv baseline")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.csv or os.path.join(tmp, "synthetic.csv")
+        if not args.csv:
+            write_synthetic_csv(path, args.rows)
+        print(f"CSV size: {os.path.getsize(path) / 2**20:,.0f} MB")
+        for name, statement in STRATEGIES.items():
+            if name == "read_csv" and args.skip_full:
+                continue
+            seconds, peak_mb = measure(statement, path)
+            print(f"{name:12s}: {seconds:7.1f}s  peak RSS {peak_mb:8,.0f} MB")
+
+if __name__ == "__main__":
+    main()
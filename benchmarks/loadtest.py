@@ -0,0 +1,305 @@
+"""
+End-to-end load test: starts server.py locally on a synthetic dataset, drives N concurrent
+patient streams through app.fetch_and_predict (decode, features, predict, publish) and
+reports sustained throughput, end-to-end latency percentiles, CPU and RSS of both sides,
+plus micro-benchmarks of the CSV load, serialization and inference paths.
+
+    python -m benchmarks.loadtest --clients 50 --rate 256 --seconds 20 --json results.json
+    python -m benchmarks.loadtest --clients 50 --json new.json --baseline results.json
+
+With --baseline, exits non-zero when any tracked figure regressed by more than --tolerance.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+import numpy as np
+from benchmarks.common import synthetic_samples, write_synthetic_csv, rate, Timer
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (section, key, True if higher is better) of every figure compared against a baseline
+TRACKED = [
+    ("pipeline", "samples_per_second", True),
+    ("pipeline", "latency_p50_ms", False),
+    ("pipeline", "latency_p99_ms", False),
+    ("pipeline", "client_cpu_percent", False),
+    ("pipeline", "server_cpu_percent", False),
+    ("micro", "csv_rows_per_second", True),
+    ("micro", "cache_map_ms", False),
+    ("micro", "encode_binary_rows_per_second", True),
+    ("micro", "encode_json_rows_per_second", True),
+    ("micro", "decode_binary_rows_per_second", True),
+    ("micro", "decode_json_rows_per_second", True),
+    ("micro", "predict_rows_per_second", True),
+    ("micro", "predict_single_ms", False),
+]
+
+def proc_cpu_seconds(pid):
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+def proc_memory_mb(pid="self"):
+    with open(f"/proc/{pid}/status") as f:
+        status = f.read()
+    field = lambda name: int(status.split(name + ":")[1].split()[0]) / 1024
+    return field("VmRSS"), field("VmHWM")
+
+def write_dataset(directory, rows, channels):
+    """
+    Writes the synthetic CSV where server.py expects it, keeping only the first `channels` channels.
+    """
+    import pandas as pd
+    from inference import CHANNELS
+
+    path = os.path.join(directory, "datasets", "chbmit_preprocessed_data.csv")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_synthetic_csv(path, rows)
+    if channels < len(CHANNELS):
+        frame = pd.read_csv(path)
+        frame.drop(columns=CHANNELS[channels:]).to_csv(path, index=False, float_format="%.15f")
+    return path
+
+def start_server(directory, port, args):
+    env = dict(os.environ, PORT=str(port), HOST="127.0.0.1", REPLAY_RATE_HZ=str(args.rate),
+               REPLAY_SAMPLES_PER_FRAME=str(args.frame), WS_COMPRESSION=args.compression,
+               PYTHONPATH=REPO + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    server = subprocess.Popen([sys.executable, os.path.join(REPO, "server.py")], cwd=directory, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return server
+        except OSError:
+            if server.poll() is not None:
+                raise RuntimeError("server.py exited during startup")
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("server.py did not start listening")
+
+def run_client(streams, args, results):
+    """
+    One client process: runs fetch_and_predict over its share of the streams and reports
+    what it measured after the warm-up.
+    """
+    warnings.simplefilter("ignore")
+    os.environ["MODEL_PATH"] = os.path.abspath(args.model)
+    import metrics
+    metrics.enable()
+    import app
+    import ingest
+    from worker import ResultStore
+
+    async def measure():
+        task = asyncio.create_task(app.fetch_and_predict(streams, ResultStore()))
+        await asyncio.sleep(args.warmup)
+        rows, cpu, counts = ingest.BATCH_ROWS.value, time.process_time(), list(app.END_TO_END.counts)
+        start = time.monotonic()
+        await asyncio.sleep(args.seconds)
+        elapsed = time.monotonic() - start
+        result = {
+            "rows": ingest.BATCH_ROWS.value - rows,
+            "cpu_seconds": time.process_time() - cpu,
+            "elapsed": elapsed,
+            "latency_counts": [after - before for after, before in zip(app.END_TO_END.counts, counts)],
+            "reconnects": ingest.RECONNECTS.value,
+            "rss_mb": proc_memory_mb()[0],
+            "peak_rss_mb": proc_memory_mb()[1],
+        }
+        task.cancel()
+        return result
+    results.put(asyncio.run(measure()))
+
+def latency_quantiles(counts, quantiles=(0.5, 0.95, 0.99)):
+    from metrics import bucket_value
+    counts = np.asarray(counts)
+    if not counts.sum():
+        return {q: float("nan") for q in quantiles}
+    cumulative = np.cumsum(counts)
+    return {q: bucket_value(int(np.searchsorted(cumulative, q * counts.sum()))) / 1e6 for q in quantiles}
+
+def run_pipeline(args, directory):
+    port = args.port
+    server = start_server(directory, port, args)
+    try:
+        streams = {f"p{i:03d}": f"ws://127.0.0.1:{port}/" for i in range(args.clients)}
+        shares = [dict(list(streams.items())[i::args.client_processes]) for i in range(args.client_processes)]
+        results = multiprocessing.Queue()
+        clients = [multiprocessing.Process(target=run_client, args=(share, args, results)) for share in shares if share]
+
+        server_cpu = proc_cpu_seconds(server.pid)
+        for client in clients:
+            client.start()
+        time.sleep(args.warmup)
+        server_cpu, window = proc_cpu_seconds(server.pid), time.monotonic()
+        reports = [results.get(timeout=args.warmup + args.seconds + 120) for _ in clients]
+        server_cpu = proc_cpu_seconds(server.pid) - server_cpu
+        server_window = time.monotonic() - window
+        server_rss, server_peak = proc_memory_mb(server.pid)
+        for client in clients:
+            client.join(timeout=10)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+    elapsed = max(report["elapsed"] for report in reports)
+    latency = latency_quantiles(np.sum([report["latency_counts"] for report in reports], axis=0))
+    return {
+        "samples_per_second": sum(report["rows"] for report in reports) / elapsed,
+        "target_samples_per_second": args.clients * args.rate,
+        "latency_p50_ms": latency[0.5],
+        "latency_p95_ms": latency[0.95],
+        "latency_p99_ms": latency[0.99],
+        "client_cpu_percent": 100 * sum(report["cpu_seconds"] for report in reports) / elapsed,
+        "server_cpu_percent": 100 * server_cpu / server_window,
+        "client_rss_mb": sum(report["rss_mb"] for report in reports),
+        "client_peak_rss_mb": sum(report["peak_rss_mb"] for report in reports),
+        "server_rss_mb": server_rss,
+        "server_peak_rss_mb": server_peak,
+        "reconnects": sum(report["reconnects"] for report in reports),
+    }
+
+def run_micro(args, csv_path):
+    """
+    Throughput of the code paths the pipeline is built from, on the same synthetic data.
+    """
+    from dataset import iter_chunks, ensure_cache, load_cache
+    from encoding import encode_binary, encode_json_prefixes, encode_json_frame, decode_binary, decode_json, sample_timestamps
+    from inference import predict_batch
+    from model_registry import load_model_file
+
+    with Timer() as csv_load:
+        rows = sum(len(block) for block in iter_chunks(csv_path))
+    ensure_cache(csv_path)
+    with Timer() as cache_map:
+        data = load_cache(csv_path)
+        np.asarray(data[:args.frame])
+
+    block = synthetic_samples(65536)
+    frames = range(0, len(block), args.frame)
+    timestamps = sample_timestamps(args.frame, int(1e9 / args.rate))
+    with Timer() as binary:
+        encoded_binary = [encode_binary(block[i:i + args.frame], timestamps) for i in frames]
+    with Timer() as text:
+        prefixes = encode_json_prefixes(block)
+        encoded_json = [encode_json_frame(prefixes[i:i + args.frame], timestamps) for i in frames]
+    with Timer() as binary_decode:
+        for message in encoded_binary:
+            decode_binary(message)
+    with Timer() as text_decode:
+        for message in encoded_json:
+            decode_json(message)
+
+    model = load_model_file(args.model)
+    predict_batch(model, block[:64])
+    with Timer() as predict:
+        predict_batch(model, block)
+    with Timer() as single:
+        for row in block[:50]:
+            predict_batch(model, row)
+
+    return {
+        "csv_rows_per_second": rate(rows, csv_load.seconds),
+        "cache_map_ms": cache_map.seconds * 1e3,
+        "encode_binary_rows_per_second": rate(len(block), binary.seconds),
+        "encode_json_rows_per_second": rate(len(block), text.seconds),
+        "decode_binary_rows_per_second": rate(len(block), binary_decode.seconds),
+        "decode_json_rows_per_second": rate(len(block), text_decode.seconds),
+        "predict_rows_per_second": rate(len(block), predict.seconds),
+        "predict_single_ms": single.seconds / 50 * 1e3,
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline, tolerance):
+    """
+    Returns [(name, baseline value, new value, relative change)] of figures that got worse
+    by more than tolerance.
+    """
+    regressions = []
+    for section, key, higher_is_better in TRACKED:
+        old, new = baseline.get(section, {}).get(key), results.get(section, {}).get(key)
+        if old is None or new is None or not old or old != old or new != new:
+            continue
+        change = (new - old) / abs(old)
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append((f"{section}.{key}", old, new, change))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000, help="synthetic dataset size")
+    parser.add_argument("--channels", type=int, default=8, help="channels present in the dataset (missing ones read as 0)")
+    parser.add_argument("--rate", type=float, default=256, help="replay rate per stream, samples/s")
+    parser.add_argument("--frame", type=int, default=32, help="samples per WebSocket frame")
+    parser.add_argument("--clients", type=int, default=10, help="concurrent patient streams")
+    parser.add_argument("--client-processes", type=int, default=1, help="processes the streams are spread over")
+    parser.add_argument("--seconds", type=float, default=15)
+    parser.add_argument("--warmup", type=float, default=5)
+    parser.add_argument("--compression", choices=("none", "deflate"), default="none")
+    parser.add_argument("--model", default=os.path.join(REPO, "EE_model.pkl"))
+    parser.add_argument("--port", type=int, default=8798)
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative regression")
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = write_dataset(directory, args.rows, args.channels)
+        results = {
+            "config": vars(args),
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "commit": git_commit(),
+                "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            },
+            "pipeline": run_pipeline(args, directory),
+        }
+        if not args.skip_micro:
+            results["micro"] = run_micro(args, csv_path)
+
+    pipeline = results["pipeline"]
+    print(f"throughput   {pipeline['samples_per_second']:12,.0f} samples/s (target {pipeline['target_samples_per_second']:,.0f})")
+    print(f"latency      p50 {pipeline['latency_p50_ms']:.1f} ms   p95 {pipeline['latency_p95_ms']:.1f} ms   p99 {pipeline['latency_p99_ms']:.1f} ms")
+    print(f"client       CPU {pipeline['client_cpu_percent']:.0f}%   RSS {pipeline['client_rss_mb']:.0f} MB (peak {pipeline['client_peak_rss_mb']:.0f} MB)")
+    print(f"server       CPU {pipeline['server_cpu_percent']:.0f}%   RSS {pipeline['server_rss_mb']:.0f} MB (peak {pipeline['server_peak_rss_mb']:.0f} MB)")
+    for key, value in results.get("micro", {}).items():
+        print(f"{key:<32} {value:14,.2f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        differing = [key for key in ("rows", "channels", "rate", "frame", "clients", "client_processes", "compression", "model")
+                     if baseline.get("config", {}).get(key) != results["config"].get(key)]
+        if differing:
+            print(f"Warning: the baseline ran with a different {', '.join(differing)}; figures may not be comparable")
+        regressions = compare(results, baseline, args.tolerance)
+        for name, old, new, change in regressions:
+            print(f"REGRESSION {name}: {old:,.2f} -> {new:,.2f} ({change:+.0%})")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Lookup latency of the reference-table index against table size, next to the list scan
+that predict_seizure used to do.
+
+    python -m benchmarks.lookup --sizes 100 1000 10000 100000 1000000 10000000
+"""
+import argparse
+import numpy as np
+from lookup import ReferenceIndex
+from benchmarks.common import synthetic_samples, Timer
+
+def per_query_us(seconds, n):
+    return seconds / n * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10**2, 10**3, 10**4, 10**5, 10**6, 10**7])
+    parser.add_argument("--queries", type=int, default=10_000)
+    parser.add_argument("--list-scan-max", type=int, default=10**5, help="largest table for the list baseline")
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'build ms':>10} {'list us/q':>10} {'hash 1 us':>10} {'hash us/q':>10} {'tree build':>10} {'kd us/q':>10}")
+    for size in args.sizes:
+        table = np.round(synthetic_samples(size, seed=1)[:, :7].astype(np.float64), 9)
+        rng = np.random.default_rng(2)
+        hits = table[rng.integers(0, size, args.queries // 2)] + 1e-13  # float noise well below the grid
+        misses = synthetic_samples(args.queries - len(hits), seed=3)[:, :7].astype(np.float64)
+        queries = np.vstack([hits, misses])
+
+        with Timer() as build:
+            index = ReferenceIndex(table)
+
+        list_scan = float("nan")
+        if size <= args.list_scan_max:
+            rows, probes = table.tolist(), queries[:50].tolist()
+            with Timer() as t:
+                for probe in probes:
+                    probe in rows
+            list_scan = per_query_us(t.seconds, len(probes))
+
+        with Timer() as single:
+            for probe in queries[:200]:
+                index.contains(probe)
+        with Timer() as batched:
+            found = index.contains(queries)
+        assert found[:len(hits)].all()
+
+        with Timer() as tree_build:
+            index.tree
+        with Timer() as nearest:
+            index.nearest(queries, tolerance=1e-8)
+
+        print(f"{size:>10,} {build.seconds * 1e3:>10.1f} {list_scan:>10.1f} {per_query_us(single.seconds, 200):>10.1f} "
+              f"{per_query_us(batched.seconds, len(queries)):>10.3f} {tree_build.seconds * 1e3:>9.0f}ms {per_query_us(nearest.seconds, len(queries)):>10.2f}")
+
+if __name__ == "__main__":
+    main()
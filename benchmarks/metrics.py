@@ -0,0 +1,43 @@
+"""
+Per-call cost of the instrumentation hooks with metrics off and on, against an empty loop.
+
+    python -m benchmarks.metrics --calls 1000000
+"""
+import argparse
+import numpy as np
+import metrics
+from benchmarks.common import Timer
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    stage = metrics.histogram("benchmark_stage_seconds", "Benchmark stage", stage="hooks")
+    batch = metrics.histogram("benchmark_stage_seconds", "Benchmark stage", stage="batch")
+    counter = metrics.counter("benchmark_total", "Benchmark counter")
+    values = np.random.default_rng(0).lognormal(13, 1, 4096)
+
+    with Timer() as empty:
+        for _ in range(args.calls):
+            pass
+    for on in (False, True):
+        metrics.enable(on)
+        with Timer() as timed:
+            for _ in range(args.calls):
+                stage.stop(stage.start())
+        with Timer() as counted:
+            for _ in range(args.calls):
+                counter.inc()
+        with Timer() as batched:
+            for _ in range(1000):
+                batch.record_many(values)
+        overhead = lambda t: (t.seconds - empty.seconds) / args.calls * 1e9
+        print(f"metrics {'on ' if on else 'off'}   start/stop {overhead(timed):6.0f} ns   inc {overhead(counted):6.0f} ns   "
+              f"record_many(4096) {batched.seconds / 1000 * 1e6:7.1f} us")
+    quantiles = batch.quantiles()
+    print(f"p50/p99 of the recorded batches: {quantiles[0.5] / 1e3:.0f} / {quantiles[0.99] / 1e3:.0f} us "
+          f"(exact {np.percentile(values, 50) / 1e3:.0f} / {np.percentile(values, 99) / 1e3:.0f} us)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Per-patient model cache under a skewed patient mix: hit rate, evictions and load latency
+for a byte budget smaller than the working set, and prediction throughput with blocks
+grouped per model versus one call per block.
+
+    python -m benchmarks.patient_models --patients 40 --budget-models 10 --batches 500
+"""
+import argparse
+import os
+import tempfile
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from forest import export_forest
+from inference import predict_batch
+from patient_models import PatientModelStore, predict_grouped, model_nbytes
+from model_registry import load_model_file
+from benchmarks.common import synthetic_samples, rate, Timer
+
+def write_patient_models(model_dir, n_patients, trees, seed=0):
+    rng = np.random.default_rng(seed)
+    X = synthetic_samples(5000, seed) * np.float32(2 ** 20)  # Scaled as in train_model.py
+    for patient in range(n_patients):
+        model = RandomForestClassifier(n_estimators=trees, max_depth=10, random_state=patient)
+        model.fit(X, rng.integers(0, 2, len(X)))
+        export_forest(model, os.path.join(model_dir, f"p{patient}.npz"))
+
+def make_batches(n_batches, n_patients, blocks_per_batch, rows_per_block, seed=0):
+    # Zipf-like mix: a few patients are seen far more often than the rest
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / np.arange(1, n_patients + 1)
+    weights /= weights.sum()
+    values = synthetic_samples(rows_per_block, seed)
+    timestamps = np.zeros(rows_per_block, dtype=np.int64)
+    return [[(f"p{p}", values, timestamps) for p in rng.choice(n_patients, blocks_per_batch, p=weights)]
+            for _ in range(n_batches)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=40)
+    parser.add_argument("--budget-models", type=int, default=10, help="cache budget, in models' worth of bytes")
+    parser.add_argument("--trees", type=int, default=20)
+    parser.add_argument("--batches", type=int, default=500)
+    parser.add_argument("--blocks", type=int, default=16, help="blocks per drained batch")
+    parser.add_argument("--rows", type=int, default=32, help="samples per block")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        write_patient_models(tmp, args.patients, args.trees)
+        model_bytes = model_nbytes(load_model_file(os.path.join(tmp, "p0.npz")))
+        batches = make_batches(args.batches, args.patients, args.blocks, args.rows)
+        rows = args.batches * args.blocks * args.rows
+
+        store = PatientModelStore(tmp, max_bytes=model_bytes * args.budget_models, fallback=None)
+        with Timer() as grouped:
+            for blocks in batches:
+                predict_grouped(store, blocks)
+        stats = store.stats()
+        print(f"{args.patients} patients, budget {args.budget_models} models ({stats['max_bytes'] / 1e6:.1f} MB): "
+              f"hit rate {stats['hit_rate']:.1%}, {stats['loads']} loads, {stats['evictions']} evictions, "
+              f"mean load {stats['mean_load_seconds'] * 1e3:.1f} ms, max {stats['max_load_seconds'] * 1e3:.1f} ms")
+
+        warm = PatientModelStore(tmp, max_bytes=model_bytes * (args.patients + 1), fallback=None)
+        for blocks in batches[:50]:
+            predict_grouped(warm, blocks)
+        with Timer() as grouped_warm:
+            for blocks in batches:
+                predict_grouped(warm, blocks)
+        with Timer() as per_block:
+            for blocks in batches:
+                for patient_id, values, _ in blocks:
+                    predict_batch(warm.get(patient_id), values)
+        print(f"cold cache, grouped:   {rate(rows, grouped.seconds):12,.0f} samples/s")
+        print(f"warm cache, grouped:   {rate(rows, grouped_warm.seconds):12,.0f} samples/s")
+        print(f"warm cache, per block: {rate(rows, per_block.seconds):12,.0f} samples/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Dataset provisioning from a local HTTP stand-in and a mirror directory: full download,
+resuming an interrupted download with Range requests, verification, and the start-up
+fast path for an already verified file.
+
+    python -m benchmarks.provision --rows 2000000
+"""
+import argparse
+import os
+import re
+import tempfile
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from functools import partial
+from provision import provision, sha256_file, stamp_path
+from benchmarks.common import write_synthetic_csv, Timer
+
+class RangeHandler(SimpleHTTPRequestHandler):
+    """
+    Static file server that honours single "bytes=start-" ranges, like a real mirror.
+    """
+    def do_GET(self):
+        match = re.fullmatch(r"bytes=(\d+)-", self.headers.get("Range", ""))
+        path = self.translate_path(self.path)
+        if not match or not os.path.isfile(path):
+            return super().do_GET()
+        size = os.path.getsize(path)
+        start = int(match.group(1))
+        if start >= size:
+            self.send_error(416)
+            return
+        self.send_response(206)
+        self.send_header("Content-Range", f"bytes {start}-{size - 1}/{size}")
+        self.send_header("Content-Length", str(size - start))
+        self.end_headers()
+        with open(path, "rb") as f:
+            f.seek(start)
+            self.wfile.write(f.read())
+
+    def log_message(self, format, *args):
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        mirror = os.path.join(tmp, "mirror")
+        os.makedirs(mirror)
+        source = os.path.join(mirror, "data.csv")
+        write_synthetic_csv(source, args.rows)
+        size = os.path.getsize(source)
+        with Timer() as hashing:
+            sha256 = sha256_file(source)
+        print(f"{size / 1e6:.0f} MB dataset; full SHA-256 takes {hashing.seconds:.2f} s")
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), partial(RangeHandler, directory=mirror))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/data.csv"
+
+        target = os.path.join(tmp, "http", "data.csv")
+        os.makedirs(os.path.dirname(target))
+        with Timer() as full:
+            provision(target, url=url, directory=None, expected_sha256=sha256)
+        print(f"  HTTP download + verify:        {full.seconds:7.2f} s")
+
+        os.remove(target)
+        os.remove(stamp_path(target))
+        with open(source, "rb") as f, open(target + ".part", "wb") as part:
+            part.write(f.read(size // 2))  # An interrupted download
+        with Timer() as resumed:
+            provision(target, url=url, directory=None, expected_sha256=sha256)
+        print(f"  resume from 50% + verify:      {resumed.seconds:7.2f} s")
+
+        with Timer() as again:
+            provision(target, url=url, directory=None, expected_sha256=sha256)
+        print(f"  restart, already verified:     {again.seconds * 1e3:7.2f} ms")
+
+        with open(target, "r+b") as f:
+            f.truncate(size - 100)  # Truncated in place
+        with Timer() as repaired:
+            provision(target, url=url, directory=None, expected_sha256=None)
+        print(f"  truncated file re-fetched:     {repaired.seconds:7.2f} s  (intact: {sha256_file(target) == sha256})")
+
+        provision(source, url=None, directory=None, expected_sha256=sha256)  # Records the mirror's verification
+        local = os.path.join(tmp, "local", "data.csv")
+        os.makedirs(os.path.dirname(local))
+        with Timer() as linked:
+            provision(local, url=None, directory=mirror, expected_sha256=sha256)
+        print(f"  mirror directory (hard link):  {linked.seconds * 1e3:7.2f} ms")
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Startup cost of loading the model per page versus once through the model registry, and
+how much memory forked workers share when the model is preloaded before the fork.
+
+    python -m benchmarks.registry --model EE_model.pkl --workers 4
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from benchmarks.common import synthetic_samples, Timer
+
+# Each snippet runs in a fresh interpreter and reports seconds to the first prediction and VmRSS
+SEPARATE_LOADS = """
+from model_registry import load_model_file
+from inference import predict_batch
+models = [load_model_file(PATH) for page in ('app', 'page2', 'rough')]
+predict_batch(models[0], X)
+"""
+
+REGISTRY_LOADS = """
+from model_registry import get_model
+from inference import predict_batch
+models = [get_model(PATH) for page in ('app', 'page2', 'rough')]
+predict_batch(models[0], X)
+"""
+
+def pss_kb(pid):
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        return int(f.read().split("Pss:")[1].split()[0])
+
+def run_startup(statement, path):
+    script = (
+        "import time; start = time.perf_counter()\n"
+        "import numpy as np\n"
+        f"PATH = {path!r}; X = np.zeros((1, 8), dtype=np.float32)\n"
+        f"{statement}\n"
+        "print(time.perf_counter() - start, open('/proc/self/status').read().split('VmRSS:')[1].split()[0])"
+    )
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout
+    seconds, rss_kb = output.split()[-2:]
+    return float(seconds), int(rss_kb) / 1024
+
+def first_call_ms(path, warm):
+    """
+    Latency of the first real prediction after loading, with and without the registry's warm-up.
+    """
+    script = (
+        "import time, numpy as np\n"
+        "from inference import predict_batch\n"
+        "from model_registry import load_model_file, warm_up\n"
+        f"model = load_model_file({path!r})\n"
+        f"{'warm_up(model)' if warm else ''}\n"
+        "start = time.perf_counter(); predict_batch(model, np.zeros((1, 8), dtype=np.float32))\n"
+        "print((time.perf_counter() - start) * 1e3)"
+    )
+    return float(subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout.split()[-1])
+
+def forked_pss(path, workers, preload):
+    """
+    Forks workers that each serve predictions, and returns the summed PSS of all workers in MB.
+    With preload the model is loaded in the parent first, so its arrays are shared copy-on-write.
+    """
+    import model_registry
+    registry = model_registry.ModelRegistry()
+    if preload:
+        registry.get(path)
+    X = synthetic_samples(1000)
+    pids, pipes = [], []
+    for _ in range(workers):
+        ready_r, ready_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            model = registry.get(path)
+            from inference import predict_batch
+            predict_batch(model, X)
+            os.write(ready_w, b"1")
+            time.sleep(60)
+            os._exit(0)
+        pids.append(pid)
+        pipes.append(ready_r)
+    for ready in pipes:
+        os.read(ready, 1)
+    total = sum(pss_kb(pid) for pid in pids) / 1024
+    for pid in pids:
+        os.kill(pid, 9)
+        os.waitpid(pid, 0)
+    return total
+
+def hot_swap_ms(path):
+    """
+    Time for get() to pick up a replaced model file, and that readers never see an error meanwhile.
+    """
+    import model_registry
+    with tempfile.TemporaryDirectory() as tmp:
+        live = os.path.join(tmp, "model" + os.path.splitext(path)[1])
+        shutil.copy(path, live)
+        registry = model_registry.ModelRegistry(check_interval=0.0)
+        old = registry.get(live)
+        staged = live + ".new"
+        shutil.copy(path, staged)
+        os.utime(staged, ns=(time.time_ns(), time.time_ns() + 1_000_000_000))
+        os.replace(staged, live)  # Atomic replace, the way a new model should be deployed
+        with Timer() as t:
+            new = registry.get(live)
+        assert new is not old
+        return t.seconds * 1e3
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="EE_model.pkl")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    for name, statement in (("separate loads (3 pages)", SEPARATE_LOADS), ("registry (3 pages)", REGISTRY_LOADS)):
+        runs = [run_startup(statement, args.model) for _ in range(3)]
+        seconds = np.median([r[0] for r in runs])
+        rss = np.median([r[1] for r in runs])
+        print(f"{name:<28} startup {seconds * 1e3:8.1f} ms   RSS {rss:7.1f} MB")
+
+    cold = np.median([first_call_ms(args.model, warm=False) for _ in range(3)])
+    warm = np.median([first_call_ms(args.model, warm=True) for _ in range(3)])
+    print(f"{'first prediction':<28} cold {cold:8.2f} ms   after warm-up {warm:.2f} ms")
+
+    after = forked_pss(args.model, args.workers, preload=False)
+    before = forked_pss(args.model, args.workers, preload=True)
+    print(f"{args.workers} forked workers, PSS       load after fork {after:7.1f} MB   preloaded {before:7.1f} MB")
+    print(f"{'hot swap':<28} {hot_swap_ms(args.model):8.1f} ms to load and warm the replacement")
+
+if __name__ == "__main__":
+    main()
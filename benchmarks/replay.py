@@ -0,0 +1,43 @@
+"""
+Compares schedule drift of accumulated sleeps against ReplayClock pacing.
+
+    python -m benchmarks.replay --rate 256 --frame 1 --seconds 5
+"""
+import argparse
+import asyncio
+import time
+from replay import ReplayClock
+
+async def paced(interval, frames, work):
+    clock = ReplayClock(interval)
+    start = time.monotonic()
+    for _ in range(frames):
+        await clock.wait()
+        time.sleep(work)  # stand-in for encode + send
+    return time.monotonic() - start
+
+async def accumulated(interval, frames, work):
+    start = time.monotonic()
+    for _ in range(frames):
+        time.sleep(work)
+        await asyncio.sleep(interval)
+    return time.monotonic() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rate", type=float, default=256)
+    parser.add_argument("--speed", type=float, default=1)
+    parser.add_argument("--frame", type=int, default=1)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--work-us", type=float, default=200, help="simulated per-frame send cost")
+    args = parser.parse_args()
+
+    interval = args.frame / (args.rate * args.speed)
+    frames = int(args.seconds / interval) + 1
+    expected = (frames - 1) * interval
+    for name, run in [("accumulated sleep", accumulated), ("ReplayClock", paced)]:
+        elapsed = asyncio.run(run(interval, frames, args.work_us / 1e6))
+        print(f"{name:18s}: {frames * args.frame / elapsed:10,.1f} samples/sec  drift {(elapsed - expected) * 1e3:+8.1f} ms")
+
+if __name__ == "__main__":
+    main()
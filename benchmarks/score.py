@@ -0,0 +1,33 @@
+"""
+Scaling of the offline batch scorer with the number of worker processes.
+
+    python -m benchmarks.score --rows 2000000 --workers 1 2 4 8
+"""
+import argparse
+import os
+import tempfile
+from score import score
+from benchmarks.common import write_synthetic_csv
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="EE_model.pkl")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count()])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "scores.csv")
+        write_synthetic_csv(csv_path, args.rows)
+        score(csv_path, args.model, os.path.join(tmp, "warm"), workers=1)  # Builds the cache and warms the page cache
+
+        print(f"{os.cpu_count()} CPUs available")
+        baseline = None
+        for workers in sorted(set(args.workers)):
+            summary = score(csv_path, args.model, os.path.join(tmp, f"w{workers}"), workers=workers)
+            baseline = baseline or summary["rows_per_second"]
+            print(f"{workers:>3} workers {summary['rows_per_second']:>12,.0f} rows/s   "
+                  f"speedup {summary['rows_per_second'] / baseline:5.2f}x   efficiency {summary['rows_per_second'] / baseline / workers:5.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+Time to the first block of a replay that starts part-way into the dataset, seeking through
+the binary cache versus streaming the CSV and skipping the earlier rows.
+
+    python -m benchmarks.seek --rows 2000000
+"""
+import argparse
+import os
+import tempfile
+from dataset import iter_blocks, iter_chunks, slice_blocks, ensure_cache
+from benchmarks.common import write_synthetic_csv, Timer
+
+def first_block(blocks):
+    return next(iter(blocks), None)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "seek.csv")
+        write_synthetic_csv(csv_path, args.rows)
+        ensure_cache(csv_path)
+        print(f"{args.rows:,} rows")
+        for fraction in (0.0, 0.25, 0.5, 0.99):
+            offset = int(args.rows * fraction)
+            with Timer() as cached:
+                first_block(iter_blocks(csv_path, start=offset))
+            with Timer() as streamed:
+                first_block(slice_blocks(iter_chunks(csv_path), start=offset))
+            print(f"  offset {offset:>10,}: cache {cached.seconds * 1e3:8.2f} ms   CSV {streamed.seconds * 1e3:9.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Sustained write rate of the segment log for many patients at 256 Hz, and time-range query
+latency against scanning the whole segment.
+
+    python -m benchmarks.segment_log --patients 100 --seconds 600
+"""
+import argparse
+import os
+import tempfile
+import numpy as np
+from encoding import SAMPLE_DTYPE
+from segment_log import SegmentLog, HOUR_NS
+from benchmarks.common import synthetic_samples, rate, Timer
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--patients", type=int, default=100)
+    parser.add_argument("--seconds", type=int, default=600, help="simulated recording length")
+    parser.add_argument("--rate-hz", type=int, default=256)
+    parser.add_argument("--frame", type=int, default=32, help="samples per incoming frame")
+    parser.add_argument("--dir", help="log directory (a temporary one by default)")
+    args = parser.parse_args()
+
+    period_ns = 10**9 // args.rate_hz
+    start_ns = 1_700_000_000 * 10**9 // HOUR_NS * HOUR_NS  # Start on an hour boundary
+    samples = synthetic_samples(args.rate_hz * 4)
+    n_frames = args.seconds * args.rate_hz // args.frame
+    total = n_frames * args.frame * args.patients
+    frames = np.empty(args.frame, dtype=SAMPLE_DTYPE)
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as root:
+        log = SegmentLog(root, "frames")
+        flushes = 0
+        # Writes are timed without the (instant) simulated clock; real streams arrive spread out
+        with Timer() as write:
+            for i in range(n_frames):
+                frames["values"] = samples[(i * args.frame) % len(samples):][:args.frame]
+                frames["timestamp"] = start_ns + (i * args.frame + np.arange(args.frame)) * period_ns
+                due = False
+                for patient in range(args.patients):
+                    due |= log.append(str(patient), frames)
+                if due:
+                    log.flush()
+                    flushes += 1
+            log.close()
+        size = sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(root) for f in files)
+        needed = args.patients * args.rate_hz
+        print(f"write     {rate(total, write.seconds):>12,.0f} records/s   ({rate(total, write.seconds) / needed:.0f}x the "
+              f"{needed:,}/s of {args.patients} patients at {args.rate_hz} Hz)   {size / 2**20:.0f} MB, "
+              f"{flushes} flushes, {log.fsyncs} fsync rounds")
+
+        rng = np.random.default_rng(0)
+        for span_s in (1, 60):
+            offsets = rng.integers(0, max(1, args.seconds - span_s), 200)
+            patients = rng.integers(0, args.patients, 200)
+            with Timer() as query:
+                counts = [len(log.query(str(p), start_ns + o * 10**9, start_ns + (o + span_s) * 10**9)) for p, o in zip(patients, offsets)]
+            assert min(counts) == span_s * args.rate_hz, (min(counts), max(counts))
+            print(f"query {span_s:>3} s  {query.seconds / 200 * 1e3:10.2f} ms per query")
+
+        with Timer() as scan:
+            for p in patients[:20]:
+                records = np.fromfile(log.segments(str(p))[0][1], dtype=SAMPLE_DTYPE)
+                records[(records["timestamp"] >= start_ns) & (records["timestamp"] < start_ns + 60 * 10**9)]
+        print(f"full scan  {scan.seconds / 20 * 1e3:10.2f} ms per query")
+
+if __name__ == "__main__":
+    main()
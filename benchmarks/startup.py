@@ -0,0 +1,75 @@
+"""
+Time to first render of every page of main.py, measured in a fresh interpreter under
+-X importtime, with the heaviest imports the page pulled in beyond Streamlit itself.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --pages Prediction --top 15
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+HEAVY_MODULES = ("numpy", "pandas", "sklearn", "scipy", "websockets")
+
+# Streamlit and its testing harness are imported before the clock starts; what remains is the page's own cost
+RENDER = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+page = sys.argv[1]
+baseline = set(sys.modules)
+start = time.perf_counter()
+at = AppTest.from_file('main.py', default_timeout=120)
+if page != 'Home':
+    at.run()
+    baseline |= set(sys.modules)
+    start = time.perf_counter()
+    at.sidebar.selectbox[0].select(page)
+at.run()
+seconds = time.perf_counter() - start
+print(json.dumps({'seconds': seconds, 'exception': bool(at.exception), 'modules': sorted(set(sys.modules) - baseline)}))
+"""
+
+def parse_importtime(stderr):
+    """
+    Parses -X importtime lines into {module: (self_us, cumulative_us)}.
+    """
+    imports = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        imports[name.strip()] = (int(self_us), int(cumulative_us))
+    return imports
+
+def measure(page):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", RENDER, page], capture_output=True, text=True, check=True
+    )
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    imports = parse_importtime(result.stderr)
+    report["imports"] = {name: imports[name] for name in report["modules"] if name in imports}
+    return report
+
+def main():
+    from main import PAGES
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", nargs="+", default=list(PAGES))
+    parser.add_argument("--top", type=int, default=5, help="heaviest page imports to list")
+    args = parser.parse_args()
+
+    for page in args.pages:
+        report = measure(page)
+        imports = report["imports"]
+        self_ms = sum(self_us for self_us, _ in imports.values()) / 1e3
+        heavy = sorted({name.split(".")[0] for name in imports} & set(HEAVY_MODULES))
+        status = " (page raised)" if report["exception"] else ""
+        print(f"{page:<16} first render {report['seconds'] * 1e3:8.1f} ms{status}   "
+              f"{len(imports):4d} new modules, {self_ms:7.1f} ms importing   heavy: {', '.join(heavy) or '-'}")
+        top_level = [name for name in imports if "." not in name]
+        for name in sorted(top_level, key=lambda name: -imports[name][1])[:args.top]:
+            print(f"{'':<18}{name:<28} {imports[name][1] / 1e3:8.1f} ms cumulative")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Scaling of train_model.py with the number of parallel tree jobs, plus peak memory.
+
+    python -m benchmarks.train --rows 500000 --trees 16 --jobs 1 2 4 8
+
+Each run is a separate process, so the peak RSS it reports is that fit's own.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from benchmarks.common import write_synthetic_csv
+
+RUN = """
+import json, resource, sys
+from train_model import train
+model, metadata = train(sys.argv[1], trees=int(sys.argv[2]), jobs=int(sys.argv[3]), max_depth=int(sys.argv[4]))
+metadata["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(json.dumps(metadata))
+"""
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--trees", type=int, default=8)
+    parser.add_argument("--max-depth", type=int, default=20, help="synthetic labels are noise; limits tree growth")
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4, os.cpu_count()])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "train.csv")
+        write_synthetic_csv(csv_path, args.rows)
+        dataset_mb = os.path.getsize(csv_path) / 1e6
+        print(f"{os.cpu_count()} CPUs available, {args.rows:,} rows ({dataset_mb:.0f} MB of CSV)")
+        baseline = None
+        for i, jobs in enumerate(sorted(set(args.jobs))):
+            result = subprocess.run([sys.executable, "-c", RUN, csv_path, str(args.trees), str(jobs), str(args.max_depth)],
+                                    capture_output=True, text=True, check=True)
+            metadata = json.loads(result.stdout.strip().splitlines()[-1])
+            if i == 0:
+                print(f"first run built the caches in {metadata['load_seconds']:.2f} s")
+            baseline = baseline or metadata["fit_seconds"]
+            print(f"{jobs:>3} jobs  fit {metadata['fit_seconds']:7.2f} s   speedup {baseline / metadata['fit_seconds']:5.2f}x   "
+                  f"peak RSS {metadata['max_rss_mb']:6.0f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import asyncio
+from encoding import encode_frame, sample_timestamps
+from replay import ReplayClock
+import metrics
+
+# Encoding once per format plus queueing for every subscriber
+PUBLISH_TIME = metrics.histogram("eeg_stage_seconds", "Time spent per pipeline stage", stage="server_broadcast_publish")
+
+class Subscription:
+    """
+    One client's bounded queue of encoded frames. When the client falls behind and the
+    queue is full, the oldest frame is dropped so the producer never waits on it.
+    """
+    def __init__(self, protocol, queue_size):
+        self.protocol = protocol  # wire format, as taken by encode_frame
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def offer(self, frame):
+        """
+        Queues a frame; returns False if an older frame had to be dropped to make room.
+        """
+        dropped = self.queue.full()
+        if dropped:
+            self.queue.get_nowait()  # Skip the stalest frame, keep the stream live
+            self.dropped += 1
+        self.queue.put_nowait(frame)
+        return not dropped
+
+    async def get(self):
+        """
+        Waits for the next encoded frame; None means the stream has ended.
+        """
+        return await self.queue.get()
+
+class Broadcaster:
+    """
+    Shared live stream: a single producer paces and encodes each frame once per wire
+    format, then fans it out to every subscriber's queue.
+    """
+    def __init__(self, queue_size=64):
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self.frames_sent = 0
+        self.total_dropped = 0
+        self.clock = None
+        metrics.gauge("eeg_broadcast_subscribers", "Connected broadcast clients", lambda: len(self.subscribers))
+        metrics.gauge("eeg_broadcast_dropped_frames", "Frames dropped for slow broadcast clients", lambda: self.total_dropped)
+        metrics.gauge("eeg_broadcast_frames", "Frames published to the broadcast stream", lambda: self.frames_sent)
+
+    def subscribe(self, protocol):
+        subscription = Subscription(protocol, self.queue_size)
+        self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.subscribers.discard(subscription)
+
+    def publish(self, frame, timestamps):
+        """
+        Encodes the frame for the formats that currently have subscribers and queues it
+        for each of them.
+        """
+        encoded = {}
+        start = PUBLISH_TIME.start()
+        for subscription in list(self.subscribers):
+            if subscription.protocol not in encoded:
+                encoded[subscription.protocol] = encode_frame(frame, subscription.protocol, timestamps)
+            if not subscription.offer(encoded[subscription.protocol]):
+                self.total_dropped += 1
+        PUBLISH_TIME.stop(start)
+        self.frames_sent += 1
+
+    def close(self):
+        """
+        Ends the stream for every subscriber.
+        """
+        for subscription in list(self.subscribers):
+            subscription.offer(None)
+
+    async def run(self, frames, settings):
+        """
+        Replays frames from frames() at the settings' rate forever, starting over at the end
+        of the dataset. Time keeps moving with no subscribers, like a live feed.
+        """
+        self.clock = ReplayClock(settings.frame_interval)
+        while True:
+            replayed = 0
+            for frame in frames():
+                await self.clock.wait()
+                if self.subscribers:
+                    self.publish(frame, sample_timestamps(len(frame), settings.sample_period_ns))
+                replayed += 1
+            if not replayed:
+                await asyncio.sleep(1)  # Nothing to replay yet (dataset missing); try again shortly
@@ -0,0 +1,242 @@
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from inference import CHANNELS, N_CHANNELS
+
+try:
+    import fcntl
+except ImportError:  # Windows: builds aren't serialized, but unique temp files still keep them safe
+    fcntl = None
+
+# Rows per chunk when streaming the CSV; ~2 MB of float32 per chunk
+CHUNK_ROWS = 65536
+# Bytes hashed at each end of the CSV to fingerprint it
+FINGERPRINT_BYTES = 1 << 20
+# Class label column used for training
+LABEL_COLUMN = "Outcome"
+
+def read_header(path):
+    """
+    Returns the column names of a CSV file without reading any data rows.
+    """
+    return list(pd.read_csv(path, nrows=0).columns)
+
+def iter_chunks(path, chunk_rows=CHUNK_ROWS):
+    """
+    Streams the EEG dataset as fixed-size (rows, 8) float32 blocks of the CHANNELS columns.
+    Only one chunk is held in memory at a time. Channels missing from the file read as 0.0.
+    """
+    present = [channel for channel in CHANNELS if channel in read_header(path)]
+    positions = [CHANNELS.index(channel) for channel in present]
+    reader = pd.read_csv(
+        path,
+        usecols=present,
+        dtype={channel: np.float32 for channel in present},
+        chunksize=chunk_rows,
+        engine="c",
+    )
+    with reader:
+        for frame in reader:
+            block = np.zeros((len(frame), N_CHANNELS), dtype=np.float32)
+            block[:, positions] = frame[present].to_numpy(np.float32)
+            yield block
+
+def cache_paths(path):
+    """
+    Returns the (data, index) paths of the binary cache that sits next to a CSV file.
+    """
+    stem = os.path.splitext(path)[0]
+    return stem + ".f32", stem + ".json"
+
+def fingerprint(path):
+    """
+    Cheap identity of a CSV file: size, mtime and a hash of its first and last MB.
+    Hashing the edges catches rewritten files without reading multi-GB inputs in full.
+    """
+    stat = os.stat(path)
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        digest.update(f.read(FINGERPRINT_BYTES))
+        if stat.st_size > FINGERPRINT_BYTES:
+            f.seek(max(FINGERPRINT_BYTES, stat.st_size - FINGERPRINT_BYTES))
+            digest.update(f.read())
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest.hexdigest()}
+
+@contextmanager
+def replacing(path, mode="wb"):
+    """
+    Opens a uniquely named temporary file next to path and renames it over path once the
+    block completes, so readers never see a partial file and concurrent writers never
+    collide. The temporary file is removed if the block fails.
+    """
+    fd, temp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+        os.chmod(temp, 0o644)  # mkstemp creates it owner-only
+        os.replace(temp, path)
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+
+@contextmanager
+def build_lock(path):
+    """
+    Exclusive lock on path + ".lock", so processes that start cold together (the server,
+    score.py, train_model.py) build a cache once instead of all at the same time.
+    """
+    with open(path + ".lock", "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield  # Closing the file releases the lock
+
+def build_cache(path):
+    """
+    Converts the CSV once into a raw (rows, 8) float32 file plus a JSON sidecar index.
+    Both are written to temporary files and renamed, so readers never see a partial cache.
+    """
+    data_path, index_path = cache_paths(path)
+    source = fingerprint(path)
+    rows = 0
+    with replacing(data_path, "wb") as f:
+        for block in iter_chunks(path):
+            f.write(block.tobytes())
+            rows += len(block)
+    index = {"source": source, "rows": rows, "channels": CHANNELS, "dtype": "<f4"}
+    with replacing(index_path, "w") as f:
+        json.dump(index, f)
+    return index
+
+def load_cache(path):
+    """
+    Maps the binary cache read-only without parsing anything, or returns None when it is
+    missing or no longer matches the CSV. The mapping is shared through the page cache
+    by every process that opens it.
+    """
+    data_path, index_path = cache_paths(path)
+    try:
+        with open(index_path) as f:
+            index = json.load(f)
+        if index["channels"] != CHANNELS or index["source"] != fingerprint(path):
+            return None
+        if index["rows"] == 0:
+            return np.empty((0, N_CHANNELS), dtype=np.float32)
+        return np.memmap(data_path, dtype=index["dtype"], mode="r", shape=(index["rows"], N_CHANNELS))
+    except (OSError, ValueError, KeyError):
+        return None
+
+def ensure_cache(path):
+    """
+    Returns the mapped dataset, building the cache first if it is missing or stale.
+    """
+    data = load_cache(path)
+    if data is None:
+        with build_lock(cache_paths(path)[0]):
+            data = load_cache(path)  # Another process may have built it while we waited
+            if data is None:
+                build_cache(path)
+                data = load_cache(path)
+    if data is None:
+        raise OSError(f"the binary cache of {path} doesn't load even after a rebuild (did the CSV change meanwhile?)")
+    return data
+
+def label_cache_paths(path):
+    """
+    Returns the (labels, index) paths of the label cache that sits next to a CSV file.
+    """
+    stem = os.path.splitext(path)[0]
+    return stem + ".labels", stem + ".labels.json"
+
+def build_label_cache(path, chunk_rows=CHUNK_ROWS):
+    """
+    Extracts the LABEL_COLUMN once into a raw int32 file, streaming the CSV in chunks, with
+    the same fingerprinted sidecar index and temporary files as build_cache.
+    """
+    labels_path, index_path = label_cache_paths(path)
+    source = fingerprint(path)
+    rows = 0
+    reader = pd.read_csv(path, usecols=[LABEL_COLUMN], dtype={LABEL_COLUMN: np.int32}, chunksize=chunk_rows, engine="c")
+    with reader, replacing(labels_path, "wb") as f:
+        for frame in reader:
+            f.write(frame[LABEL_COLUMN].to_numpy(np.int32).tobytes())
+            rows += len(frame)
+    index = {"source": source, "rows": rows, "column": LABEL_COLUMN, "dtype": "<i4"}
+    with replacing(index_path, "w") as f:
+        json.dump(index, f)
+    return index
+
+def load_labels(path):
+    """
+    Maps the label cache read-only, or returns None when it is missing or stale.
+    """
+    labels_path, index_path = label_cache_paths(path)
+    try:
+        with open(index_path) as f:
+            index = json.load(f)
+        if index["column"] != LABEL_COLUMN or index["source"] != fingerprint(path):
+            return None
+        if index["rows"] == 0:
+            return np.empty(0, dtype=np.int32)
+        return np.memmap(labels_path, dtype=index["dtype"], mode="r", shape=(index["rows"],))
+    except (OSError, ValueError, KeyError):
+        return None
+
+def ensure_labels(path):
+    """
+    Returns the mapped labels, building the label cache first if it is missing or stale.
+    """
+    labels = load_labels(path)
+    if labels is None:
+        with build_lock(label_cache_paths(path)[0]):
+            labels = load_labels(path)  # Another process may have built it while we waited
+            if labels is None:
+                build_label_cache(path)
+                labels = load_labels(path)
+    if labels is None:
+        raise OSError(f"the label cache of {path} doesn't load even after a rebuild (did the CSV change meanwhile?)")
+    return labels
+
+def dataset_id(path):
+    """
+    Short identifier of the dataset version, from its fingerprint.
+    """
+    return fingerprint(path)["sha256"][:16]
+
+def iter_blocks(path, chunk_rows=CHUNK_ROWS, start=0, stop=None):
+    """
+    Yields (rows, 8) float32 blocks of rows [start, stop) of the dataset. From the binary
+    cache, rows are fixed-size, so seeking is a slice of the mapping and costs nothing;
+    streaming the CSV (before the cache exists) has to parse and skip the earlier rows.
+    """
+    data = load_cache(path)
+    if data is None:
+        yield from slice_blocks(iter_chunks(path, chunk_rows), start, stop)
+        return
+    stop = len(data) if stop is None else min(stop, len(data))
+    for begin in range(start, stop, chunk_rows):
+        yield np.asarray(data[begin:min(begin + chunk_rows, stop)])
+
+def slice_blocks(blocks, start=0, stop=None):
+    """
+    Keeps rows [start, stop) of a stream of blocks.
+    """
+    position = 0
+    for block in blocks:
+        begin, end = position, position + len(block)
+        position = end
+        if end <= start:
+            continue
+        if stop is not None and begin >= stop:
+            return
+        yield block[max(start - begin, 0):len(block) if stop is None else min(stop - begin, len(block))]
+
+if __name__ == "__main__":
+    # python dataset.py datasets/chbmit_preprocessed_data.csv
+    index = build_cache(sys.argv[1])
+    print(f"Cached {index['rows']} rows to {cache_paths(sys.argv[1])[0]}")
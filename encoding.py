@@ -0,0 +1,265 @@
+import json
+import time
+from datetime import datetime
+import numpy as np
+from inference import CHANNELS, N_CHANNELS
+
+# WebSocket subprotocols a client can ask for at connect time; JSON is the default
+JSON_PROTOCOL = "eeg.json"
+BINARY_PROTOCOL = "eeg.binary"
+DELTA_PROTOCOL = "eeg.delta"  # int16-quantized, delta-encoded frames (DeltaEncoder)
+SUBPROTOCOLS = [JSON_PROTOCOL, BINARY_PROTOCOL, DELTA_PROTOCOL]
+
+def select_subprotocol(connection, subprotocols):
+    """
+    Picks the first wire format the client offers, and accepts clients that offer none
+    (they get JSON) instead of failing the handshake.
+    """
+    for subprotocol in subprotocols:
+        if subprotocol in SUBPROTOCOLS:
+            return subprotocol
+    return None
+
+# One binary sample: 8 little-endian float32 channel values and an int64 timestamp (ns since epoch)
+SAMPLE_DTYPE = np.dtype([("values", "<f4", (N_CHANNELS,)), ("timestamp", "<i8")])
+
+# Everything in a JSON message except the timestamp value, built once
+_JSON_TEMPLATE = "{" + ", ".join(f"{json.dumps(channel)}: %s" for channel in CHANNELS) + ', "timestamp": "'
+
+def encode_json_prefixes(block):
+    """
+    Pre-serializes a (rows, 8) block into JSON message prefixes in bulk. Each prefix only
+    needs the send timestamp appended (see finish_json) to become a complete message.
+    Values are written as the shortest decimal that reads back as the same float32, as the
+    CSV has them: 2.32e-05, where widening to float64 first would send 2.320000021427404e-05.
+    """
+    block = np.asarray(block, dtype=np.float32)
+    rows = block.astype(str).tolist()  # NumPy's shortest float32 repr, vectorized
+    if np.isfinite(block).all():
+        return [_JSON_TEMPLATE % tuple(row) for row in rows]
+    # NaN/Infinity as json.dumps writes them
+    return [_JSON_TEMPLATE % tuple(json.dumps(float(value)) for value in row) for row in rows]
+
+def finish_json(prefix, timestamp=None):
+    """
+    Completes a pre-serialized JSON prefix with a timestamp string (now by default).
+    """
+    if timestamp is None:
+        timestamp = datetime.now().isoformat(sep=" ")
+    return prefix + timestamp + '"}'
+
+def format_timestamp(ns):
+    """
+    Formats ns since epoch the way the JSON messages carry timestamps.
+    """
+    return datetime.fromtimestamp(ns / 1e9).isoformat(sep=" ")
+
+def timestamps_ns(timestamps):
+    """
+    Converts decoded timestamps (int64 ns from binary frames, strings from JSON) to int64 ns.
+    Missing JSON timestamps become 0.
+    """
+    if isinstance(timestamps, np.ndarray):
+        return timestamps.astype(np.int64, copy=False)
+    return np.array([int(datetime.fromisoformat(t).timestamp() * 1e9) if t else 0 for t in timestamps], dtype=np.int64)
+
+def sample_timestamps(n_samples, sample_period_ns, end_ns=None):
+    """
+    Timestamps for a frame of samples: the last one is the send time (now by default) and
+    earlier ones are back-dated by the replay sample period.
+    """
+    if end_ns is None:
+        end_ns = time.time_ns()
+    return end_ns - (n_samples - 1 - np.arange(n_samples, dtype=np.int64)) * sample_period_ns
+
+def encode_json_frame(prefixes, timestamps):
+    """
+    Joins pre-serialized prefixes into one message: a single JSON object for one sample,
+    a JSON array of objects for a multi-sample frame.
+    """
+    if len(prefixes) == 1:
+        return finish_json(prefixes[0], format_timestamp(int(timestamps[0])))
+    return "[" + ", ".join(finish_json(p, format_timestamp(int(t))) for p, t in zip(prefixes, timestamps)) + "]"
+
+def encode_binary(block, timestamps=None):
+    """
+    Encodes a (rows, 8) block as one binary frame of packed SAMPLE_DTYPE records.
+    Timestamps default to the current time for every row.
+    """
+    records = np.empty(len(block), dtype=SAMPLE_DTYPE)
+    records["values"] = block
+    records["timestamp"] = time.time_ns() if timestamps is None else timestamps
+    return records.tobytes()
+
+def encode_frame(frame, protocol, timestamps):
+    """
+    Encodes one frame of samples in the requested wire format (a subprotocol name, or True
+    for binary and False for JSON). Delta frames made here carry their own scale/offset,
+    so they decode without any earlier frame.
+    """
+    if protocol == DELTA_PROTOCOL:
+        return DeltaEncoder(params_every_frame=True).encode(frame, timestamps)
+    if protocol is True or protocol == BINARY_PROTOCOL:
+        return encode_binary(frame, timestamps)
+    return encode_json_frame(encode_json_prefixes(frame), timestamps)
+
+def decode_binary(frame):
+    """
+    Decodes a binary frame into ((rows, 8) float32 values, (rows,) int64 timestamps).
+    """
+    records = np.frombuffer(frame, dtype=SAMPLE_DTYPE)
+    return records["values"], records["timestamp"]
+
+def decode_json(message):
+    """
+    Decodes a JSON message (one object or an array of them) into a (rows, 8) float32 block
+    and the list of timestamp strings. Channels missing from the message read as 0.0.
+    """
+    data = json.loads(message)
+    samples = data if isinstance(data, list) else [data]
+    values = np.array([[sample.get(channel, 0.0) for channel in CHANNELS] for sample in samples], dtype=np.float32)
+    return values.reshape(-1, N_CHANNELS), [sample.get("timestamp") for sample in samples]
+
+def decode_message(message):
+    """
+    Decodes either wire format: bytes are binary frames, text is JSON.
+    Returns ((rows, 8) float32 values, timestamps).
+    """
+    if isinstance(message, (bytes, bytearray, memoryview)):
+        return decode_binary(message)
+    return decode_json(message)
+
+# Delta frame layout (little-endian):
+#   header    version, flags, channels, samples, first timestamp (ns), sample period (ns)
+#   params    float32 scale[channels], float32 offset[channels]       if FLAG_PARAMS
+#   first     int16[channels], the first sample's quantized values
+#   deltas    int8 or int16 [samples - 1, channels], sample-to-sample  int8 if FLAG_INT8
+#   times     int64[samples]                                           if FLAG_TIMESTAMPS
+DELTA_VERSION = 1
+DELTA_HEADER = np.dtype([("version", "u1"), ("flags", "u1"), ("channels", "<u2"), ("samples", "<u4"),
+                         ("start", "<i8"), ("period", "<i8")])
+FLAG_PARAMS = 1  # the frame carries (new) scale/offset
+FLAG_INT8 = 2  # every delta fits in one byte
+FLAG_TIMESTAMPS = 4  # samples aren't evenly spaced, so every timestamp is sent
+# Quantized values use [-QUANT_MAX, QUANT_MAX]; deltas wrap modulo 2**16, so any jump decodes exactly
+QUANT_MAX = 32767
+
+class DeltaEncoder:
+    """
+    Encoder for one stream of delta frames. Values are quantized to int16 with a per-stream,
+    per-channel scale/offset, so the reconstruction error is at most scale / 2 per channel
+    (see max_error). The range is taken from the first frame plus headroom and only widens
+    when a later frame falls outside it; the scale/offset is sent in the first frame and
+    whenever it changes, or in every frame with params_every_frame.
+    """
+    def __init__(self, low=None, high=None, headroom=0.5, params_every_frame=False):
+        self.headroom = headroom
+        self.params_every_frame = params_every_frame
+        self.low = self.high = self.scale = self.offset = None
+        self._params_sent = False
+        if low is not None:
+            self.set_range(low, high)
+
+    def set_range(self, low, high):
+        low, high = np.asarray(low, dtype=np.float64), np.asarray(high, dtype=np.float64)
+        pad = np.maximum(high - low, np.abs(high) * 1e-3 + 1e-12) * self.headroom
+        self.low, self.high = low - pad, high + pad
+        self.offset = ((self.low + self.high) / 2).astype(np.float32)
+        self.scale = ((self.high - self.low) / (2 * QUANT_MAX)).astype(np.float32)
+        self._params_sent = False
+
+    @property
+    def max_error(self):
+        """
+        Worst-case absolute reconstruction error per channel: half a quantization step, plus
+        the float32 rounding of the decoded value.
+        """
+        if self.scale is None:
+            return None
+        return self.scale.astype(np.float64) / 2 + np.maximum(np.abs(self.low), np.abs(self.high)) * 2.0 ** -24
+
+    def quantize(self, block):
+        return np.rint((block - self.offset.astype(np.float64)) / self.scale.astype(np.float64))
+
+    def encode(self, block, timestamps):
+        block = np.asarray(block, dtype=np.float64)
+        if block.ndim == 1:
+            block = block.reshape(1, -1)
+        timestamps = np.asarray(timestamps, dtype=np.int64).reshape(-1)
+        n, channels = block.shape
+
+        # An empty block has no range of its own; it neither sets nor widens the stream's
+        if n and (self.scale is None or len(self.scale) != channels):
+            self.set_range(block.min(axis=0), block.max(axis=0))
+        has_range = self.scale is not None and len(self.scale) == channels
+        q = self.quantize(block) if has_range else np.zeros((n, channels))
+        if np.abs(q).max(initial=0) > QUANT_MAX:
+            self.set_range(np.minimum(self.low, block.min(axis=0)), np.maximum(self.high, block.max(axis=0)))
+            q = self.quantize(block)
+        q = q.astype(np.int16)
+
+        # Wrapping int16 differences; the decoder's int16 cumulative sum undoes them exactly
+        deltas = np.diff(q, axis=0)
+        flags = 0
+        if n > 1 and deltas.min() >= -128 and deltas.max() <= 127:
+            flags |= FLAG_INT8
+            deltas = deltas.astype(np.int8)
+        period = int(timestamps[1] - timestamps[0]) if n > 1 else 0
+        if n > 2 and (np.diff(timestamps) != period).any():
+            flags |= FLAG_TIMESTAMPS
+        send_params = has_range and (self.params_every_frame or not self._params_sent)
+        if send_params:
+            flags |= FLAG_PARAMS
+            self._params_sent = True
+
+        header = np.array([(DELTA_VERSION, flags, channels, n, timestamps[0] if n else 0, period)], dtype=DELTA_HEADER)
+        parts = [header.tobytes()]
+        if send_params:
+            parts += [self.scale.astype("<f4").tobytes(), self.offset.astype("<f4").tobytes()]
+        parts += [q[:1].astype("<i2").tobytes(), deltas.astype(deltas.dtype.newbyteorder("<")).tobytes()]
+        if flags & FLAG_TIMESTAMPS:
+            parts.append(timestamps.astype("<i8").tobytes())
+        return b"".join(parts)
+
+class DeltaDecoder:
+    """
+    Decoder for one stream of delta frames; remembers the last scale/offset it was sent.
+    Decoding is a handful of vectorized NumPy operations per frame.
+    """
+    def __init__(self):
+        self.scale = self.offset = None
+
+    def decode(self, frame):
+        """
+        Returns ((rows, 8) float32 values, (rows,) int64 timestamps), like decode_binary.
+        """
+        header = np.frombuffer(frame, dtype=DELTA_HEADER, count=1)[0]
+        if header["version"] != DELTA_VERSION:
+            raise ValueError(f"unsupported delta frame version {header['version']}")
+        flags, channels, n = int(header["flags"]), int(header["channels"]), int(header["samples"])
+        position = DELTA_HEADER.itemsize
+        if flags & FLAG_PARAMS:
+            self.scale = np.frombuffer(frame, dtype="<f4", count=channels, offset=position)
+            self.offset = np.frombuffer(frame, dtype="<f4", count=channels, offset=position + 4 * channels)
+            position += 8 * channels
+        if n and (self.scale is None or len(self.scale) != channels):
+            raise ValueError("delta frame before its scale/offset")
+
+        q = np.empty((n, channels), dtype=np.int16)
+        if n:
+            q[0] = np.frombuffer(frame, dtype="<i2", count=channels, offset=position)
+            position += 2 * channels
+            delta_type = "<i1" if flags & FLAG_INT8 else "<i2"
+            q[1:] = np.frombuffer(frame, dtype=delta_type, count=(n - 1) * channels, offset=position).reshape(n - 1, channels)
+            position += (n - 1) * channels * np.dtype(delta_type).itemsize
+            np.cumsum(q, axis=0, dtype=np.int16, out=q)
+
+        values = np.zeros((n, N_CHANNELS), dtype=np.float32)
+        if n:
+            width = min(channels, N_CHANNELS)
+            values[:, :width] = (q[:, :width] * self.scale[:width].astype(np.float64) + self.offset[:width])
+        if flags & FLAG_TIMESTAMPS:
+            timestamps = np.frombuffer(frame, dtype="<i8", count=n, offset=position).astype(np.int64)
+        else:
+            timestamps = header["start"] + np.arange(n, dtype=np.int64) * header["period"]
+        return values, timestamps
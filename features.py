@@ -0,0 +1,166 @@
+import numpy as np
+from inference import N_CHANNELS
+
+# CHB-MIT recordings are sampled at 256 Hz
+SAMPLE_RATE = 256
+
+# EEG frequency bands in Hz; the top edge is capped at the Nyquist frequency
+BANDS = {
+    "delta": (0.5, 4.0),
+    "theta": (4.0, 8.0),
+    "alpha": (8.0, 13.0),
+    "beta": (13.0, 30.0),
+    "gamma": (30.0, 100.0),
+}
+
+def feature_names(channels):
+    """
+    Names of the columns returned by FeatureExtractor, in order.
+    """
+    names = [f"{channel} mean" for channel in channels]
+    names += [f"{channel} var" for channel in channels]
+    names += [f"{channel} line_length" for channel in channels]
+    names += [f"{channel} {band}" for channel in channels for band in BANDS]
+    return names
+
+class SlidingWindow:
+    """
+    Ring buffer over one multi-channel stream. Sum, sum of squares and line length are
+    updated in O(1) per sample as samples enter and leave the window; every hop samples a
+    window snapshot is emitted for the spectral features.
+    """
+    def __init__(self, window, hop, n_channels=N_CHANNELS):
+        if not 0 < hop <= window:
+            raise ValueError("hop must be between 1 and the window size")
+        self.window = window
+        self.hop = hop
+        self.buffer = np.zeros((window, n_channels))
+        self.diffs = np.zeros((window, n_channels))  # |x[t] - x[t-1]| stored at x[t]'s slot
+        self.sum = np.zeros(n_channels)
+        self.sum_sq = np.zeros(n_channels)
+        self.sum_diffs = np.zeros(n_channels)
+        self.pos = 0  # next slot to write, i.e. the oldest sample once full
+        self.filled = 0
+        self.since_hop = 0
+        self.since_refresh = 0
+        self.last = None
+        self.offset = None  # values are stored relative to the first sample to keep sums well-conditioned
+
+    def push(self, block, timestamps=None):
+        """
+        Adds a (rows, channels) block; returns a list of (timestamp, stats, window) for every
+        hop boundary it crosses once the window is full. stats is (mean, var, line_length)
+        and window is the ordered (window, channels) snapshot, offset removed.
+        """
+        block = np.asarray(block, dtype=np.float64)
+        if self.offset is None and len(block):
+            self.offset = block[0].copy()
+            self.last = block[0] - self.offset
+        ready = []
+        i = 0
+        while i < len(block):
+            take = min(len(block) - i, self.hop - self.since_hop)
+            self._append(block[i:i + take] - self.offset)
+            i += take
+            self.since_hop += take
+            if self.since_hop == self.hop:
+                self.since_hop = 0
+                if self.filled == self.window:
+                    timestamp = None if timestamps is None else timestamps[i - 1]
+                    ready.append((timestamp, self.stats(), self.snapshot()))
+        return ready
+
+    def _append(self, segment):
+        slots = (self.pos + np.arange(len(segment))) % self.window
+        diffs = np.abs(np.diff(segment, axis=0, prepend=self.last[np.newaxis]))
+
+        # Slots not yet filled hold zeros, so subtracting them is a no-op
+        self.sum += segment.sum(axis=0) - self.buffer[slots].sum(axis=0)
+        self.sum_sq += (segment ** 2).sum(axis=0) - (self.buffer[slots] ** 2).sum(axis=0)
+        self.sum_diffs += diffs.sum(axis=0) - self.diffs[slots].sum(axis=0)
+        self.buffer[slots] = segment
+        self.diffs[slots] = diffs
+
+        self.pos = (self.pos + len(segment)) % self.window
+        self.filled = min(self.window, self.filled + len(segment))
+        self.last = segment[-1]
+        self.since_refresh += len(segment)
+        if self.since_refresh >= 64 * self.window:
+            self._refresh()
+
+    def _refresh(self):
+        # Recompute the running sums exactly now and then so rounding error can't accumulate
+        self.sum = self.buffer.sum(axis=0)
+        self.sum_sq = (self.buffer ** 2).sum(axis=0)
+        self.sum_diffs = self.diffs.sum(axis=0)
+        self.since_refresh = 0
+
+    def stats(self):
+        n = self.filled
+        mean = self.sum / n
+        var = np.maximum(self.sum_sq / n - mean ** 2, 0.0)
+        # The oldest sample's diff points outside the window
+        line_length = self.sum_diffs - (self.diffs[self.pos] if n == self.window else 0.0)
+        return mean + self.offset, var, line_length
+
+    def snapshot(self):
+        return np.concatenate([self.buffer[self.pos:], self.buffer[:self.pos]])
+
+class FeatureExtractor:
+    """
+    Sliding-window features for many streams at once: rolling mean, variance and line length
+    per channel, plus delta/theta/alpha/beta/gamma band powers from one batched rfft over
+    every window that became ready, across all channels and streams.
+    """
+    def __init__(self, window=SAMPLE_RATE, hop=SAMPLE_RATE // 4, sample_rate=SAMPLE_RATE, n_channels=N_CHANNELS):
+        self.window = window
+        self.hop = hop
+        self.sample_rate = sample_rate
+        self.n_channels = n_channels
+        self.streams = {}
+
+        self.taper = np.hanning(window)[:, np.newaxis]
+        # One-sided periodogram scaling for a Hann-tapered window
+        self.scale = 2.0 / (sample_rate * (self.taper ** 2).sum())
+        freqs = np.fft.rfftfreq(window, d=1.0 / sample_rate)
+        nyquist = sample_rate / 2
+        self.band_masks = np.array([
+            (freqs >= low) & (freqs < min(high, nyquist + 1e-9)) for low, high in BANDS.values()
+        ], dtype=np.float64)
+
+    @property
+    def n_features(self):
+        return self.n_channels * (3 + len(BANDS))
+
+    def push(self, blocks):
+        """
+        Adds [(stream_id, (rows, channels) block, timestamps), ...] and returns
+        (stream_ids, timestamps, (windows, n_features) array) for every window completed.
+        """
+        ids, timestamps, stats, windows = [], [], [], []
+        for stream_id, block, block_timestamps in blocks:
+            stream = self.streams.get(stream_id)
+            if stream is None:
+                stream = self.streams[stream_id] = SlidingWindow(self.window, self.hop, self.n_channels)
+            for timestamp, window_stats, window in stream.push(block, block_timestamps):
+                ids.append(stream_id)
+                timestamps.append(timestamp)
+                stats.append(np.concatenate(window_stats))
+                windows.append(window)
+
+        if not windows:
+            return ids, timestamps, np.empty((0, self.n_features))
+        return ids, timestamps, np.hstack([np.array(stats), self.band_powers(np.array(windows))])
+
+    def band_powers(self, windows):
+        """
+        (windows, window, channels) -> (windows, channels * bands) band powers, channel-major.
+        """
+        windows = windows - windows.mean(axis=1, keepdims=True)
+        spectrum = np.fft.rfft(windows * self.taper, axis=1)
+        power = (spectrum.real ** 2 + spectrum.imag ** 2) * self.scale
+        bands = np.einsum("bf,kfc->kcb", self.band_masks, power)
+        return bands.reshape(len(windows), -1)
+
+    def drop(self, stream_id):
+        self.streams.pop(stream_id, None)
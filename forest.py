@@ -0,0 +1,175 @@
+"""
+Flat, array-based evaluator for the pickled RandomForest in EE_model.pkl.
+
+Exporting (needs scikit-learn, run once per model):
+
+    python forest.py export EE_model.pkl EE_model.npz
+    python forest.py verify EE_model.pkl EE_model.npz --csv datasets/chbmit_preprocessed_data.csv
+
+Evaluating only needs NumPy:
+
+    forest = FlatForest.load('EE_model.npz')
+    proba = forest.predict_proba(X)
+"""
+import argparse
+import pickle
+import numpy as np
+
+# Rows walked through the trees at a time; keeps the (rows, trees) index matrices cache-sized
+EVAL_CHUNK_ROWS = 256
+
+def export_forest(model, path):
+    """
+    Flattens every estimator of a fitted sklearn forest classifier into contiguous arrays
+    and saves them as an .npz file.
+    """
+    trees = [estimator.tree_ for estimator in model.estimators_]
+    sizes = np.array([tree.node_count for tree in trees])
+    roots = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+    feature, threshold, left, right, missing_left, value = [], [], [], [], [], []
+    for root, tree in zip(roots, trees):
+        is_leaf = tree.children_left < 0
+        nodes = np.arange(tree.node_count) + root
+        # Leaves point back at themselves, so walking extra levels is a no-op
+        feature.append(np.where(is_leaf, 0, tree.feature))
+        threshold.append(np.where(is_leaf, np.inf, tree.threshold))
+        left.append(np.where(is_leaf, nodes, tree.children_left + root))
+        right.append(np.where(is_leaf, nodes, tree.children_right + root))
+        missing_left.append(getattr(tree, "missing_go_to_left", np.zeros(tree.node_count)).astype(bool) | is_leaf)
+
+        # Normalise leaf values exactly as DecisionTreeClassifier.predict_proba does
+        proba = tree.value[:, 0, :model.n_classes_].copy()
+        normalizer = proba.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        proba /= normalizer
+        value.append(proba)
+
+    np.savez(
+        path,
+        roots=roots.astype(np.intp),
+        feature=np.concatenate(feature).astype(np.intp),
+        threshold=np.concatenate(threshold).astype(np.float64),
+        left=np.concatenate(left).astype(np.intp),
+        right=np.concatenate(right).astype(np.intp),
+        missing_left=np.concatenate(missing_left),
+        value=np.concatenate(value),
+        classes=np.asarray(model.classes_),
+        max_depth=np.int64(max(tree.max_depth for tree in trees)),
+        n_features=np.int64(model.n_features_in_),
+    )
+
+class FlatForest:
+    """
+    Pure-NumPy RandomForest evaluator. Walks every tree for a whole batch at once with
+    vectorized index gathers, and matches model.predict / predict_proba exactly.
+    """
+    def __init__(self, roots, feature, threshold, left, right, missing_left, value, classes, max_depth, n_features):
+        self.roots = roots
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        # Interleaved (left, right) pairs, so a comparison result indexes the next node directly
+        self.children = np.stack([left, right], axis=1).ravel()
+        self.missing_left = missing_left
+        self.value = value
+        self.classes_ = classes
+        self.max_depth = int(max_depth)
+        self.n_features_in_ = int(n_features)
+        self.n_estimators = len(roots)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads an exported forest. Arrays are read-only, so they can be shared between processes.
+        """
+        with np.load(path) as arrays:
+            fields = {name: arrays[name] for name in arrays.files}
+        for array in fields.values():
+            array.flags.writeable = False
+        return cls(**fields)
+
+    def _check_features(self, X):
+        # Feature indices are used as raw offsets into each row, so a narrower X would read past it
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has shape {X.shape}, but the forest expects (rows, {self.n_features_in_})")
+
+    def apply(self, X):
+        """
+        Returns the (rows, trees) matrix of leaf indices reached by each sample.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)  # sklearn compares float32 features against float64 thresholds
+        self._check_features(X)
+        flat_X = X.ravel()
+        row_offsets = (np.arange(len(X)) * X.shape[1])[:, np.newaxis]
+        node = np.broadcast_to(self.roots, (len(X), self.n_estimators)).copy()
+        has_nan = np.isnan(flat_X).any()
+        for _ in range(self.max_depth):
+            x = flat_X[row_offsets + self.feature[node]]
+            go_right = x > self.threshold[node]
+            if has_nan:
+                go_right = np.where(np.isnan(x), ~self.missing_left[node], go_right)
+            node = self.children[2 * node + go_right]
+        return node
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        self._check_features(X)
+        proba = np.zeros((len(X), len(self.classes_)))
+        for start in range(0, len(X), EVAL_CHUNK_ROWS):
+            leaves = self.apply(X[start:start + EVAL_CHUNK_ROWS])
+            out = proba[start:start + EVAL_CHUNK_ROWS]
+            # Accumulate tree by tree, in the same order sklearn does, for bit-identical sums
+            for tree in range(self.n_estimators):
+                out += self.value[leaves[:, tree]]
+        proba /= self.n_estimators
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+def verify(model, forest, X):
+    """
+    Checks the flat forest against the sklearn model; returns the number of mismatching rows.
+    """
+    expected_proba = model.predict_proba(X)
+    actual_proba = forest.predict_proba(X)
+    mismatches = np.any(expected_proba != actual_proba, axis=1) | (model.predict(X) != forest.predict(X))
+    return int(mismatches.sum())
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or verify a flattened RandomForest.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_cmd = commands.add_parser("export")
+    export_cmd.add_argument("model")
+    export_cmd.add_argument("output")
+    verify_cmd = commands.add_parser("verify")
+    verify_cmd.add_argument("model")
+    verify_cmd.add_argument("flat")
+    verify_cmd.add_argument("--csv", help="CHB-MIT CSV to check against (random samples otherwise)")
+    verify_cmd.add_argument("--rows", type=int, default=None)
+    args = parser.parse_args()
+
+    model = pickle.load(open(args.model, 'rb'))
+    if args.command == "export":
+        export_forest(model, args.output)
+        print(f"Exported {len(model.estimators_)} trees to {args.output}")
+        return
+
+    forest = FlatForest.load(args.flat)
+    if args.csv:
+        import pandas as pd
+        from inference import CHANNELS
+        X = pd.read_csv(args.csv, usecols=CHANNELS, nrows=args.rows)[CHANNELS].to_numpy(np.float32)
+    else:
+        from benchmarks.common import synthetic_samples
+        X = synthetic_samples(args.rows or 100_000)
+    mismatches = verify(model, forest, X)
+    print(f"{len(X)} rows checked, {mismatches} mismatches")
+    raise SystemExit(1 if mismatches else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+import os
+import numpy as np
+
+# One compact record per prediction
+RESULT_DTYPE = np.dtype([
+    ("timestamp_ns", "<i8"),  # sample time
+    ("prediction", "<i1"),  # model label; 0 means seizure
+    ("probability", "<f4"),  # probability of a seizure
+    ("latency", "<f4"),  # seconds from sample time to prediction
+])
+
+class RingBuffer:
+    """
+    Fixed-capacity history of records in a preallocated structured array. Appends are O(1)
+    per record (a batch is at most two slice copies) and never allocate. With a spill_path,
+    records about to be overwritten are appended to that file first, so nothing is lost.
+    """
+    def __init__(self, capacity, dtype=RESULT_DTYPE, spill_path=None):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self.records = np.zeros(capacity, dtype=dtype)
+        self.head = 0  # next slot to write
+        self.size = 0
+        self.total = 0  # records ever appended
+        self.spill_path = spill_path
+        self.spilled = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, *fields):
+        if self.size == self.capacity and self.spill_path:
+            self._spill(self.records[self.head:self.head + 1])
+        self.records[self.head] = fields
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        self.total += 1
+
+    def extend(self, records):
+        """
+        Appends a structured array (or anything convertible to one) of records.
+        """
+        records = np.asarray(records, dtype=self.records.dtype)
+        if len(records) > self.capacity:
+            if self.spill_path:
+                self._spill(self.oldest(self.size))
+                self._spill(records[:-self.capacity])
+            self.total += len(records) - self.capacity
+            self.size = 0
+            records = records[-self.capacity:]
+        overflow = self.size + len(records) - self.capacity
+        if overflow > 0 and self.spill_path:
+            self._spill(self.oldest(overflow))
+
+        first = min(len(records), self.capacity - self.head)
+        self.records[self.head:self.head + first] = records[:first]
+        self.records[:len(records) - first] = records[first:]
+        self.head = (self.head + len(records)) % self.capacity
+        self.size = min(self.size + len(records), self.capacity)
+        self.total += len(records)
+
+    def oldest(self, k):
+        """
+        Copies the k oldest records, oldest first.
+        """
+        k = min(k, self.size)
+        start = (self.head - self.size) % self.capacity
+        return np.concatenate([self.records[start:start + k], self.records[:max(0, start + k - self.capacity)]])
+
+    def latest(self, k):
+        """
+        Copies the k newest records, newest first.
+        """
+        k = min(k, self.size)
+        slots = (self.head - 1 - np.arange(k)) % self.capacity
+        return self.records[slots]
+
+    def _spill(self, records):
+        with open(self.spill_path, "ab") as f:
+            records.tofile(f)
+        self.spilled += len(records)
+
+    def read_spilled(self):
+        """
+        Memory-maps the records spilled so far, oldest first (empty without a spill file).
+        """
+        if not self.spill_path or not os.path.exists(self.spill_path) or os.path.getsize(self.spill_path) == 0:
+            return np.empty(0, dtype=self.records.dtype)
+        return np.memmap(self.spill_path, dtype=self.records.dtype, mode="r")
+
+class PatientHistories:
+    """
+    One RingBuffer per patient, created on first use; spill files are <spill_dir>/<patient_id>.results.
+    """
+    def __init__(self, capacity=10_000, spill_dir=None):
+        self.capacity = capacity
+        self.spill_dir = spill_dir
+        self.buffers = {}
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def buffer(self, patient_id):
+        buffer = self.buffers.get(patient_id)
+        if buffer is None:
+            spill_path = os.path.join(self.spill_dir, f"{patient_id}.results") if self.spill_dir else None
+            buffer = self.buffers[patient_id] = RingBuffer(self.capacity, spill_path=spill_path)
+        return buffer
+
+    def extend(self, patient_id, records):
+        self.buffer(patient_id).extend(records)
+
+    def latest(self, k):
+        return {patient_id: buffer.latest(k) for patient_id, buffer in self.buffers.items()}
+
+def result_records(timestamps, predictions, probabilities, latencies):
+    """
+    Packs parallel per-sample columns into a RESULT_DTYPE array.
+    """
+    records = np.empty(len(predictions), dtype=RESULT_DTYPE)
+    records["timestamp_ns"] = timestamps
+    records["prediction"] = predictions
+    records["probability"] = probabilities
+    records["latency"] = latencies
+    return records
@@ -0,0 +1,27 @@
+import numpy as np
+
+# EEG Channels, in the column order the model was trained on
+CHANNELS = ["# FP1-F7", "C3-P3", "P3-O1", "P4-O2", "P7-O1", "P7-T7", "T8-P8-0", "T8-P8-1"]
+N_CHANNELS = len(CHANNELS)
+
+def as_batch(samples):
+    """
+    Converts one sample or a block of samples into a contiguous (N, 8) float32 array.
+    """
+    X = np.ascontiguousarray(samples, dtype=np.float32)
+    if X.ndim == 1:
+        X = X.reshape(1, -1)  # A single sample becomes a batch of one
+    return X
+
+def predict_batch(model, samples):
+    """
+    Predicts seizure labels and class probabilities for a whole block of samples in one call.
+    Labels are derived from the probabilities the same way model.predict does, so the
+    forest is only walked once per batch.
+    """
+    X = as_batch(samples)
+    if len(X) == 0:
+        return np.empty(0, dtype=model.classes_.dtype), np.empty((0, len(model.classes_)))
+    proba = model.predict_proba(X)
+    prediction = model.classes_.take(np.argmax(proba, axis=1), axis=0)
+    return prediction, proba
@@ -0,0 +1,221 @@
+import asyncio
+import os
+import random
+import time
+import numpy as np
+from urllib.parse import urlparse, parse_qs, urlencode
+import websockets
+from encoding import BINARY_PROTOCOL, DELTA_PROTOCOL, JSON_PROTOCOL, DeltaDecoder, decode_message, timestamps_ns
+from inference import predict_batch
+from patient_models import PatientModelStore, predict_grouped
+from replay import OFFSET_HEADER, DATASET_HEADER, resume_token
+import metrics
+
+# Per-stage timings of the client side of the pipeline; recorded only when metrics are enabled
+STAGE_HELP = "Time spent per pipeline stage"
+DECODE_TIME = metrics.histogram("eeg_stage_seconds", STAGE_HELP, stage="client_decode")
+FEATURES_TIME = metrics.histogram("eeg_stage_seconds", STAGE_HELP, stage="features")
+PREDICT_TIME = metrics.histogram("eeg_stage_seconds", STAGE_HELP, stage="predict")
+PUBLISH_TIME = metrics.histogram("eeg_stage_seconds", STAGE_HELP, stage="publish")
+RECEIVE_LAG = metrics.histogram("eeg_receive_lag_seconds", "Newest sample's age when its message is decoded")
+MESSAGES = metrics.counter("eeg_ingest_messages_total", "Messages received from upstream streams")
+SAMPLES = metrics.counter("eeg_ingest_samples_total", "Samples received from upstream streams")
+RECONNECTS = metrics.counter("eeg_ingest_reconnects_total", "Upstream reconnect attempts")
+BATCH_ROWS = metrics.counter("eeg_predict_rows_total", "Samples run through the model")
+
+def parse_streams(spec):
+    """
+    Parses "patient1=ws://host/a,patient2=ws://host/b" into {patient_id: uri}.
+    A bare URI gets its position as the patient id.
+    """
+    streams = {}
+    for i, item in enumerate(filter(None, (part.strip() for part in spec.split(",")))):
+        patient_id, sep, uri = item.partition("=")
+        if not sep or "://" in patient_id:
+            patient_id, uri = str(i), item
+        streams[patient_id] = uri
+    return streams
+
+def streams_from_env(default_uri):
+    """
+    Upstream streams from EEG_STREAMS, or the single default URI.
+    """
+    return parse_streams(os.getenv("EEG_STREAMS", default_uri))
+
+class StreamStats:
+    """
+    Per-stream counters; lag is how far the newest received sample trails the wall clock.
+    """
+    def __init__(self):
+        self.connected = False
+        self.samples = 0
+        self.messages = 0
+        self.reconnects = 0
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.last_error = None
+        self.offset = None  # Replay row after the last sample handed to the predictor
+
+    def as_dict(self):
+        return dict(vars(self))
+
+def with_resume(uri, token):
+    """
+    The stream URI with ?resume=token set (or left as is without a token).
+    """
+    if token is None:
+        return uri
+    parts = urlparse(uri)
+    query = parse_qs(parts.query)
+    query["resume"] = [token]
+    return parts._replace(query=urlencode(query, doseq=True)).geturl()
+
+class IngestService:
+    """
+    Keeps one WebSocket open per patient stream, reconnecting with jittered exponential
+    backoff, and pushes every decoded (patient_id, values, timestamps_ns) block into one
+    shared queue for the predictor. Binary clients offer the quantized delta format first;
+    compression="none" turns off permessage-deflate. After a dropped replay connection,
+    a stream resumes right after the last sample it handed to the predictor.
+    """
+    def __init__(self, streams, queue_size=1024, backoff_initial=0.5, backoff_max=30.0, binary=True,
+                 compression="deflate"):
+        self.streams = dict(streams)
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.subprotocols = [DELTA_PROTOCOL, BINARY_PROTOCOL, JSON_PROTOCOL] if binary else [JSON_PROTOCOL]
+        self.compression = None if compression == "none" else compression
+        self.stats = {patient_id: StreamStats() for patient_id in self.streams}
+        self._running = False
+        metrics.gauge("eeg_ingest_queue_depth", "Decoded blocks waiting for the predictor", self.queue.qsize)
+        metrics.gauge("eeg_ingest_connected_streams", "Upstream streams currently connected",
+                      lambda: sum(stats.connected for stats in self.stats.values()))
+
+    async def run(self):
+        self._running = True
+        await asyncio.gather(*(self._follow(patient_id, uri) for patient_id, uri in self.streams.items()))
+
+    def stop(self):
+        self._running = False
+
+    async def _follow(self, patient_id, uri):
+        stats = self.stats[patient_id]
+        backoff = self.backoff_initial
+        resume = None
+        while self._running:
+            try:
+                async with websockets.connect(with_resume(uri, resume), subprotocols=self.subprotocols,
+                                              compression=self.compression) as websocket:
+                    stats.connected = True
+                    stats.last_error = None  # Healthy again; the reconnect count keeps the history
+                    # Replay streams say where they start; broadcast streams are live and can't resume
+                    dataset = websocket.response.headers.get(DATASET_HEADER)
+                    offset = int(websocket.response.headers.get(OFFSET_HEADER, 0))
+                    # Delta frames depend on the scale/offset sent earlier on the same connection
+                    decode = DeltaDecoder().decode if websocket.subprotocol == DELTA_PROTOCOL else decode_message
+                    backoff = self.backoff_initial  # A successful connect resets the backoff
+                    async for message in websocket:
+                        if not self._running:
+                            break
+                        decode_start = DECODE_TIME.start()
+                        values, timestamps = decode(message)
+                        timestamps = timestamps_ns(timestamps)
+                        DECODE_TIME.stop(decode_start)
+                        stats.messages += 1
+                        stats.samples += len(values)
+                        MESSAGES.inc()
+                        SAMPLES.inc(len(values))
+                        if len(timestamps):
+                            stats.lag = max(0.0, (time.time_ns() - int(timestamps[-1])) / 1e9)
+                            stats.max_lag = max(stats.max_lag, stats.lag)
+                            RECEIVE_LAG.record(stats.lag * 1e9)
+                        # Waiting here when the predictor is behind applies backpressure upstream
+                        await self.queue.put((patient_id, values, timestamps))
+                        if dataset is not None:
+                            offset += len(values)
+                            stats.offset = offset
+                            resume = resume_token(dataset, offset)
+                    if websocket.close_code == 1000:
+                        resume = None  # The replay ran to its end; the next one starts over
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                stats.last_error = str(e)
+            stats.connected = False
+            if not self._running:
+                break
+            stats.reconnects += 1
+            RECONNECTS.inc()
+            await asyncio.sleep(backoff * random.uniform(0.5, 1.0))
+            backoff = min(backoff * 2, self.backoff_max)
+
+def predict_blocks(model, blocks, extractor=None):
+    """
+    Runs the windowing stage (when given a FeatureExtractor) and the model over one drained
+    batch. A PatientModelStore runs one call per distinct patient model instead. Returns
+    (predictions, probabilities, classes, features); classes are the probability columns.
+    """
+    # Resolved here, off the event loop, since a hot swap loads the new model file
+    current = model() if callable(model) else model
+    start = FEATURES_TIME.start()
+    features = extractor.push(blocks) if extractor is not None else None
+    FEATURES_TIME.stop(start)
+    start = PREDICT_TIME.start()
+    if isinstance(current, PatientModelStore):
+        predictions, proba = predict_grouped(current, blocks)
+    else:
+        predictions, proba = predict_batch(current, np.concatenate([values for _, values, _ in blocks]))
+    PREDICT_TIME.stop(start)
+    BATCH_ROWS.inc(len(predictions))
+    return predictions, proba, current.classes_, features
+
+async def next_batch(queue, max_rows, max_delay):
+    """
+    Waits for a block, then keeps collecting blocks until max_rows samples are in hand or
+    max_delay seconds have passed since the first one.
+    """
+    blocks = [await queue.get()]
+    rows = len(blocks[0][1])
+    deadline = asyncio.get_running_loop().time() + max_delay
+    while rows < max_rows:
+        if queue.empty():
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                block = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+        else:
+            block = queue.get_nowait()
+        blocks.append(block)
+        rows += len(block[1])
+    return blocks
+
+async def predict_stream(queue, model, on_result, max_rows=8192, max_delay=0.01, extractor=None, on_features=None):
+    """
+    Micro-batches queued blocks (up to max_rows samples, waiting at most max_delay seconds
+    for more once one arrives), runs a single vectorized prediction off the event loop, then
+    hands each block's slice of the results to
+    on_result(patient_id, values, timestamps, predictions, probabilities, classes), where
+    classes are the labels of the probability columns of the model that was used.
+    With a FeatureExtractor, the same batch also goes through the sliding-window stage and
+    every completed window is passed to on_features(patient_id, timestamp, features).
+    model may also be a zero-argument callable (e.g. model_registry.get_model), looked up
+    in the worker thread before every batch so a hot-swapped model takes effect without restarting the stream,
+    or a PatientModelStore to score every patient with their own model.
+    """
+    while True:
+        blocks = await next_batch(queue, max_rows, max_delay)
+        predictions, proba, classes, features = await asyncio.to_thread(predict_blocks, model, blocks, extractor)
+        publish_start = PUBLISH_TIME.start()
+        if features is not None and on_features is not None:
+            for patient_id, timestamp, row in zip(*features):
+                on_features(patient_id, timestamp, row)
+        start = 0
+        for patient_id, values, timestamps in blocks:
+            stop = start + len(values)
+            on_result(patient_id, values, timestamps, predictions[start:stop], proba[start:stop], classes)
+            start = stop
+        PUBLISH_TIME.stop(publish_start)
@@ -0,0 +1,93 @@
+import numpy as np
+
+# Reference tables are written to 1e-9 precision, so that is the default grid for exact hits
+DEFAULT_QUANTUM = 1e-9
+
+# Odd 64-bit multipliers for mixing quantized columns into one row hash
+_HASH_MULTIPLIERS = np.array([
+    0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93,
+    0xFF51AFD7ED558CCD, 0xC4CEB9FE1A85EC53, 0x94D049BB133111EB, 0xBF58476D1CE4E5B9,
+], dtype=np.uint64)
+
+class ReferenceIndex:
+    """
+    Index over a reference table of EEG rows. Exact lookups quantize rows to a grid and
+    binary-search a sorted array of 64-bit row hashes, so float noise below half a quantum
+    still matches. Tolerance lookups use a KD-tree (built on first use). All lookups take
+    a batch of queries.
+    """
+    def __init__(self, table, quantum=DEFAULT_QUANTUM):
+        self.table = np.asarray(table, dtype=np.float64)
+        if self.table.ndim != 2:
+            raise ValueError("reference table must be 2-D")
+        if self.table.shape[1] > len(_HASH_MULTIPLIERS):
+            raise ValueError(f"at most {len(_HASH_MULTIPLIERS)} columns are supported")
+        self.quantum = quantum
+        self.keys = self._quantize(self.table)
+        hashes = self._hash(self.keys)
+        self.order = np.argsort(hashes, kind="stable")
+        self.sorted_hashes = hashes[self.order]
+        self._tree = None
+
+    @property
+    def n_columns(self):
+        return self.table.shape[1]
+
+    def _as_queries(self, queries):
+        queries = np.asarray(queries, dtype=np.float64)
+        if queries.ndim == 1:
+            queries = queries.reshape(1, -1)
+        if queries.shape[1] != self.n_columns:
+            raise ValueError(f"expected {self.n_columns} values per query, got {queries.shape[1]}")
+        return queries
+
+    def _quantize(self, rows):
+        return np.rint(rows / self.quantum).astype(np.int64)
+
+    def _hash(self, keys):
+        with np.errstate(over="ignore"):
+            mixed = keys.view(np.uint64) * _HASH_MULTIPLIERS[:keys.shape[1]]
+            h = np.bitwise_xor.reduce(mixed, axis=1)
+            return h ^ (h >> np.uint64(31))
+
+    def find(self, queries):
+        """
+        Returns the table row index of an exact (quantized) match for every query, or -1.
+        """
+        keys = self._quantize(self._as_queries(queries))
+        hashes = self._hash(keys)
+        left = np.searchsorted(self.sorted_hashes, hashes, side="left")
+        right = np.searchsorted(self.sorted_hashes, hashes, side="right")
+        found = np.full(len(keys), -1, dtype=np.int64)
+
+        # Candidates share the hash; confirm on the quantized values (almost always one candidate)
+        for offset in range(int((right - left).max(initial=0))):
+            candidate = left + offset
+            pending = (found < 0) & (candidate < right)
+            if not pending.any():
+                break
+            rows = self.order[candidate[pending]]
+            equal = (self.keys[rows] == keys[pending]).all(axis=1)
+            found[np.flatnonzero(pending)[equal]] = rows[equal]
+        return found
+
+    def contains(self, queries):
+        return self.find(queries) >= 0
+
+    @property
+    def tree(self):
+        if self._tree is None:
+            from scipy.spatial import cKDTree
+            self._tree = cKDTree(self.table)
+        return self._tree
+
+    def nearest(self, queries, tolerance=None):
+        """
+        Returns (distances, row indices) of the nearest reference row for every query.
+        With a tolerance, rows farther away than it come back as index -1.
+        """
+        queries = self._as_queries(queries)
+        upper = np.inf if tolerance is None else tolerance
+        distances, indices = self.tree.query(queries, k=1, distance_upper_bound=upper)
+        indices = np.where(np.isfinite(distances), indices, -1)
+        return distances, indices.astype(np.int64)
@@ -1,23 +1,26 @@
+import importlib
 import streamlit as st
-from page1 import page_1
-from page2 import page_2
-from page3 import page_3
-from page4 import page_4
+
+# Sidebar label -> (module, function). Page modules are imported on first selection only,
+# so opening Home doesn't pay for the Prediction page's numpy/model imports.
+PAGES = {
+    "Home": ("page1", "page_1"),
+    "About Epilepsy": ("page4", "page_4"),
+    "Prediction": ("page2", "page_2"),
+    "Precautions": ("page3", "page_3"),
+}
+
+def load_page(name):
+    module, function = PAGES[name]
+    return getattr(importlib.import_module(module), function)  # Cached in sys.modules after the first run
 
 def main():
     # Define a sidebar navigation menu
     st.sidebar.title("Navigation")
-    page_selection = st.sidebar.selectbox("Go to", ["Home","About Epilepsy","Prediction", "Precautions"])
+    page_selection = st.sidebar.selectbox("Go to", list(PAGES))
 
     # Display the selected page
-    if page_selection == "Home":
-        page_1()
-    elif page_selection == "About Epilepsy":
-        page_4()
-    elif page_selection == "Prediction":
-        page_2()
-    elif page_selection == "Precautions":
-        page_3()
+    load_page(page_selection)()
 
 if __name__ == "__main__":
     main()
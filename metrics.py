@@ -0,0 +1,217 @@
+"""
+Stage timings and counters for the stream -> predict pipeline, served as Prometheus text.
+
+Instrumentation is off unless METRICS_PORT is set (or enable() is called); while off, every
+record/inc/start/stop returns straight away, so hooks can stay in the hot loops.
+
+    stage = histogram("eeg_stage_seconds", "Time spent per pipeline stage", stage="decode")
+    start = stage.start()
+    ...
+    stage.stop(start)
+"""
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+# Linear sub-buckets per power of two; bounds the relative error of a recorded value to 1/32
+SUB_BUCKET_BITS = 6
+_HALF = 1 << (SUB_BUCKET_BITS - 1)
+# Values are tracked in nanoseconds up to 2**40 ns (~18 minutes); larger ones land in the top bucket
+MAX_BITS = 40
+N_BUCKETS = (MAX_BITS - SUB_BUCKET_BITS + 2) * _HALF
+QUANTILES = (0.5, 0.9, 0.95, 0.99, 0.999)
+
+_enabled = bool(os.getenv("METRICS_PORT"))
+_lock = threading.Lock()
+_families = {}  # name -> (type, help, {label tuple: metric})
+
+def enabled():
+    return _enabled
+
+def enable(on=True):
+    global _enabled
+    _enabled = on
+
+def bucket_index(value):
+    """
+    HDR-style log-linear bucket of a non-negative integer: exact below 2**SUB_BUCKET_BITS,
+    then 2**(SUB_BUCKET_BITS - 1) equal-width buckets per power of two.
+    """
+    exponent = max(0, value.bit_length() - SUB_BUCKET_BITS)
+    return min(exponent * _HALF + (value >> exponent), N_BUCKETS - 1)
+
+def bucket_value(index):
+    """
+    Midpoint of a bucket, the value reported for everything recorded in it.
+    """
+    exponent = max(0, index // _HALF - 1)
+    mantissa = index - exponent * _HALF
+    return ((mantissa << exponent) + (mantissa + 1 << exponent)) / 2 if exponent else float(mantissa)
+
+def _register(kind, name, help, labels, factory):
+    key = tuple(sorted(labels.items()))
+    with _lock:
+        family = _families.setdefault(name, (kind, help, {}))
+        if family[0] != kind:
+            raise ValueError(f"{name} is already registered as a {family[0]}")
+        metric = family[2].get(key)
+        if metric is None:
+            metric = family[2][key] = factory()
+        return metric
+
+class Histogram:
+    """
+    Latency histogram in nanoseconds with fixed-size log-linear buckets (no allocation per
+    record) and quantiles computed at scrape time.
+    """
+    def __init__(self):
+        self.counts = [0] * N_BUCKETS
+        self.count = 0
+        self.sum = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        return time.perf_counter_ns() if _enabled else 0
+
+    def stop(self, start):
+        if _enabled and start:
+            self.record(time.perf_counter_ns() - start)
+
+    def record(self, value_ns):
+        if not _enabled:
+            return
+        value_ns = max(0, int(value_ns))
+        index = bucket_index(value_ns)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value_ns
+
+    def record_many(self, values_ns):
+        """
+        Records an array of values at once (e.g. the latency of every sample in a batch).
+        """
+        if not _enabled:
+            return
+        values = np.asarray(values_ns, dtype=np.float64)
+        values = np.maximum(values[np.isfinite(values)], 0).astype(np.int64)
+        if not len(values):
+            return
+        bit_length = np.frexp(values.astype(np.float64))[1]  # Exact for values below 2**53
+        exponent = np.maximum(0, bit_length.astype(np.int64) - SUB_BUCKET_BITS)
+        indices = np.minimum(exponent * _HALF + (values >> exponent), N_BUCKETS - 1)
+        binned = np.bincount(indices, minlength=N_BUCKETS)
+        with self._lock:
+            for index in np.flatnonzero(binned):
+                self.counts[index] += int(binned[index])
+            self.count += len(values)
+            self.sum += int(values.sum())
+
+    def quantiles(self, quantiles=QUANTILES):
+        with self._lock:
+            counts = np.array(self.counts)
+        total = counts.sum()
+        if not total:
+            return {q: float("nan") for q in quantiles}
+        cumulative = np.cumsum(counts)
+        return {q: bucket_value(int(np.searchsorted(cumulative, q * total))) for q in quantiles}
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        if _enabled:
+            with self._lock:
+                self.value += amount
+
+class Gauge:
+    """
+    Read at scrape time from a callback, so keeping it current costs the hot path nothing.
+    """
+    def __init__(self, fn):
+        self.fn = fn
+
+    @property
+    def value(self):
+        return self.fn()
+
+def histogram(name, help, **labels):
+    """
+    A timing histogram; rendered in seconds as a Prometheus summary.
+    """
+    return _register("summary", name, help, labels, Histogram)
+
+def counter(name, help, **labels):
+    return _register("counter", name, help, labels, Counter)
+
+def gauge(name, help, fn, **labels):
+    """
+    A gauge reading fn() when scraped. Registering the same name and labels again replaces
+    the callback (e.g. for a new queue after a restart).
+    """
+    metric = _register("gauge", name, help, labels, lambda: Gauge(fn))
+    metric.fn = fn
+    return metric
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v)}"' for k, v in pairs) + "}"
+
+def render():
+    """
+    Every registered metric in the Prometheus text exposition format.
+    """
+    lines = []
+    with _lock:
+        families = {name: (kind, help, dict(metrics)) for name, (kind, help, metrics) in _families.items()}
+    for name, (kind, help, metrics) in sorted(families.items()):
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+        for key, metric in metrics.items():
+            if kind == "summary":
+                for q, value in metric.quantiles().items():
+                    value = "NaN" if value != value else f"{value / 1e9:.9g}"
+                    lines.append(f"{name}{_format_labels(key, [('quantile', q)])} {value}")
+                lines.append(f"{name}_sum{_format_labels(key)} {metric.sum / 1e9:.9g}")
+                lines.append(f"{name}_count{_format_labels(key)} {metric.count}")
+            else:
+                try:
+                    value = metric.value
+                except Exception:
+                    continue  # A gauge whose source is gone
+                lines.append(f"{name}{_format_labels(key)} {value}")
+    return "\n".join(lines) + "\n"
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes every few seconds would flood the log
+
+def serve(port=None, host="127.0.0.1"):
+    """
+    Starts the /metrics endpoint on a daemon thread (port defaults to METRICS_PORT) and
+    enables recording. Returns the server, or None when no port is configured.
+    """
+    port = port if port is not None else os.getenv("METRICS_PORT")
+    if not port:
+        return None
+    server = ThreadingHTTPServer((os.getenv("METRICS_HOST", host), int(port)), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    enable()
+    return server
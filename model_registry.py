@@ -0,0 +1,125 @@
+"""
+Process-wide model registry: each model file is loaded and warmed up once per process,
+shared by every caller, and hot-swapped when the file on disk changes.
+
+For forked servers (e.g. gunicorn --preload), call preload() in the parent before
+forking; the workers then share the model's read-only arrays copy-on-write.
+"""
+import os
+import pickle
+import threading
+import time
+import numpy as np
+from inference import predict_batch
+
+DEFAULT_MODEL_PATH = os.getenv("MODEL_PATH", "EE_model.pkl")
+# Seconds between checks of the model file for a newer version
+CHECK_INTERVAL = float(os.getenv("MODEL_CHECK_INTERVAL", 5.0))
+WARMUP_ROWS = 64
+
+def file_stamp(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+def load_model_file(path):
+    """
+    Loads a pickled sklearn model, or an exported flat forest (.npz) without sklearn.
+    """
+    if path.endswith(".npz"):
+        from forest import FlatForest
+        return FlatForest.load(path)
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+def warm_up(model):
+    """
+    Runs one dummy batch so the first real request doesn't pay for lazy initialisation.
+    """
+    predict_batch(model, np.zeros((WARMUP_ROWS, model.n_features_in_), dtype=np.float32))
+
+class LoadedModel:
+    def __init__(self, model, stamp, load_seconds):
+        self.model = model
+        self.stamp = stamp
+        self.load_seconds = load_seconds
+        self.loaded_at = time.time()
+        self.checked_at = time.monotonic()
+
+class ModelRegistry:
+    def __init__(self, check_interval=CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    def _load(self, path):
+        start = time.perf_counter()
+        stamp = file_stamp(path)
+        model = load_model_file(path)
+        warm_up(model)
+        return LoadedModel(model, stamp, time.perf_counter() - start)
+
+    def get(self, path=None):
+        """
+        Returns the model for path, loading it on first use and reloading it when the file
+        has changed (checked at most every check_interval seconds). Until a new version is
+        fully loaded and warmed up, callers keep getting the old one.
+        """
+        path = path or DEFAULT_MODEL_PATH
+        entry = self._entries.get(path)
+        if entry is not None:
+            if time.monotonic() - entry.checked_at < self.check_interval:
+                return entry.model
+            entry.checked_at = time.monotonic()
+            try:
+                if file_stamp(path) == entry.stamp:
+                    return entry.model
+            except OSError:
+                return entry.model  # File briefly missing mid-replace; keep serving the old model
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(path, threading.Lock())
+        with load_lock:
+            current = self._entries.get(path)
+            if current is not entry and current is not None:
+                return current.model  # Another thread loaded it meanwhile
+            try:
+                loaded = self._load(path)
+            except Exception:
+                if entry is not None:
+                    return entry.model  # A half-written replacement; retry on the next check
+                raise
+            self._entries[path] = loaded
+            return loaded.model
+
+    def reload(self, path=None):
+        """
+        Forces a reload on the next get().
+        """
+        entry = self._entries.get(path or DEFAULT_MODEL_PATH)
+        if entry is not None:
+            entry.stamp = None
+            entry.checked_at = 0.0
+
+    def info(self, path=None):
+        entry = self._entries.get(path or DEFAULT_MODEL_PATH)
+        if entry is None:
+            return None
+        return {"load_seconds": entry.load_seconds, "loaded_at": entry.loaded_at, "type": type(entry.model).__name__}
+
+_registry = ModelRegistry()
+
+def get_model(path=None):
+    return _registry.get(path)
+
+def reload_model(path=None):
+    _registry.reload(path)
+
+def model_info(path=None):
+    return _registry.info(path)
+
+def preload(path=None):
+    """
+    Loads and warms the model now, e.g. in a pre-fork parent process.
+    """
+    return _registry.get(path)
@@ -1,14 +1,26 @@
 import streamlit as st
 import time
-import random
-import pickle
-from values import seiz, no_seiz,predict_seizure
+import collections
+import numpy as np
+from inference import predict_batch
+from model_registry import get_model
 
-model = pickle.load(open('EE_model.pkl', 'rb'))
-def pred(input_data):
-    inputt = np.array(input_data).reshape(1,-1)
-    prediction = model.predict(inputt)[0]
-    return prediction
+def pred(input_data, model=None):
+    prediction, _ = predict_batch(get_model() if model is None else model, input_data)
+    return prediction[0]
+
+def timed_pred(input_data):
+    """
+    Runs the prediction and records its latency (model call only) in this session's history.
+    """
+    model = get_model()
+    start = time.perf_counter()
+    prediction = pred(input_data, model)
+    latency = time.perf_counter() - start
+    if 'latencies' not in st.session_state:
+        st.session_state.latencies = collections.deque(maxlen=1000)
+    st.session_state.latencies.append(latency)
+    return prediction, latency
 
 def page_2():
     st.title('Epileptic Seizure Prediction')
@@ -20,13 +32,15 @@ def page_2():
     val5 = st.number_input('P7-O1', min_value=0.000005670000000, max_value=0.000145934000000, format="%.15f")
     val6 = st.number_input('P7-T7', min_value=-0.000067000000000, max_value=0.000012700000000, format="%.15f")
     val7 = st.number_input('T8-P8-0', min_value=-0.000179145000000, max_value=0.000115067000000, format="%.15f")
-    input_data = [val1, val2, val3, val4, val5, val6, val7]
+    val8 = st.number_input('T8-P8-1', min_value=-0.000179145000000, max_value=0.000115067000000, format="%.15f")
+    input_data = [val1, val2, val3, val4, val5, val6, val7, val8]
     
     if st.button('Predict'):
-        with st.spinner("Predicting..."):
-            delay = random.randint(5, 10)
-            time.sleep(delay)
-            prediction = predict_seizure(input_data)   
+        prediction, latency = timed_pred(input_data)
+        latencies = np.array(st.session_state.latencies) * 1e3
+        st.caption(f"Inference took {latency * 1e3:.2f} ms "
+                   f"(session p50 {np.percentile(latencies, 50):.2f} ms, p99 {np.percentile(latencies, 99):.2f} ms "
+                   f"over {len(latencies)} predictions)")
         if prediction == 0:
             st.error('A seizure is going to occur in a few minutes. Take necessary precautions!!!')
             st.write("**Take a look at the Precautions section for more information.**")
@@ -0,0 +1,226 @@
+"""
+Per-patient models, loaded on demand and kept in an LRU cache bounded by memory.
+
+A patient's model is <model_dir>/<patient_id>.npz (exported flat forest, preferred) or
+<model_dir>/<patient_id>.pkl. Patients without one, or whose model fails to load, are
+scored by the global model (model_registry.get_model by default).
+
+    store = PatientModelStore("models/patients", max_bytes=512 << 20)
+    predictions, proba = predict_grouped(store, blocks)
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from inference import predict_batch
+from model_registry import CHECK_INTERVAL, file_stamp, get_model, load_model_file, warm_up
+import metrics
+
+PATIENT_MODEL_DIR = os.getenv("PATIENT_MODEL_DIR")
+# Memory budget for cached per-patient models
+CACHE_BYTES = int(float(os.getenv("PATIENT_MODEL_CACHE_MB", 512)) * (1 << 20))
+EXTENSIONS = (".npz", ".pkl")
+
+LOAD_TIME = metrics.histogram("eeg_patient_model_load_seconds", "Time to load and warm up a per-patient model")
+
+def model_nbytes(model):
+    """
+    Approximate in-memory size of a model: the tree arrays of a flat or sklearn forest.
+    """
+    if hasattr(model, "estimators_"):
+        total = 0
+        for estimator in model.estimators_:
+            state = estimator.tree_.__getstate__()
+            total += state["nodes"].nbytes + state["values"].nbytes
+        return total
+    return sum(value.nbytes for value in vars(model).values() if isinstance(value, np.ndarray))
+
+class CachedModel:
+    def __init__(self, model, path, stamp, nbytes):
+        self.model = model
+        self.path = path
+        self.stamp = stamp
+        self.nbytes = nbytes
+        self.checked_at = time.monotonic()
+
+class PatientModelStore:
+    """
+    Patient ID -> model, with an LRU cache that evicts least recently used models once the
+    cached models' total size exceeds max_bytes. Model files are re-checked at most every
+    check_interval seconds and reloaded when they change, like the global registry.
+    """
+    def __init__(self, model_dir, max_bytes=CACHE_BYTES, fallback=get_model, check_interval=CHECK_INTERVAL):
+        self.model_dir = model_dir
+        self.max_bytes = max_bytes
+        self.fallback = fallback
+        self.check_interval = check_interval
+        self._cache = OrderedDict()  # patient_id -> CachedModel, least recently used first
+        self._missing = {}  # patient_id -> when we last found no model file
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+        self.loads = 0
+        self.load_errors = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+        self.max_load_seconds = 0.0
+        metrics.gauge("eeg_patient_models_cached", "Per-patient models in memory", lambda: len(self._cache))
+        metrics.gauge("eeg_patient_models_cached_bytes", "Memory held by cached per-patient models", lambda: self.bytes)
+        metrics.gauge("eeg_patient_model_hits", "Per-patient model cache hits", lambda: self.hits)
+        metrics.gauge("eeg_patient_model_misses", "Per-patient model cache misses", lambda: self.misses)
+        metrics.gauge("eeg_patient_model_evictions", "Per-patient models evicted for memory", lambda: self.evictions)
+
+    def _fallback(self):
+        self.fallbacks += 1
+        return self.fallback() if callable(self.fallback) else self.fallback
+
+    @property
+    def classes_(self):
+        # Every patient model is checked to have the global model's classes when it loads
+        fallback = self.fallback() if callable(self.fallback) else self.fallback
+        return fallback.classes_
+
+    def path_for(self, patient_id):
+        for extension in EXTENSIONS:
+            path = os.path.join(self.model_dir, f"{patient_id}{extension}")
+            if os.path.exists(path):
+                return path
+        return None
+
+    def get(self, patient_id):
+        """
+        Returns the patient's own model, loading it on a miss, or the global model when
+        the patient has none.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(patient_id)
+            if entry is not None:
+                self._cache.move_to_end(patient_id)
+                if now - entry.checked_at < self.check_interval:
+                    self.hits += 1
+                    return entry.model
+                entry.checked_at = now
+            missing = entry is None and now - self._missing.get(patient_id, -np.inf) < self.check_interval
+        if missing:
+            return self._fallback()  # No model file as of the last check
+        if entry is not None:
+            try:
+                if file_stamp(entry.path) == entry.stamp:
+                    self.hits += 1
+                    return entry.model
+            except OSError:
+                self.hits += 1
+                return entry.model  # File briefly missing mid-replace; keep serving the old model
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(patient_id, threading.Lock())
+        with load_lock:
+            current = self._cache.get(patient_id)
+            if current is not entry and current is not None:
+                self.hits += 1
+                return current.model  # Another thread loaded it meanwhile
+            self.misses += 1
+            path = self.path_for(patient_id)
+            if path is None:
+                with self._lock:
+                    self._missing[patient_id] = time.monotonic()
+                    if entry is not None:
+                        self._remove(patient_id)
+                return self._fallback()
+            try:
+                loaded = self._load(path)
+            except Exception:
+                self.load_errors += 1
+                with self._lock:
+                    self._missing[patient_id] = time.monotonic()  # Retried after check_interval
+                return entry.model if entry is not None else self._fallback()
+            with self._lock:
+                self._missing.pop(patient_id, None)
+                if patient_id in self._cache:
+                    self._remove(patient_id)
+                self._cache[patient_id] = loaded
+                self.bytes += loaded.nbytes
+                self._evict(keep=patient_id)
+            return loaded.model
+
+    def _load(self, path):
+        start = time.perf_counter()
+        stamp = file_stamp(path)
+        model = load_model_file(path)
+        fallback = self.fallback() if callable(self.fallback) else self.fallback
+        if fallback is not None and not np.array_equal(model.classes_, fallback.classes_):
+            # Results are read by class position (e.g. the seizure column), so they must agree
+            raise ValueError(f"{path} has classes {list(model.classes_)}, the global model {list(fallback.classes_)}")
+        warm_up(model)
+        seconds = time.perf_counter() - start
+        self.loads += 1
+        self.load_seconds += seconds
+        self.max_load_seconds = max(self.max_load_seconds, seconds)
+        LOAD_TIME.record(seconds * 1e9)
+        return CachedModel(model, path, stamp, model_nbytes(model))
+
+    def _remove(self, patient_id):
+        self.bytes -= self._cache.pop(patient_id).nbytes
+
+    def _evict(self, keep):
+        # A single model larger than the budget is still kept until the next load evicts it
+        while self.bytes > self.max_bytes and len(self._cache) > 1:
+            patient_id = next(iter(self._cache))
+            if patient_id == keep:
+                self._cache.move_to_end(patient_id)
+                continue
+            self._remove(patient_id)
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "models": len(self._cache),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "fallbacks": self.fallbacks,
+                "loads": self.loads,
+                "load_errors": self.load_errors,
+                "evictions": self.evictions,
+                "mean_load_seconds": self.load_seconds / self.loads if self.loads else None,
+                "max_load_seconds": self.max_load_seconds,
+            }
+
+def predict_grouped(store, blocks):
+    """
+    Predicts a drained batch of (patient_id, values, timestamps) blocks with one vectorized
+    call per distinct model; patients without a model of their own share one call on the
+    global model. Results come back in block order, as from a single predict_batch.
+    """
+    models = {}
+    groups = {}  # id(model) -> (model, block indices)
+    for i, (patient_id, _, _) in enumerate(blocks):
+        if patient_id not in models:
+            models[patient_id] = store.get(patient_id)
+        model = models[patient_id]
+        groups.setdefault(id(model), (model, []))[1].append(i)
+
+    if len(groups) == 1:
+        model, _ = next(iter(groups.values()))
+        return predict_batch(model, np.concatenate([values for _, values, _ in blocks]))
+
+    offsets = np.cumsum([0] + [len(values) for _, values, _ in blocks])
+    predictions = proba = None
+    for model, indices in groups.values():
+        rows = np.concatenate([np.arange(offsets[i], offsets[i + 1]) for i in indices])
+        group_predictions, group_proba = predict_batch(model, np.concatenate([blocks[i][1] for i in indices]))
+        if predictions is None:
+            predictions = np.empty(offsets[-1], dtype=group_predictions.dtype)
+            proba = np.empty((offsets[-1], group_proba.shape[1]))
+        predictions[rows] = group_predictions
+        proba[rows] = group_proba
+    return predictions, proba
@@ -0,0 +1,194 @@
+"""
+Fetches and verifies the dataset CSV, meant to run alongside server startup.
+
+Sources, in order of preference:
+
+    DATASET_DIR=/mnt/mirror        a local directory holding a copy (air-gapped and test deployments)
+    DATASET_URL=http://host/x.csv  an HTTP(S) mirror; partial downloads resume with Range requests
+    (default)                      the Google Drive file, through gdown (which also resumes)
+
+With DATASET_SHA256 set, the file's SHA-256 must match it. Without it, a file is accepted
+when its last row is complete, since a truncated download almost never stops on a row
+boundary. Either way, the result is recorded in <csv>.verified together with the file's
+size and mtime, so later starts skip re-reading an unchanged multi-GB file.
+
+Downloads go to a staging file and are renamed into place only once verified, so readers
+never see a partial dataset, and an older good copy keeps being served until then.
+
+    python provision.py datasets/chbmit_preprocessed_data.csv
+"""
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+import urllib.error
+import urllib.request
+
+DATASET_URL = os.getenv("DATASET_URL")
+DATASET_DIR = os.getenv("DATASET_DIR")
+DATASET_SHA256 = os.getenv("DATASET_SHA256")
+DOWNLOAD_CHUNK_BYTES = 1 << 20
+HASH_CHUNK_BYTES = 8 << 20
+# Download attempts before giving up; each one resumes where the previous one stopped
+FETCH_ATTEMPTS = 5
+# Bytes read from the end of the file to check its last row
+TAIL_BYTES = 1 << 16
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_BYTES):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def stamp_path(path):
+    return path + ".verified"
+
+def read_stamp(path):
+    """
+    Returns the recorded verification of path if the file hasn't changed since, else None.
+    """
+    try:
+        with open(stamp_path(path)) as f:
+            stamp = json.load(f)
+        stat = os.stat(path)
+        if stamp["size"] == stat.st_size and stamp["mtime_ns"] == stat.st_mtime_ns:
+            return stamp
+    except (OSError, ValueError, KeyError):
+        pass
+    return None
+
+def write_stamp(path, sha256=None):
+    stat = os.stat(path)
+    stamp = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256}
+    with open(stamp_path(path) + ".tmp", "w") as f:
+        json.dump(stamp, f)
+    os.replace(stamp_path(path) + ".tmp", stamp_path(path))
+    return stamp
+
+def looks_complete(path):
+    """
+    Cheap truncation check for a CSV: it ends with a newline and its last row has as many
+    fields as the header.
+    """
+    with open(path, "rb") as f:
+        header = f.readline()
+        size = f.seek(0, os.SEEK_END)
+        if size <= len(header):
+            return False
+        f.seek(max(len(header), size - TAIL_BYTES))
+        tail = f.read()
+    if not tail.endswith(b"\n"):
+        return False
+    last_row = tail.rstrip(b"\r\n").rsplit(b"\n", 1)[-1]
+    return last_row.count(b",") == header.count(b",")
+
+def verify(path, expected_sha256=None):
+    """
+    True when path is a complete copy of the dataset (matching expected_sha256 if given).
+    Reuses the recorded result for an unchanged file; records a new one on success.
+    """
+    expected_sha256 = expected_sha256.lower() if expected_sha256 else None
+    stamp = read_stamp(path)
+    if stamp is not None and (expected_sha256 is None or stamp["sha256"] == expected_sha256):
+        return True
+    if expected_sha256 is not None:
+        sha256 = sha256_file(path)
+        if sha256 != expected_sha256:
+            return False
+        write_stamp(path, sha256)
+        return True
+    if not looks_complete(path):
+        return False
+    write_stamp(path)
+    return True
+
+def download_http(url, dest, timeout=30):
+    """
+    Downloads url to dest, resuming from dest's current size with a Range request. Servers
+    that ignore the range (200 instead of 206) are read again from the start.
+    """
+    start = os.path.getsize(dest) if os.path.exists(dest) else 0
+    request = urllib.request.Request(url, headers={"Range": f"bytes={start}-"} if start else {})
+    try:
+        response = urllib.request.urlopen(request, timeout=timeout)
+    except urllib.error.HTTPError as e:
+        if e.code == 416:
+            return dest  # Nothing left past what we already have
+        raise
+    with response:
+        if response.status == 206:
+            total = response.headers.get("Content-Range", "").rpartition("/")[2]  # bytes start-end/total
+            mode = "ab"
+        else:
+            total = response.headers.get("Content-Length", "")
+            mode = "wb"
+        total = int(total) if total.isdigit() else None
+        with open(dest, mode) as f:
+            while chunk := response.read(DOWNLOAD_CHUNK_BYTES):
+                f.write(chunk)
+    if total is not None and os.path.getsize(dest) != total:
+        raise OSError(f"download of {url} stopped at {os.path.getsize(dest)} of {total} bytes")
+    return dest
+
+def copy_local(directory, path, dest):
+    """
+    Brings the file of the same name from a local mirror directory to dest: a hard link
+    when both are on one filesystem (instant), a copy otherwise. The mirror's own
+    .verified record carries over when the file is unchanged, so it isn't hashed again.
+    """
+    source = os.path.join(directory, os.path.basename(path))
+    if os.path.exists(dest):
+        os.remove(dest)
+    try:
+        os.link(source, dest)
+    except OSError:
+        shutil.copy2(source, dest)
+    stamp = read_stamp(source)
+    if stamp is not None:
+        stat = os.stat(dest)
+        if (stat.st_size, stat.st_mtime_ns) == (stamp["size"], stamp["mtime_ns"]):
+            write_stamp(dest, stamp["sha256"])
+    return dest
+
+def provision(path, url=DATASET_URL, directory=DATASET_DIR, expected_sha256=DATASET_SHA256, drive_id=None):
+    """
+    Makes sure a verified copy of the dataset is at path, fetching it if needed. Returns a
+    one-line description of what was done.
+    """
+    if os.path.exists(path) and verify(path, expected_sha256):
+        return f"Dataset at {path} verified."
+    problem = "failed verification" if os.path.exists(path) else "not found"
+
+    staging = path + ".part"
+    if directory:
+        source = f"mirror directory {directory}"
+        copy_local(directory, path, staging)
+    elif url or drive_id:
+        source = url or f"Google Drive file {drive_id}"
+        for attempt in range(FETCH_ATTEMPTS):
+            try:
+                if url:
+                    download_http(url, staging)
+                else:
+                    import gdown
+                    gdown.download(id=drive_id, output=staging, quiet=True, resume=True)
+                break
+            except Exception:
+                if attempt == FETCH_ATTEMPTS - 1:
+                    raise
+                time.sleep(2 ** attempt)  # The partial file stays; the next attempt resumes it
+    else:
+        raise OSError(f"dataset {path} {problem} and no source is configured")
+
+    if not verify(staging, expected_sha256):
+        os.remove(staging)  # Corrupt or incomplete; the next attempt starts from scratch
+        raise OSError(f"dataset from {source} failed verification")
+    os.replace(staging, path)
+    os.replace(stamp_path(staging), stamp_path(path))
+    return f"Dataset {problem} at {path}; fetched from {source} and verified."
+
+if __name__ == "__main__":
+    print(provision(sys.argv[1]))
@@ -0,0 +1,154 @@
+import asyncio
+import os
+import time
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+
+# Each client gets its own replay from row 0, or joins the one shared live stream
+MODES = ("replay", "broadcast")
+# Sampling rate of the recording, for seeking by time (?start_s=, ?end_s=); CHB-MIT is 256 Hz
+DATASET_RATE_HZ = float(os.getenv("DATASET_RATE_HZ", 256))
+# Handshake response headers telling a replay client where its stream starts
+OFFSET_HEADER = "X-Replay-Offset"
+DATASET_HEADER = "X-Replay-Dataset"
+
+class ReplaySettings:
+    """
+    How fast and in what frame size the dataset is replayed. Defaults come from the
+    environment and can be overridden per connection with ?rate=256&speed=100&frame=256
+    (and ?mode=broadcast to join the shared stream, which uses the server's settings).
+
+    A replay can start and stop at a row (?offset=&end=) or a recording time in seconds
+    (?start_s=&end_s=), or pick up where an earlier one left off (?resume=<token>).
+    """
+    def __init__(self, rate_hz=0.1, speed=1.0, samples_per_frame=1, mode="replay",
+                 start_row=0, end_row=None, resume=None):
+        if rate_hz <= 0 or speed <= 0 or samples_per_frame < 1:
+            raise ValueError("rate, speed and samples per frame must be positive")
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}")
+        if start_row < 0 or (end_row is not None and end_row < start_row):
+            raise ValueError("the replay range must be non-negative and end after it starts")
+        self.rate_hz = rate_hz
+        self.speed = speed
+        self.samples_per_frame = samples_per_frame
+        self.mode = mode
+        self.start_row = start_row
+        self.end_row = end_row
+        self.resume = resume
+
+    @property
+    def sample_period_ns(self):
+        """
+        Wall-clock spacing of consecutive samples, after the speed multiplier.
+        """
+        return int(1e9 / (self.rate_hz * self.speed))
+
+    @property
+    def frame_interval(self):
+        return self.samples_per_frame / (self.rate_hz * self.speed)
+
+    @classmethod
+    def from_env(cls):
+        # The default of one row every 10 seconds matches the original server
+        return cls(
+            rate_hz=float(os.getenv("REPLAY_RATE_HZ", 0.1)),
+            speed=float(os.getenv("REPLAY_SPEED", 1.0)),
+            samples_per_frame=int(os.getenv("REPLAY_SAMPLES_PER_FRAME", 1)),
+            mode=os.getenv("STREAM_MODE", "replay"),
+        )
+
+    def with_query(self, path):
+        """
+        Returns a copy with any replay query parameters from the request path applied.
+        """
+        query = parse_qs(urlparse(path or "").query)
+        start_row, end_row = self.start_row, self.end_row
+        if "start_s" in query:
+            start_row = time_to_row(float(query["start_s"][0]))
+        if "end_s" in query:
+            end_row = time_to_row(float(query["end_s"][0]))
+        if "offset" in query:
+            start_row = int(query["offset"][0])
+        if "end" in query:
+            end_row = int(query["end"][0])
+        return ReplaySettings(
+            rate_hz=float(query.get("rate", [self.rate_hz])[0]),
+            speed=float(query.get("speed", [self.speed])[0]),
+            samples_per_frame=int(query.get("frame", [self.samples_per_frame])[0]),
+            mode=query.get("mode", [self.mode])[0],
+            start_row=start_row,
+            end_row=end_row,
+            resume=query.get("resume", [self.resume])[0],
+        )
+
+    def start_for(self, dataset_id):
+        """
+        Row the replay starts at: the resume token's offset when it was issued for this
+        version of the dataset, the requested start otherwise.
+        """
+        if self.resume:
+            token_dataset, _, offset = self.resume.rpartition(".")
+            if token_dataset == dataset_id and offset.isdigit():
+                return int(offset)
+        return self.start_row
+
+def time_to_row(seconds):
+    """
+    Row of the sample recorded `seconds` into the dataset; rows are evenly spaced, so the
+    time index is arithmetic.
+    """
+    if seconds < 0:
+        raise ValueError("replay times must be non-negative")
+    return int(round(seconds * DATASET_RATE_HZ))
+
+def resume_token(dataset_id, offset):
+    """
+    Opaque token a client sends back as ?resume= to continue at `offset`. It names the
+    dataset version, so a token from before the dataset changed starts a fresh replay.
+    """
+    return f"{dataset_id}.{offset}"
+
+class ReplayClock:
+    """
+    Drift-free frame pacing. Frame k is due at start + k * interval on the monotonic clock,
+    so time spent encoding and sending never accumulates into the schedule. A sender that
+    falls behind catches up without sleeping.
+    """
+    def __init__(self, interval):
+        self.interval = interval
+        self.start = None
+        self.frames = 0
+
+    async def wait(self):
+        now = time.monotonic()
+        if self.start is None:
+            self.start = now
+        delay = self.start + self.frames * self.interval - now
+        self.frames += 1
+        # Always yield to the loop, even when behind schedule, so other clients get a turn
+        await asyncio.sleep(max(delay, 0))
+
+    def lag(self):
+        """
+        Seconds the sender is behind schedule (0 when on time).
+        """
+        if self.start is None:
+            return 0.0
+        return max(0.0, time.monotonic() - (self.start + (self.frames - 1) * self.interval))
+
+def iter_frame_blocks(blocks, samples_per_frame):
+    """
+    Re-chunks a stream of (rows, 8) blocks so every block holds a whole number of frames;
+    leftover rows are carried into the next block. Only the final block may be short.
+    """
+    carry = None
+    for block in blocks:
+        if carry is not None:
+            block = np.concatenate([carry, block])
+        usable = len(block) - len(block) % samples_per_frame
+        carry = block[usable:] if usable < len(block) else None
+        if usable:
+            yield block[:usable]
+    if carry is not None:
+        yield carry
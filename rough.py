@@ -1,10 +1,10 @@
 import streamlit as st
-from values import seiz,no_seiz
-model = pickle.load(open('EE_model.pkl', 'rb'))
+from values import seiz,no_seiz,predict_seizure
+from inference import predict_batch
+from model_registry import get_model
 def pred(input_data):
-    inputt = np.array(input_data).reshape(1,-1)
-    prediction = model.predict(inputt)[0]
-    return prediction
+    prediction, _ = predict_batch(get_model(), input_data)
+    return prediction[0]
 def main():
     st.title('Epileptic Seizure Prediction')  
     st.write("Enter the EEG readings:")
@@ -20,17 +20,11 @@ def main():
     input_data = [mar, deb, dis, gen, crs, gdp, pqg, pqg1]
 
     if st.button('Predict'):
-        prediction = predict_seizure(input_data)
+        prediction = predict_seizure(input_data[:7])  # The reference tables hold the first 7 channels
         if prediction == 0:
             st.error('The Patient is affected by Epileptic Seizure.')
         else:
             st.success('The Patient is not affected by Epileptic Seizure.')
-def predict_seizure(input_data):
-    average_input = sum(input_data) / len(input_data)
-    if average_input in no_seiz:
-        return 1  
-    else:
-        return 0  
 
 if __name__ == '__main__':
     main()
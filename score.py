@@ -0,0 +1,173 @@
+"""
+Offline batch scoring of the whole dataset with a process pool.
+
+    python score.py datasets/chbmit_preprocessed_data.csv --model EE_model.pkl --out scores/
+    python score.py datasets/chbmit_preprocessed_data.csv --out scores-new/ --baseline scores/ --format both
+
+The dataset is read through its binary cache (dataset.py), which every worker maps from the
+page cache, and the model is loaded once in the parent and inherited by the forked workers,
+so neither is copied per process. Workers write their chunk's results straight into shared
+.npy memmaps; only (start, stop) ranges travel between processes.
+
+Writes <out>/predictions.npy, <out>/probabilities.npy (and/or <out>/scores.parquet) plus
+<out>/summary.json with the model, dataset fingerprint and throughput.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+import numpy as np
+from dataset import ensure_cache, cache_paths, fingerprint
+from inference import CHANNELS, predict_batch
+from model_registry import load_model_file
+
+# Rows scored per task; big enough to amortise the model call, small enough to balance the pool
+SCORE_CHUNK_ROWS = 65536
+
+# Set in the parent before the pool forks, inherited copy-on-write by the workers
+_model = None
+_data = None
+_outputs = None
+
+def _open_outputs(out):
+    global _outputs
+    _outputs = (
+        np.load(os.path.join(out, "predictions.npy"), mmap_mode="r+"),
+        np.load(os.path.join(out, "probabilities.npy"), mmap_mode="r+"),
+    )
+
+def _score_range(task):
+    start, stop, out = task
+    if _outputs is None:
+        _open_outputs(out)
+    predictions, probabilities = _outputs
+    predictions[start:stop], probabilities[start:stop] = predict_batch(_model, _data[start:stop])
+    return stop - start
+
+def score(csv_path, model_path, out, workers=None, chunk_rows=SCORE_CHUNK_ROWS):
+    """
+    Scores every row of the dataset into out/ and returns the summary dict.
+    """
+    global _model, _data, _outputs
+    workers = workers or os.cpu_count()
+    os.makedirs(out, exist_ok=True)
+
+    start_time = time.perf_counter()
+    _data = ensure_cache(csv_path)
+    _model = load_model_file(model_path)
+    _outputs = None
+    load_seconds = time.perf_counter() - start_time
+
+    rows = len(_data)
+    classes = np.asarray(_model.classes_)
+    np.lib.format.open_memmap(os.path.join(out, "predictions.npy"), mode="w+", dtype=classes.dtype, shape=(rows,)).flush()
+    np.lib.format.open_memmap(os.path.join(out, "probabilities.npy"), mode="w+", dtype=np.float64, shape=(rows, len(classes))).flush()
+    tasks = [(start, min(start + chunk_rows, rows), out) for start in range(0, rows, chunk_rows)]
+
+    score_start = time.perf_counter()
+    if workers == 1:
+        for task in tasks:
+            _score_range(task)
+    else:
+        # fork shares the loaded model and the mapped dataset with every worker
+        with multiprocessing.get_context("fork").Pool(workers) as pool:
+            for _ in pool.imap_unordered(_score_range, tasks):
+                pass
+    if _outputs is not None:
+        for output in _outputs:
+            output.flush()
+    score_seconds = time.perf_counter() - score_start
+
+    summary = {
+        "model": os.path.abspath(model_path),
+        "model_mtime_ns": os.stat(model_path).st_mtime_ns,
+        "dataset": os.path.abspath(csv_path),
+        "dataset_fingerprint": fingerprint(csv_path),
+        "classes": classes.tolist(),
+        "rows": rows,
+        "workers": workers,
+        "load_seconds": load_seconds,
+        "score_seconds": score_seconds,
+        "rows_per_second": rows / score_seconds if score_seconds > 0 else None,
+    }
+    with open(os.path.join(out, "summary.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+def write_parquet(out, row_group_rows=1 << 20):
+    """
+    Writes out/scores.parquet (row, prediction, one probability column per class) from the
+    .npy results, one row group at a time. Needs pyarrow.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    predictions = np.load(os.path.join(out, "predictions.npy"), mmap_mode="r")
+    probabilities = np.load(os.path.join(out, "probabilities.npy"), mmap_mode="r")
+    with open(os.path.join(out, "summary.json")) as f:
+        classes = json.load(f)["classes"]
+    schema = pa.schema(
+        [("row", pa.int64()), ("prediction", pa.from_numpy_dtype(predictions.dtype))]
+        + [(f"probability_{label}", pa.float64()) for label in classes]
+    )
+    with pq.ParquetWriter(os.path.join(out, "scores.parquet"), schema) as writer:
+        for start in range(0, len(predictions), row_group_rows):
+            stop = min(start + row_group_rows, len(predictions))
+            columns = [pa.array(np.arange(start, stop)), pa.array(predictions[start:stop])]
+            columns += [pa.array(probabilities[start:stop, i]) for i in range(len(classes))]
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+
+def compare(out, baseline):
+    """
+    Regression check against an earlier run: counts changed labels and the largest
+    probability shift.
+    """
+    new = np.load(os.path.join(out, "predictions.npy"), mmap_mode="r")
+    old = np.load(os.path.join(baseline, "predictions.npy"), mmap_mode="r")
+    if len(new) != len(old):
+        return {"comparable": False, "rows": len(new), "baseline_rows": len(old)}
+    changed = int(np.count_nonzero(new != old))
+    shift = 0.0
+    new_proba = np.load(os.path.join(out, "probabilities.npy"), mmap_mode="r")
+    old_proba = np.load(os.path.join(baseline, "probabilities.npy"), mmap_mode="r")
+    if new_proba.shape == old_proba.shape:
+        for start in range(0, len(new), SCORE_CHUNK_ROWS):
+            shift = max(shift, float(np.abs(new_proba[start:start + SCORE_CHUNK_ROWS] - old_proba[start:start + SCORE_CHUNK_ROWS]).max(initial=0.0)))
+    return {"comparable": True, "rows": len(new), "changed": changed, "max_probability_shift": shift}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("csv", help=f"dataset CSV with the {len(CHANNELS)} channel columns")
+    parser.add_argument("--model", default="EE_model.pkl", help="pickled model or exported .npz forest")
+    parser.add_argument("--out", default="scores")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-rows", type=int, default=SCORE_CHUNK_ROWS)
+    parser.add_argument("--format", choices=("npy", "parquet", "both"), default="npy")
+    parser.add_argument("--baseline", help="directory of an earlier run to compare against")
+    args = parser.parse_args()
+    if args.baseline and args.format == "parquet":
+        parser.error("--baseline needs the .npy results; use --format npy or both")
+
+    if not os.path.exists(cache_paths(args.csv)[0]):
+        print("Building the binary dataset cache (once per CSV version)...")
+    summary = score(args.csv, args.model, args.out, args.workers, args.chunk_rows)
+    print(f"Scored {summary['rows']:,} rows with {summary['workers']} workers in {summary['score_seconds']:.2f} s "
+          f"({summary['rows_per_second']:,.0f} rows/s; loading took {summary['load_seconds']:.2f} s)")
+
+    if args.format != "npy":
+        write_parquet(args.out)
+        if args.format == "parquet":
+            for name in ("predictions.npy", "probabilities.npy"):
+                os.remove(os.path.join(args.out, name))
+        print(f"Wrote {os.path.join(args.out, 'scores.parquet')}")
+    if args.baseline:
+        result = compare(args.out, args.baseline)
+        if not result["comparable"]:
+            print(f"Baseline has {result['baseline_rows']:,} rows, this run {result['rows']:,}; not comparable")
+        else:
+            print(f"{result['changed']:,} of {result['rows']:,} predictions changed since the baseline; "
+                  f"largest probability shift {result['max_probability_shift']:.4f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+"""
+Append-only on-disk log of fixed-width binary records (EEG frames, predictions), split into
+one segment file per patient per hour:
+
+    <root>/<patient_id>/<YYYYmmddTHH>.seg   packed records, in arrival order
+    <root>/<patient_id>/<YYYYmmddTHH>.idx   (min, max) timestamp of every INDEX_INTERVAL records
+
+A time-range query only opens the hours it covers, scans their small sparse index (a few
+hundred entries per hour at 256 Hz) and reads just the matching blocks of the segment.
+
+    python segment_log.py query logs/frames --patient 1 --start 2024-01-01T10:00 --end 2024-01-01T10:05 --kind frames
+    python segment_log.py retain logs/frames --max-age-hours 72
+    python segment_log.py compact logs/frames
+
+The app only appends. Retention and compaction are meant to run from cron (or a scheduled
+job) against the same directories, e.g. hourly, a few minutes past the hour:
+
+    python segment_log.py compact logs/frames && python segment_log.py retain logs/frames --max-age-hours 72
+
+compact rewrites the hours that closed within the last --hours (default 1) for every
+patient, so each hour is compacted once after it ends.
+"""
+import argparse
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import quote, unquote
+import numpy as np
+from encoding import SAMPLE_DTYPE
+from history import RESULT_DTYPE
+
+HOUR_NS = 3600 * 10**9
+# Records per sparse index entry; a query reads at most two partial blocks it doesn't need
+INDEX_INTERVAL = 4096
+INDEX_DTYPE = np.dtype([("min", "<i8"), ("max", "<i8")])
+
+# Record kind -> (dtype, name of its int64 ns timestamp field)
+KINDS = {
+    "frames": (SAMPLE_DTYPE, "timestamp"),
+    "predictions": (RESULT_DTYPE, "timestamp_ns"),
+}
+
+def segment_name(hour):
+    return datetime.fromtimestamp(hour * 3600, tz=timezone.utc).strftime("%Y%m%dT%H")
+
+def segment_hour(name):
+    return int(datetime.strptime(name, "%Y%m%dT%H").replace(tzinfo=timezone.utc).timestamp()) // 3600
+
+def block_index(records, time_field):
+    """
+    (min, max) timestamp of every complete INDEX_INTERVAL block of records.
+    """
+    blocks = len(records) // INDEX_INTERVAL
+    timestamps = records[time_field][:blocks * INDEX_INTERVAL].reshape(blocks, INDEX_INTERVAL)
+    index = np.empty(blocks, dtype=INDEX_DTYPE)
+    index["min"] = timestamps.min(axis=1)
+    index["max"] = timestamps.max(axis=1)
+    return index
+
+class Segment:
+    """
+    Writer side of one segment: an append handle on the data file, the sparse index and the
+    records of the current, not yet indexed block.
+    """
+    def __init__(self, path, dtype, time_field):
+        self.path = path
+        self.index_path = path[:-len(".seg")] + ".idx"
+        self.dtype = dtype
+        self.time_field = time_field
+
+        # A crash can leave a torn last record, and the index can trail the data
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size % dtype.itemsize:
+            os.truncate(path, size - size % dtype.itemsize)
+        self.count = size // dtype.itemsize
+        indexed = os.path.getsize(self.index_path) // INDEX_DTYPE.itemsize if os.path.exists(self.index_path) else 0
+        blocks = self.count // INDEX_INTERVAL
+        tail_start = min(indexed, blocks) * INDEX_INTERVAL
+        tail = np.fromfile(path, dtype=dtype, offset=tail_start * dtype.itemsize) if self.count > tail_start else np.empty(0, dtype)
+        if indexed != blocks:
+            with open(self.index_path, "r+b" if os.path.exists(self.index_path) else "wb") as f:
+                f.truncate(min(indexed, blocks) * INDEX_DTYPE.itemsize)
+                f.seek(0, os.SEEK_END)
+                block_index(tail, time_field).tofile(f)
+        self.tail = tail[len(tail) // INDEX_INTERVAL * INDEX_INTERVAL:]
+
+        self.file = open(path, "ab")
+        self.index_file = open(self.index_path, "ab")
+
+    def write(self, records):
+        self.file.write(records.tobytes())
+        self.count += len(records)
+        pending = np.concatenate([self.tail, records])
+        index = block_index(pending, self.time_field)
+        if len(index):
+            self.index_file.write(index.tobytes())
+        self.tail = pending[len(index) * INDEX_INTERVAL:]
+
+    def flush(self, sync):
+        self.file.flush()
+        self.index_file.flush()
+        if sync:
+            os.fsync(self.file.fileno())
+            os.fsync(self.index_file.fileno())
+
+    def close(self):
+        self.file.close()
+        self.index_file.close()
+
+class SegmentLog:
+    """
+    Batched writer and range reader for one kind of record. append() only buffers in memory;
+    buffered records are written once flush_bytes have accumulated or flush_interval seconds
+    have passed, and fsynced at most every fsync_interval seconds, so sustained streams cost
+    a handful of large writes and syncs per second rather than one per frame. Thread-safe:
+    appends can come from the event loop while flush() runs in a worker thread.
+    """
+    def __init__(self, root, kind="frames", flush_bytes=1 << 20, flush_interval=0.5, fsync_interval=1.0, max_open=256):
+        self.root = root
+        self.dtype, self.time_field = KINDS[kind]
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.max_open = max_open
+        self._pending = {}  # (patient_id, hour) -> [record arrays]
+        self._pending_bytes = 0
+        self._segments = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._last_sync = time.monotonic()
+        self.fsyncs = 0
+        os.makedirs(root, exist_ok=True)
+
+    def patient_dir(self, patient_id):
+        return os.path.join(self.root, quote(str(patient_id), safe=""))
+
+    def segment_path(self, patient_id, hour):
+        return os.path.join(self.patient_dir(patient_id), segment_name(hour) + ".seg")
+
+    def append(self, patient_id, records):
+        """
+        Buffers a copy of records (a structured array of this log's dtype). Returns True when
+        the buffer is due for a flush().
+        """
+        records = np.array(records, dtype=self.dtype)
+        if not len(records):
+            return False
+        hours = records[self.time_field] // HOUR_NS
+        with self._lock:
+            if (hours == hours[0]).all():
+                self._pending.setdefault((patient_id, int(hours[0])), []).append(records)
+            else:
+                for hour in np.unique(hours):
+                    self._pending.setdefault((patient_id, int(hour)), []).append(records[hours == hour])
+            self._pending_bytes += records.nbytes
+            return self.due()
+
+    def due(self):
+        return self._pending_bytes >= self.flush_bytes or time.monotonic() - self._last_flush >= self.flush_interval
+
+    def flush(self, sync=None):
+        """
+        Writes everything buffered so far; fsyncs when fsync_interval has passed (or sync=True).
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending, self._pending_bytes = self._pending, {}, 0
+            self._last_flush = time.monotonic()
+            touched = set()
+            for (patient_id, hour), blocks in pending.items():
+                segment = self._segment(patient_id, hour)
+                segment.write(np.concatenate(blocks) if len(blocks) > 1 else blocks[0])
+                touched.add((patient_id, hour))
+            if sync is None:
+                sync = time.monotonic() - self._last_sync >= self.fsync_interval
+            if sync:
+                self._last_sync = time.monotonic()
+                touched = self._segments.keys()
+                self.fsyncs += 1
+            for key in list(touched):
+                segment = self._segments.get(key)
+                if segment is not None:  # Segments evicted meanwhile were flushed on close
+                    segment.flush(sync)
+
+    def _segment(self, patient_id, hour):
+        segment = self._segments.get((patient_id, hour))
+        if segment is None:
+            if len(self._segments) >= self.max_open:
+                # Close the oldest hours first; they are the least likely to see more records
+                for key in sorted(self._segments, key=lambda key: key[1])[:len(self._segments) // 2]:
+                    closing = self._segments.pop(key)
+                    closing.flush(sync=True)
+                    closing.close()
+            os.makedirs(self.patient_dir(patient_id), exist_ok=True)
+            segment = self._segments[(patient_id, hour)] = Segment(self.segment_path(patient_id, hour), self.dtype, self.time_field)
+        return segment
+
+    def close(self):
+        self.flush(sync=True)
+        with self._flush_lock:
+            for segment in self._segments.values():
+                segment.close()
+            self._segments.clear()
+
+    def query(self, patient_id, start_ns, end_ns):
+        """
+        All flushed records of a patient with start_ns <= timestamp < end_ns, in log order.
+        """
+        results = []
+        for hour in range(int(start_ns // HOUR_NS), int((end_ns - 1) // HOUR_NS) + 1):
+            path = self.segment_path(patient_id, hour)
+            if os.path.exists(path):
+                results.append(self._query_segment(path, start_ns, end_ns))
+        if not results:
+            return np.empty(0, dtype=self.dtype)
+        return np.concatenate(results)
+
+    def _query_segment(self, path, start_ns, end_ns):
+        count = os.path.getsize(path) // self.dtype.itemsize
+        index_path = path[:-len(".seg")] + ".idx"
+        index = np.fromfile(index_path, dtype=INDEX_DTYPE) if os.path.exists(index_path) else np.empty(0, INDEX_DTYPE)
+        index = index[:count // INDEX_INTERVAL]
+
+        # Blocks whose [min, max] overlaps the range, plus the unindexed tail
+        hit = np.flatnonzero((index["max"] >= start_ns) & (index["min"] < end_ns))
+        ranges = [(block * INDEX_INTERVAL, (block + 1) * INDEX_INTERVAL) for block in hit]
+        if count > len(index) * INDEX_INTERVAL:
+            ranges.append((len(index) * INDEX_INTERVAL, count))
+        if not ranges:
+            return np.empty(0, dtype=self.dtype)
+
+        # Merge adjacent blocks into single reads
+        merged = [list(ranges[0])]
+        for first, last in ranges[1:]:
+            if first == merged[-1][1]:
+                merged[-1][1] = last
+            else:
+                merged.append([first, last])
+        records = []
+        with open(path, "rb") as f:
+            for first, last in merged:
+                f.seek(first * self.dtype.itemsize)
+                records.append(np.fromfile(f, dtype=self.dtype, count=last - first))
+        records = np.concatenate(records)
+        timestamps = records[self.time_field]
+        return records[(timestamps >= start_ns) & (timestamps < end_ns)]
+
+    def patients(self):
+        return [unquote(name) for name in sorted(os.listdir(self.root))]
+
+    def segments(self, patient_id):
+        """
+        [(hour, path)] of a patient's segments, oldest first.
+        """
+        directory = self.patient_dir(patient_id)
+        if not os.path.isdir(directory):
+            return []
+        names = sorted(name[:-len(".seg")] for name in os.listdir(directory) if name.endswith(".seg"))
+        return [(segment_hour(name), os.path.join(directory, name + ".seg")) for name in names]
+
+    def retain(self, max_age_hours=None, max_bytes=None, now_ns=None):
+        """
+        Retention: deletes whole segments older than max_age_hours, then the oldest segments
+        across all patients until the log fits in max_bytes. Returns the deleted paths.
+        """
+        now_hour = (time.time_ns() if now_ns is None else now_ns) // HOUR_NS
+        segments = [(hour, path) for patient_id in self.patients() for hour, path in self.segments(patient_id)]
+        segments.sort()
+        doomed = []
+        if max_age_hours is not None:
+            doomed = [(hour, path) for hour, path in segments if hour < now_hour - max_age_hours]
+        if max_bytes is not None:
+            kept = [(hour, path) for hour, path in segments if hour >= now_hour - max_age_hours] if doomed else segments
+            total = sum(os.path.getsize(path) for _, path in kept)
+            for hour, path in kept:
+                if total <= max_bytes or hour >= now_hour:
+                    break  # The current hour is never deleted
+                total -= os.path.getsize(path)
+                doomed.append((hour, path))
+
+        with self._flush_lock:
+            for hour, path in doomed:
+                for key in [key for key, segment in self._segments.items() if segment.path == path]:
+                    self._segments.pop(key).close()
+                for doomed_path in (path, path[:-len(".seg")] + ".idx"):
+                    if os.path.exists(doomed_path):
+                        os.remove(doomed_path)
+        return [path for _, path in doomed]
+
+    def compact(self, patient_id, hour):
+        """
+        Compaction of a closed hour: rewrites the segment sorted by timestamp (late arrivals
+        widen index blocks) and rebuilds its index, then swaps both files in atomically.
+        """
+        path = self.segment_path(patient_id, hour)
+        with self._flush_lock:
+            segment = self._segments.pop((patient_id, hour), None)
+            if segment is not None:
+                segment.flush(sync=True)
+                segment.close()
+            records = np.fromfile(path, dtype=self.dtype)
+            records = records[np.argsort(records[self.time_field], kind="stable")]
+            index_path = path[:-len(".seg")] + ".idx"
+            for target, data in ((path, records), (index_path, block_index(records, self.time_field))):
+                with open(target + ".tmp", "wb") as f:
+                    data.tofile(f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(target + ".tmp", target)
+
+def parse_time(value):
+    """
+    ISO time (UTC unless it carries an offset) or integer nanoseconds -> ns.
+    """
+    if value.lstrip("-").isdigit():
+        return int(value)
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 10**9)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    query = commands.add_parser("query", help="print the records of a patient in a time range")
+    query.add_argument("root")
+    query.add_argument("--kind", choices=KINDS, default="frames")
+    query.add_argument("--patient", required=True)
+    query.add_argument("--start", required=True)
+    query.add_argument("--end", required=True)
+    query.add_argument("--out", help="save the records to this .npy file instead of printing them")
+    retain = commands.add_parser("retain", help="apply the retention policy")
+    retain.add_argument("root")
+    retain.add_argument("--kind", choices=KINDS, default="frames")
+    retain.add_argument("--max-age-hours", type=int)
+    retain.add_argument("--max-gb", type=float)
+    compact = commands.add_parser("compact", help="sort and re-index recently closed hours")
+    compact.add_argument("root")
+    compact.add_argument("--kind", choices=KINDS, default="frames")
+    compact.add_argument("--patient", help="only this patient (default: all)")
+    compact.add_argument("--hours", type=int, default=1, help="closed hours to compact, counting back from now")
+    args = parser.parse_args()
+
+    log = SegmentLog(args.root, args.kind)
+    if args.command == "query":
+        records = log.query(args.patient, parse_time(args.start), parse_time(args.end))
+        if args.out:
+            np.save(args.out, records)
+        else:
+            for record in records:
+                print(record)
+        print(f"{len(records)} records")
+    elif args.command == "compact":
+        now_hour = time.time_ns() // HOUR_NS
+        for patient_id in [args.patient] if args.patient else log.patients():
+            for hour, path in log.segments(patient_id):
+                if now_hour - args.hours <= hour < now_hour:  # The current hour is still being written
+                    log.compact(patient_id, hour)
+                    print(f"compacted {path}")
+    else:
+        max_bytes = None if args.max_gb is None else int(args.max_gb * 2**30)
+        for path in log.retain(args.max_age_hours, max_bytes):
+            print(f"deleted {path}")
+
+if __name__ == "__main__":
+    main()
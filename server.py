@@ -1,68 +1,193 @@
 import asyncio
 import websockets
-import json
-import pandas as pd
-import gdown
 import os
+from dataset import iter_blocks, ensure_cache, dataset_id
+from encoding import select_subprotocol, JSON_PROTOCOL, BINARY_PROTOCOL, DELTA_PROTOCOL, DeltaEncoder, \
+    encode_json_prefixes, encode_json_frame, encode_binary, sample_timestamps
+from replay import ReplaySettings, ReplayClock, iter_frame_blocks, OFFSET_HEADER, DATASET_HEADER
+from broadcast import Broadcaster
+from provision import provision, DATASET_SHA256
+import metrics
 
 # Define the Google Drive file ID (replace with your actual ID)
 DRIVE_FILE_ID = '1Lf9Z8xfP3It-jOH4TBwsxanuayKvt79x'
 LOCAL_PATH = 'datasets/chbmit_preprocessed_data.csv'
 os.makedirs(os.path.dirname(LOCAL_PATH), exist_ok=True)
 
-# Function to download the dataset from Google Drive if it doesn't already exist locally
-def download_dataset():
+async def prepare_dataset():
+    """
+    Verifies or fetches the dataset (see provision.py; DATASET_DIR / DATASET_URL select a
+    mirror), then builds its binary cache. Runs alongside the server, which meanwhile
+    serves whatever copy is already in place.
+    """
+    if not DATASET_SHA256:
+        print("Warning: DATASET_SHA256 is not set, so the dataset is only checked for truncation, "
+              "not for its content; set it to the file's SHA-256 to pin it.")
+    try:
+        print(await asyncio.to_thread(provision, LOCAL_PATH, drive_id=DRIVE_FILE_ID))
+        # Convert the CSV to the binary cache; later clients and restarts map it
+        await asyncio.to_thread(ensure_cache, LOCAL_PATH)
+    except Exception as e:
+        print(f"Dataset provisioning failed: {e}")
+
+# Replay rate, speed multiplier and samples per frame; clients can override them per connection
+REPLAY = ReplaySettings.from_env()
+
+# Shared live stream for ?mode=broadcast clients; each one gets a bounded queue of this many frames
+BROADCAST = Broadcaster(queue_size=int(os.getenv("BROADCAST_QUEUE_FRAMES", 64)))
+
+# Served on METRICS_PORT when set
+ENCODE_TIME = metrics.histogram("eeg_stage_seconds", "Time spent per pipeline stage", stage="server_encode")
+SEND_TIME = metrics.histogram("eeg_stage_seconds", "Time spent per pipeline stage", stage="server_send")
+FRAMES_SENT = metrics.counter("eeg_server_frames_sent_total", "Frames sent to replay clients")
+BYTES_SENT = metrics.counter("eeg_server_bytes_sent_total", "Payload bytes sent to replay clients")
+CLIENTS = {"replay": 0}
+metrics.gauge("eeg_server_replay_clients", "Connected replay clients", lambda: CLIENTS["replay"])
+
+def iter_dataset_frames(samples_per_frame):
+    """
+    Streams the dataset as raw (samples_per_frame, 8) float32 frames.
+    """
     if not os.path.exists(LOCAL_PATH):
-        print("Dataset not found locally, downloading...")
-        gdown.download(f'https://drive.google.com/uc?id={DRIVE_FILE_ID}', LOCAL_PATH, quiet=False)
-        print("Dataset downloaded successfully.")
-    else:
-        print("Dataset already exists, skipping download.")
-
-# Call the function to download the dataset
-download_dataset()
-
-# Try to load the dataset
-try:
-    eeg_data = pd.read_csv(LOCAL_PATH)
-    print("Dataset loaded successfully.")
-except Exception as e:
-    print(f"Failed to load dataset: {e}")
-    eeg_data = pd.DataFrame()  # Use an empty DataFrame as fallback
-
-# EEG Channels
-CHANNELS = ["# FP1-F7", "C3-P3", "P3-O1", "P4-O2", "P7-O1", "P7-T7", "T8-P8-0", "T8-P8-1"]
-
-async def eeg_handler(websocket, path):
-    print("New client connection established.")
+        return  # Still being provisioned; the broadcaster retries every second
+    try:
+        for block in iter_frame_blocks(iter_blocks(LOCAL_PATH), samples_per_frame):
+            for start in range(0, len(block), samples_per_frame):
+                yield block[start:start + samples_per_frame]
+    except Exception as e:
+        print(f"Failed to load dataset: {e}")
+
+_dataset_ids = {}
+
+def current_dataset_id():
+    # Fingerprinting hashes 2 MB, so it is only redone when the file changes
+    stat = os.stat(LOCAL_PATH)
+    key = (stat.st_size, stat.st_mtime_ns)
+    if key not in _dataset_ids:
+        _dataset_ids.clear()
+        _dataset_ids[key] = dataset_id(LOCAL_PATH)
+    return _dataset_ids[key]
+
+def replay_headers(connection, request, response):
+    """
+    Tells a replay client, in the handshake response, which row its stream starts at and
+    which dataset version it is, so it can resume from a later row after a disconnect.
+    """
     try:
-        for _, row in eeg_data.iterrows():
-            # Prepare data to send by extracting only valid EEG channel values
-            eeg_values = {channel: row.get(channel, 0.0) for channel in CHANNELS}
-            eeg_values["timestamp"] = str(pd.Timestamp.now())
+        settings = REPLAY.with_query(request.path)
+        current = current_dataset_id()
+    except (ValueError, OSError):
+        return None  # eeg_handler rejects bad parameters; without a dataset there's nothing to resume
+    if settings.mode == "replay" and response.status_code == 101:
+        response.headers[DATASET_HEADER] = current
+        response.headers[OFFSET_HEADER] = str(settings.start_for(current))
+    return None
 
-            # Send data as JSON
-            await websocket.send(json.dumps(eeg_values))
-            print("Sent data:", eeg_values)
+def iter_frames(protocol, settings, start=0):
+    """
+    Streams rows [start, settings.end_row) of the dataset as ready-to-send messages of
+    settings.samples_per_frame rows each.
+    JSON messages are pre-serialized a whole block at a time; frames are pulled right before
+    sending, so the last sample of each frame is stamped with the send time. Delta frames
+    share one quantization range per stream, taken from the first block.
+    """
+    n = settings.samples_per_frame
+    encoder = None
+    try:
+        for block in iter_frame_blocks(iter_blocks(LOCAL_PATH, start=start, stop=settings.end_row), n):
+            prefixes = encode_json_prefixes(block) if protocol == JSON_PROTOCOL else None
+            if protocol == DELTA_PROTOCOL and encoder is None:
+                encoder = DeltaEncoder(block.min(axis=0), block.max(axis=0))
+            for start in range(0, len(block), n):
+                frame = block[start:start + n]
+                encode_start = ENCODE_TIME.start()
+                timestamps = sample_timestamps(len(frame), settings.sample_period_ns)
+                if protocol == BINARY_PROTOCOL:
+                    message = encode_binary(frame, timestamps)
+                elif protocol == DELTA_PROTOCOL:
+                    message = encoder.encode(frame, timestamps)
+                else:
+                    message = encode_json_frame(prefixes[start:start + n], timestamps)
+                ENCODE_TIME.stop(encode_start)
+                yield message
+    except Exception as e:
+        print(f"Failed to load dataset: {e}")
 
-            await asyncio.sleep(10)  # Send data every 10 seconds
+async def eeg_handler(websocket, path=None):
+    # Clients pick the wire format with the eeg.json / eeg.binary / eeg.delta subprotocol; JSON by default
+    protocol = websocket.subprotocol or JSON_PROTOCOL
+    try:
+        settings = REPLAY.with_query(path or websocket.request.path)
+    except ValueError as e:
+        await websocket.close(1008, f"Invalid replay parameters: {e}")
+        return
+    if settings.mode == "broadcast":
+        await broadcast_handler(websocket, protocol)
+        return
+    # Resolved (resume token, time range or offset) while answering the handshake
+    start = int(websocket.response.headers.get(OFFSET_HEADER, settings.start_row))
+    print(f"New client connection established ({protocol}, "
+          f"{settings.rate_hz} Hz x{settings.speed}, {settings.samples_per_frame} samples/frame, from row {start}).")
+    clock = ReplayClock(settings.frame_interval)
+    frames = iter_frames(protocol, settings, start)
+    CLIENTS["replay"] += 1
+    try:
+        while True:
+            await clock.wait()  # Paced against the monotonic clock, so sends don't drift
+            frame = next(frames, None)  # Encoded after the wait, so timestamps are send times
+            if frame is None:
+                break
+            send_start = SEND_TIME.start()
+            await websocket.send(frame)
+            SEND_TIME.stop(send_start)
+            FRAMES_SENT.inc()
+            BYTES_SENT.inc(len(frame))
 
     except websockets.exceptions.ConnectionClosedError as e:
         print(f"Connection closed by client: {e}")
     except Exception as e:
         print(f"Error during data sending: {e}")
     finally:
+        CLIENTS["replay"] -= 1
         print("Client connection closed.")
 
+async def broadcast_handler(websocket, protocol):
+    """
+    Forwards the shared live stream to one client from its own bounded queue, so a slow
+    client only drops its own frames.
+    """
+    subscription = BROADCAST.subscribe(protocol)
+    print(f"New broadcast client connection established ({len(BROADCAST.subscribers)} subscribers).")
+    try:
+        while (frame := await subscription.get()) is not None:
+            await websocket.send(frame)
+    except websockets.exceptions.ConnectionClosed:
+        pass
+    finally:
+        BROADCAST.unsubscribe(subscription)
+        print(f"Broadcast client connection closed ({subscription.dropped} frames dropped).")
+
 async def main():
     try:
         # Dynamically get host and port for deployment
         host = os.getenv("HOST", "0.0.0.0")
         port = int(os.getenv("PORT", 8000))
+        # permessage-deflate runs per connection, so it costs most of a broadcast send; "none" turns it off
+        compression = os.getenv("WS_COMPRESSION", "deflate")
 
         # Start the WebSocket server
-        server = await websockets.serve(eeg_handler, host, port)
+        server = await websockets.serve(eeg_handler, host, port, select_subprotocol=select_subprotocol,
+                                        process_response=replay_headers,
+                                        compression=None if compression == "none" else compression)
         print(f"WebSocket server started on ws://{host}:{port}")
+        if metrics.serve():
+            print(f"Metrics served on http://{os.getenv('METRICS_HOST', '127.0.0.1')}:{os.getenv('METRICS_PORT')}/metrics")
+
+        # One producer feeds every broadcast subscriber
+        producer = asyncio.create_task(BROADCAST.run(lambda: iter_dataset_frames(REPLAY.samples_per_frame), REPLAY))
+
+        # Provisioning and caching run in the background, so startup never waits on a download
+        preparing = asyncio.create_task(prepare_dataset())
         await server.wait_closed()
     except Exception as e:
         print(f"Failed to start server: {e}")
@@ -0,0 +1,58 @@
+import multiprocessing
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from dataset import ensure_cache, cache_paths, CHUNK_ROWS
+from inference import CHANNELS
+
+def write_csv(path, rows, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame(rng.normal(0, 1e-4, (rows, len(CHANNELS))).astype(np.float32), columns=CHANNELS)
+    frame["Outcome"] = rng.integers(0, 2, rows)
+    frame.to_csv(path, index=False)
+    return frame
+
+def cache_rows(path):
+    return len(ensure_cache(path))
+
+def test_ensure_cache_builds_and_reloads(tmp_path):
+    path = str(tmp_path / "d.csv")
+    frame = write_csv(path, CHUNK_ROWS + 10)
+    data = ensure_cache(path)
+    assert np.array_equal(data, frame[CHANNELS].to_numpy(np.float32))
+    assert os.path.exists(cache_paths(path)[0])
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+def test_concurrent_cold_builds(tmp_path):
+    # The server, score.py and train_model.py starting together against a fresh CSV
+    path = str(tmp_path / "d.csv")
+    write_csv(path, 20_000)
+    with multiprocessing.get_context("spawn").Pool(4) as pool:
+        assert pool.map(cache_rows, [path] * 4) == [20_000] * 4
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+def test_unloadable_cache_raises(tmp_path, monkeypatch):
+    path = str(tmp_path / "d.csv")
+    write_csv(path, 10)
+    monkeypatch.setattr("dataset.load_cache", lambda path: None)
+    with pytest.raises(OSError, match="doesn't load"):
+        ensure_cache(path)
+
+def training_rows(path):
+    from train_model import load_training_data
+    X, y = load_training_data(path)
+    return len(X), len(y)
+
+def test_concurrent_training_caches(tmp_path):
+    # Labels and scaled features, built by several trainers at once from a cold start
+    path = str(tmp_path / "d.csv")
+    frame = write_csv(path, 20_000)
+    with multiprocessing.get_context("spawn").Pool(3) as pool:
+        assert pool.map(training_rows, [path] * 3) == [(20_000, 20_000)] * 3
+    from train_model import load_training_data, FEATURE_SCALE
+    X, y = load_training_data(path)
+    assert np.array_equal(y, frame["Outcome"].to_numpy())
+    assert np.array_equal(X, frame[CHANNELS].to_numpy(np.float32) * np.float32(FEATURE_SCALE))
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+    assert not [name for name in os.listdir(tmp_path / "features") if name.endswith(".tmp")]
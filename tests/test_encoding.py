@@ -0,0 +1,150 @@
+import io
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from inference import CHANNELS
+from encoding import (DeltaEncoder, DeltaDecoder, DELTA_HEADER, FLAG_PARAMS, FLAG_INT8, FLAG_TIMESTAMPS,
+                      encode_binary, decode_binary, encode_json_prefixes, finish_json, decode_message)
+from dataset import iter_chunks
+
+PERIOD_NS = 10**9 // 256
+START_NS = 1_700_000_000 * 10**9
+
+def flags(frame):
+    return int(np.frombuffer(frame, dtype=DELTA_HEADER, count=1)[0]["flags"])
+
+def eeg_like(n, seed=0, step=2e-6):
+    # Random walk around volt-scale channel values, like neighbouring EEG samples
+    rng = np.random.default_rng(seed)
+    return 1e-4 + np.cumsum(rng.normal(0, step, (n, 8)), axis=0)
+
+def regular_timestamps(n, start=START_NS):
+    return start + np.arange(n, dtype=np.int64) * PERIOD_NS
+
+def round_trip(encoder, decoder, block, timestamps):
+    frame = encoder.encode(block, timestamps)
+    values, decoded_timestamps = decoder.decode(frame)
+    return frame, values, decoded_timestamps
+
+def test_round_trip_within_max_error():
+    block = eeg_like(4096)
+    encoder, decoder = DeltaEncoder(), DeltaDecoder()
+    decoded = []
+    for start in range(0, len(block), 32):
+        low = encoder.low
+        frame, values, _ = round_trip(encoder, decoder, block[start:start + 32], regular_timestamps(32, START_NS + start * PERIOD_NS))
+        assert bool(flags(frame) & FLAG_PARAMS) == (encoder.low is not low)  # Only sent when the range changes
+        decoded.append(values)
+    error = np.abs(np.concatenate(decoded).astype(np.float64) - block).max(axis=0)
+    assert (error <= encoder.max_error).all()
+
+def test_range_widens_for_values_outside_it():
+    encoder, decoder = DeltaEncoder(), DeltaDecoder()
+    first = eeg_like(32)
+    round_trip(encoder, decoder, first, regular_timestamps(32))
+    low, high = encoder.low.copy(), encoder.high.copy()
+
+    spike = first * 50  # Far outside the headroom of the first frame's range
+    frame, values, _ = round_trip(encoder, decoder, spike, regular_timestamps(32))
+    assert flags(frame) & FLAG_PARAMS
+    assert (encoder.low <= low).all() and (encoder.high >= high).all()
+    assert (np.abs(values.astype(np.float64) - spike) <= encoder.max_error).all()
+
+    frame, values, _ = round_trip(encoder, decoder, first, regular_timestamps(32))
+    assert not flags(frame) & FLAG_PARAMS  # Values back inside the widened range reuse it
+    assert (np.abs(values.astype(np.float64) - first) <= encoder.max_error).all()
+
+def test_params_every_frame():
+    encoder, decoder = DeltaEncoder(params_every_frame=True), DeltaDecoder()
+    for seed in range(3):
+        frame, _, _ = round_trip(encoder, decoder, eeg_like(16, seed), regular_timestamps(16))
+        assert flags(frame) & FLAG_PARAMS
+
+def test_int8_deltas_when_they_fit():
+    encoder, decoder = DeltaEncoder(), DeltaDecoder()
+    smooth = eeg_like(64, step=1e-9)
+    jumpy = eeg_like(64, step=1e-5)
+    encoder.set_range(np.minimum(smooth.min(axis=0), jumpy.min(axis=0)), np.maximum(smooth.max(axis=0), jumpy.max(axis=0)))
+
+    small, values, _ = round_trip(encoder, decoder, smooth, regular_timestamps(64))
+    assert flags(small) & FLAG_INT8
+    assert (np.abs(values.astype(np.float64) - smooth) <= encoder.max_error).all()
+
+    large, values, _ = round_trip(encoder, decoder, jumpy, regular_timestamps(64))
+    assert not flags(large) & FLAG_INT8
+    assert (np.abs(values.astype(np.float64) - jumpy) <= encoder.max_error).all()
+    assert len(large) - len(small) == 63 * 8 - 2 * 8 * 4  # One byte more per delta; small also carried params
+
+def test_timestamps_sent_only_when_irregular():
+    encoder, decoder = DeltaEncoder(), DeltaDecoder()
+    block = eeg_like(32)
+
+    regular = regular_timestamps(32)
+    frame, _, timestamps = round_trip(encoder, decoder, block, regular)
+    assert not flags(frame) & FLAG_TIMESTAMPS
+    assert np.array_equal(timestamps, regular)
+
+    irregular = regular.copy()
+    irregular[10:] += 12345  # A gap, e.g. after a dropped frame
+    frame, _, timestamps = round_trip(encoder, decoder, block, irregular)
+    assert flags(frame) & FLAG_TIMESTAMPS
+    assert np.array_equal(timestamps, irregular)
+
+    frame, _, timestamps = round_trip(encoder, decoder, block[:1], regular[:1])
+    assert not flags(frame) & FLAG_TIMESTAMPS
+    assert np.array_equal(timestamps, regular[:1])
+
+def test_empty_frames():
+    encoder, decoder = DeltaEncoder(), DeltaDecoder()
+    frame, values, timestamps = round_trip(encoder, decoder, np.empty((0, 8)), np.empty(0))
+    assert not flags(frame) & FLAG_PARAMS  # No range is known yet
+    assert values.shape == (0, 8) and timestamps.shape == (0,)
+
+    block = eeg_like(32)
+    frame, values, _ = round_trip(encoder, decoder, block, regular_timestamps(32))
+    assert flags(frame) & FLAG_PARAMS
+    frame, values, _ = round_trip(encoder, decoder, np.empty((0, 8)), np.empty(0))
+    assert values.shape == (0, 8)
+    _, values, _ = round_trip(encoder, decoder, block, regular_timestamps(32))
+    assert (np.abs(values.astype(np.float64) - block) <= encoder.max_error).all()
+
+def test_decoder_needs_params_first():
+    encoder = DeltaEncoder()
+    encoder.encode(eeg_like(8), regular_timestamps(8))
+    with pytest.raises(ValueError):
+        DeltaDecoder().decode(encoder.encode(eeg_like(8), regular_timestamps(8)))
+
+def test_binary_round_trip_is_exact():
+    block = eeg_like(100).astype(np.float32)
+    values, timestamps = decode_binary(encode_binary(block, regular_timestamps(100)))
+    assert np.array_equal(values, block)
+    assert np.array_equal(timestamps, regular_timestamps(100))
+
+CSV = """# FP1-F7,C3-P3,P3-O1,P4-O2,P7-O1,P7-T7,T8-P8-0,T8-P8-1,Outcome
+2.32e-05,-7.1e-06,0.000118,1.5e-05,-0.0002,3.3e-07,0.0,1e-05,1
+0.000081680016592,0.000007066005765,0.000000888963257,0.000019821414753,0.000119742537208,0.000005746619536,-0.000000665475113,0.000035481643863,0
+"""
+
+def test_json_matches_the_original_messages(tmp_path):
+    path = tmp_path / "d.csv"
+    path.write_text(CSV)
+    block = next(iter_chunks(str(path)))
+    timestamp = "2024-01-01 00:00:00.000000"
+    for row, csv_row, message in zip(block, pd.read_csv(io.StringIO(CSV)).itertuples(index=False), encode_json_prefixes(block)):
+        message = finish_json(message, timestamp)
+        # The original server sent json.dumps of the CSV row (parsed as float64) plus a timestamp
+        original = json.dumps({**dict(zip(CHANNELS, csv_row)), "timestamp": timestamp})
+        assert len(message) <= len(original)
+        values, _ = decode_message(message)
+        assert np.array_equal(values[0], row)  # Exactly the float32 values the server holds
+        assert np.array_equal(np.float32(list(json.loads(original).values())[:len(CHANNELS)]), row)
+    # Values that are exact in a few digits go out exactly as the CSV (and the original server) wrote them
+    first = finish_json(encode_json_prefixes(block[:1])[0], timestamp)
+    assert first == json.dumps({**dict(zip(CHANNELS, [2.32e-05, -7.1e-06, 0.000118, 1.5e-05, -0.0002, 3.3e-07, 0.0, 1e-05])),
+                                "timestamp": timestamp})
+
+def test_json_non_finite_values():
+    block = np.array([[np.nan, np.inf, -np.inf, 1.5, 0, 0, 0, 0]], dtype=np.float32)
+    message = json.loads(finish_json(encode_json_prefixes(block)[0], "t"))
+    assert np.isnan(message["# FP1-F7"]) and message["C3-P3"] == np.inf and message["P4-O2"] == 1.5
@@ -0,0 +1,121 @@
+import os
+import numpy as np
+from encoding import SAMPLE_DTYPE
+from segment_log import SegmentLog, HOUR_NS, INDEX_INTERVAL
+
+# 2023-11-14T22:00Z, on an hour boundary
+BASE_NS = 1_699_999_200 * 10**9
+PERIOD_NS = 10**9 // 256
+
+def frames(start_ns, n, period_ns=PERIOD_NS, first_value=0):
+    records = np.empty(n, dtype=SAMPLE_DTYPE)
+    records["values"] = np.arange(first_value, first_value + n, dtype=np.float32)[:, None]
+    records["timestamp"] = start_ns + np.arange(n, dtype=np.int64) * period_ns
+    return records
+
+def test_append_flush_query_across_hours(tmp_path):
+    log = SegmentLog(str(tmp_path), "frames", flush_bytes=1 << 30, flush_interval=3600)
+    # Ten seconds either side of the 23:00 boundary, appended in frames that straddle it
+    records = frames(BASE_NS + HOUR_NS - 10 * 10**9, 20 * 256)
+    for start in range(0, len(records), 300):
+        log.append("p1", records[start:start + 300])
+    assert len(log.query("p1", BASE_NS, BASE_NS + 2 * HOUR_NS)) == 0  # Buffered until flushed
+
+    log.flush()
+    assert [hour for hour, _ in log.segments("p1")] == [BASE_NS // HOUR_NS, BASE_NS // HOUR_NS + 1]
+    assert np.array_equal(log.query("p1", BASE_NS, BASE_NS + 2 * HOUR_NS), records)
+
+    start_ns, end_ns = BASE_NS + HOUR_NS - 10**9, BASE_NS + HOUR_NS + 10**9
+    expected = records[(records["timestamp"] >= start_ns) & (records["timestamp"] < end_ns)]
+    assert len(expected) == 512
+    assert np.array_equal(log.query("p1", start_ns, end_ns), expected)
+    assert len(log.query("p2", BASE_NS, BASE_NS + 2 * HOUR_NS)) == 0
+    log.close()
+
+def test_query_reads_indexed_blocks_and_tail(tmp_path):
+    log = SegmentLog(str(tmp_path), "frames")
+    records = frames(BASE_NS, 5 * INDEX_INTERVAL + 123)
+    log.append("p1", records)
+    log.close()
+    for first, last in [(0, 10), (INDEX_INTERVAL - 5, 3 * INDEX_INTERVAL + 7), (5 * INDEX_INTERVAL + 100, len(records))]:
+        start_ns, end_ns = records["timestamp"][first], records["timestamp"][last - 1] + 1
+        assert np.array_equal(SegmentLog(str(tmp_path), "frames").query("p1", start_ns, end_ns), records[first:last])
+
+def test_reopen_after_torn_record(tmp_path):
+    log = SegmentLog(str(tmp_path), "frames")
+    first = frames(BASE_NS, INDEX_INTERVAL + 10)
+    log.append("p1", first)
+    log.close()
+    (_, path), = log.segments("p1")
+    with open(path, "ab") as f:
+        f.write(frames(BASE_NS, 1).tobytes()[:SAMPLE_DTYPE.itemsize // 2])  # Crash mid-record
+    os.remove(path[:-len(".seg")] + ".idx")  # ...before the index caught up
+
+    reopened = SegmentLog(str(tmp_path), "frames")
+    second = frames(first["timestamp"][-1] + PERIOD_NS, INDEX_INTERVAL, first_value=len(first))
+    reopened.append("p1", second)
+    reopened.close()
+    assert os.path.getsize(path) == (len(first) + len(second)) * SAMPLE_DTYPE.itemsize
+    assert os.path.getsize(path[:-len(".seg")] + ".idx") == 2 * 16
+    assert np.array_equal(reopened.query("p1", BASE_NS, BASE_NS + HOUR_NS), np.concatenate([first, second]))
+
+def test_retain_by_age_and_size(tmp_path):
+    log = SegmentLog(str(tmp_path), "frames")
+    for hour in range(4):
+        for patient_id in ("p1", "p2"):
+            log.append(patient_id, frames(BASE_NS + hour * HOUR_NS, 100))
+    log.flush()
+    now_ns = BASE_NS + 3 * HOUR_NS + 1
+
+    deleted = log.retain(max_age_hours=2, now_ns=now_ns)
+    assert len(deleted) == 2  # Hour 0 of both patients
+    assert [hour for hour, _ in log.segments("p1")] == [BASE_NS // HOUR_NS + hour for hour in (1, 2, 3)]
+    assert not any(os.path.exists(path[:-len(".seg")] + ".idx") for path in deleted)
+
+    segment_bytes = 100 * SAMPLE_DTYPE.itemsize
+    log.retain(max_bytes=3 * segment_bytes, now_ns=now_ns)
+    # Oldest first across patients: hour 1 of both, then hour 2 of p1
+    assert [hour for hour, _ in log.segments("p1")] == [BASE_NS // HOUR_NS + 3]
+    assert [hour for hour, _ in log.segments("p2")] == [BASE_NS // HOUR_NS + 2, BASE_NS // HOUR_NS + 3]
+
+    log.retain(max_bytes=0, now_ns=now_ns)  # The current hour is never deleted
+    assert len(log.segments("p1")) == len(log.segments("p2")) == 1
+    log.append("p1", frames(BASE_NS + 3 * HOUR_NS + 10**9, 10))
+    log.close()
+    assert len(log.query("p1", BASE_NS, BASE_NS + 4 * HOUR_NS)) == 110
+
+def test_compact_sorts_late_records(tmp_path):
+    log = SegmentLog(str(tmp_path), "frames")
+    records = frames(BASE_NS, 3 * INDEX_INTERVAL)
+    shuffled = records[np.random.default_rng(0).permutation(len(records))]
+    for start in range(0, len(shuffled), 1000):
+        log.append("p1", shuffled[start:start + 1000])
+    log.flush()
+    log.compact("p1", BASE_NS // HOUR_NS)
+
+    (_, path), = log.segments("p1")
+    assert np.array_equal(np.fromfile(path, dtype=SAMPLE_DTYPE), records)
+    index = np.fromfile(path[:-len(".seg")] + ".idx", dtype=[("min", "<i8"), ("max", "<i8")])
+    assert np.array_equal(index["min"], records["timestamp"][::INDEX_INTERVAL])
+    start_ns, end_ns = records["timestamp"][5000], records["timestamp"][6000]
+    assert np.array_equal(log.query("p1", start_ns, end_ns), records[5000:6000])
+
+    log.append("p1", frames(BASE_NS + HOUR_NS - PERIOD_NS, 1))  # Appends still work after compaction
+    log.close()
+    assert len(log.query("p1", BASE_NS, BASE_NS + HOUR_NS)) == len(records) + 1
+
+def test_compact_command_skips_the_current_hour(tmp_path, monkeypatch, capsys):
+    import segment_log
+    log = SegmentLog(str(tmp_path), "frames")
+    now_ns = BASE_NS + 5 * HOUR_NS + 10**9
+    for hour in (2, 4, 5):
+        log.append("p1", frames(BASE_NS + hour * HOUR_NS, 100)[::-1])
+    log.close()
+    monkeypatch.setattr(segment_log.time, "time_ns", lambda: now_ns)
+    monkeypatch.setattr("sys.argv", ["segment_log.py", "compact", str(tmp_path)])
+    segment_log.main()
+    assert capsys.readouterr().out.count("compacted") == 1
+    segments = dict(log.segments("p1"))
+    assert np.array_equal(np.fromfile(segments[BASE_NS // HOUR_NS + 4], dtype=SAMPLE_DTYPE), frames(BASE_NS + 4 * HOUR_NS, 100))
+    for hour in (2, 5):
+        assert np.array_equal(np.fromfile(segments[BASE_NS // HOUR_NS + hour], dtype=SAMPLE_DTYPE), frames(BASE_NS + hour * HOUR_NS, 100)[::-1])
@@ -0,0 +1,252 @@
+"""
+Trains the seizure RandomForest on the CHB-MIT CSV and writes a versioned model artifact.
+
+    python train_model.py datasets/chbmit_preprocessed_data.csv
+    python train_model.py datasets/chbmit_preprocessed_data.csv --trees 200 --max-samples 0.25 --npz
+
+The Outcome labels come from the dataset's label cache (dataset.py) and the features from
+a cache under datasets/features/ named by the dataset's content hash, built in chunks from
+the binary channel cache. All of them are built once per CSV version and are mapped rather
+than loaded, so retraining never parses the CSV again or holds a DataFrame of it. Trees are
+fitted in parallel threads (one per core by default) that share the mapped arrays; memory
+beyond the page cache is a few bytes per row per tree being fitted.
+
+Writes models/EE_model-<version>.pkl and models/EE_model-<version>.json (parameters,
+dataset fingerprint, class counts, hold-out metrics, timings) and then atomically replaces
+EE_model.pkl, which running apps pick up through the model registry. --no-publish only
+writes the versioned files.
+"""
+import argparse
+import json
+import os
+import pickle
+import platform
+import shutil
+import time
+from datetime import datetime, timezone
+import numpy as np
+from dataset import (ensure_cache, ensure_labels, cache_paths, label_cache_paths, fingerprint, replacing, build_lock,
+                     LABEL_COLUMN, CHUNK_ROWS)
+from inference import CHANNELS, predict_batch
+from model_registry import DEFAULT_MODEL_PATH
+
+MODEL_DIR = os.getenv("MODEL_DIR", "models")
+# Label 0 means seizure (see app.py); hold-out precision/recall are reported for it
+SEIZURE_LABEL = 0
+# Same seed as the original EE_model.pkl
+RANDOM_STATE = 42
+EVAL_CHUNK_ROWS = 65536
+# Channel values are volts (~1e-4), so most gaps between them are below sklearn's 1e-7 split
+# resolution and trees fitted on them barely split. Trees are fitted on values scaled by a
+# power of two (exact in float32) and their thresholds are scaled back afterwards, so the
+# saved model still takes raw values.
+FEATURE_SCALE = 2.0 ** 20
+
+def load_feature_cache(stem, source, shape):
+    """
+    Maps the feature cache at stem if it was built from this version of the dataset, else None.
+    """
+    try:
+        with open(stem + ".json") as f:
+            index = json.load(f)
+        if index["source"] == source and index["rows"] == shape[0]:
+            if not shape[0]:
+                return np.empty(shape, dtype="<f4")
+            return np.memmap(stem + ".f32", dtype="<f4", mode="r", shape=shape)
+    except (OSError, ValueError, KeyError):
+        pass
+    return None
+
+def feature_cache(csv_path, cache_dir=None):
+    """
+    Maps the (rows, 8) float32 training features of a CSV, writing them in chunks from the
+    binary channel cache on first use. Files are named by the dataset's content hash, so a
+    changed CSV gets a fresh cache and stale ones can simply be deleted.
+    """
+    data = ensure_cache(csv_path)
+    source = fingerprint(csv_path)
+    cache_dir = cache_dir or os.path.join(os.path.dirname(csv_path), "features")
+    stem = os.path.join(cache_dir, f"{source['sha256'][:16]}-{source['size']}-scale{int(np.log2(FEATURE_SCALE))}")
+    features = load_feature_cache(stem, source, data.shape)
+    if features is not None:
+        return features
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with build_lock(stem):
+        features = load_feature_cache(stem, source, data.shape)  # Another process may have built it meanwhile
+        if features is None:
+            with replacing(stem + ".f32", "wb") as f:
+                for start in range(0, len(data), CHUNK_ROWS):
+                    f.write((data[start:start + CHUNK_ROWS] * np.float32(FEATURE_SCALE)).tobytes())
+            with replacing(stem + ".json", "w") as f:
+                json.dump({"source": source, "rows": len(data), "channels": CHANNELS, "scale": FEATURE_SCALE}, f)
+            features = load_feature_cache(stem, source, data.shape)
+    if features is None:
+        raise OSError(f"the feature cache {stem}.f32 doesn't load even after a rebuild")
+    return features
+
+def load_training_data(csv_path, cache_dir=None):
+    """
+    Returns the mapped (rows, 8) scaled features and (rows,) int32 labels, building their
+    caches first if they are missing or stale.
+    """
+    y = ensure_labels(csv_path)
+    if not len(y):
+        raise ValueError(f"{csv_path} has no rows")
+    X = feature_cache(csv_path, cache_dir)
+    if len(X) != len(y):
+        raise ValueError(f"{len(X)} channel rows but {len(y)} labels in {csv_path}")
+    return X, y
+
+def unscale_thresholds(model, scale=FEATURE_SCALE):
+    """
+    Rescales every split threshold in place so the forest takes unscaled inputs. Dividing
+    by a power of two is exact, so predictions match the scaled model bit for bit.
+    """
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        tree.threshold[tree.children_left >= 0] /= scale
+
+def evaluate(model, X, y):
+    """
+    Hold-out metrics, predicting in chunks so only the labels and seizure scores of the
+    hold-out rows are held in memory.
+    """
+    from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score
+
+    if not len(y):
+        return {}
+    predictions = np.empty(len(y), dtype=model.classes_.dtype)
+    scores = np.empty(len(y))
+    column = list(model.classes_).index(SEIZURE_LABEL) if SEIZURE_LABEL in model.classes_ else None
+    for start in range(0, len(y), EVAL_CHUNK_ROWS):
+        stop = min(start + EVAL_CHUNK_ROWS, len(y))
+        predictions[start:stop], proba = predict_batch(model, X[start:stop])
+        scores[start:stop] = proba[:, column] if column is not None else np.nan
+    y = np.asarray(y)
+    result = {"accuracy": accuracy_score(y, predictions)}
+    for name, metric in [("precision", precision_score), ("recall", recall_score), ("f1", f1_score)]:
+        result[name] = metric(y, predictions, pos_label=SEIZURE_LABEL, zero_division=0)
+    if column is not None and len(np.unique(y)) == 2:
+        result["roc_auc"] = roc_auc_score(y == SEIZURE_LABEL, scores)
+    return {name: float(value) for name, value in result.items()}
+
+def train(csv_path, trees=100, jobs=-1, max_samples=None, max_depth=None, holdout=0.2,
+          random_state=RANDOM_STATE, verbose=0, cache_dir=None):
+    """
+    Fits the forest on all but the last `holdout` fraction of the rows and evaluates it on
+    those. Neighbouring samples are near-duplicates, so a random split would leak; the tail
+    split also keeps the training rows a zero-copy slice of the mapped cache.
+    Returns (model, metadata).
+    """
+    import sklearn
+    from sklearn.ensemble import RandomForestClassifier
+
+    start_time = time.perf_counter()
+    X, y = load_training_data(csv_path, cache_dir)
+    load_seconds = time.perf_counter() - start_time
+    split = len(X) - int(len(X) * holdout)
+    if split == 0:
+        raise ValueError("no rows left to train on")
+
+    model = RandomForestClassifier(n_estimators=trees, n_jobs=jobs, max_samples=max_samples,
+                                   max_depth=max_depth, random_state=random_state, verbose=verbose)
+    fit_start = time.perf_counter()
+    model.fit(X[:split], y[:split])
+    fit_seconds = time.perf_counter() - fit_start
+    unscale_thresholds(model)
+    # Serving predicts small batches, where fanning out to threads only adds overhead
+    model.set_params(n_jobs=None, verbose=0)
+
+    eval_start = time.perf_counter()
+    # Evaluated on the raw channels, exactly as the apps will call it
+    metrics = evaluate(model, ensure_cache(csv_path)[split:], y[split:])
+    eval_seconds = time.perf_counter() - eval_start
+
+    source = fingerprint(csv_path)
+    created = datetime.now(timezone.utc)
+    classes, counts = np.unique(y[:split], return_counts=True)
+    metadata = {
+        "version": f"{created:%Y%m%d-%H%M%S}-{source['sha256'][:8]}",
+        "created": created.isoformat(),
+        "dataset": os.path.abspath(csv_path),
+        "dataset_fingerprint": source,
+        "channels": CHANNELS,
+        "label_column": LABEL_COLUMN,
+        "classes": model.classes_.tolist(),
+        "class_counts": {str(label): int(count) for label, count in zip(classes, counts)},
+        "feature_scale": FEATURE_SCALE,
+        "rows": len(X),
+        "train_rows": split,
+        "holdout_rows": len(X) - split,
+        "params": {**model.get_params(), "n_jobs": jobs},
+        "cpus": os.cpu_count(),
+        "metrics": metrics,
+        "load_seconds": load_seconds,
+        "fit_seconds": fit_seconds,
+        "eval_seconds": eval_seconds,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "sklearn": sklearn.__version__,
+    }
+    return model, metadata
+
+def save_artifact(model, metadata, model_dir=MODEL_DIR, publish=None, npz=False):
+    """
+    Writes <model_dir>/EE_model-<version>.pkl/.json (and .npz for the flat evaluator), then
+    optionally replaces `publish` with the new pickle. Every file is written to a temporary
+    name and renamed, so a hot-swapping reader never sees half a model.
+    Returns the versioned pickle's path.
+    """
+    os.makedirs(model_dir, exist_ok=True)
+    stem = os.path.join(model_dir, f"EE_model-{metadata['version']}")
+    with open(stem + ".pkl.tmp", "wb") as f:
+        pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(stem + ".pkl.tmp", stem + ".pkl")
+    if npz:
+        from forest import export_forest
+        export_forest(model, stem + ".tmp.npz")
+        os.replace(stem + ".tmp.npz", stem + ".npz")
+    with open(stem + ".json.tmp", "w") as f:
+        json.dump({**metadata, "artifact": os.path.abspath(stem + ".pkl")}, f, indent=2)
+    os.replace(stem + ".json.tmp", stem + ".json")
+    if publish:
+        shutil.copyfile(stem + ".pkl", publish + ".tmp")
+        os.replace(publish + ".tmp", publish)
+    return stem + ".pkl"
+
+def parse_max_samples(value):
+    # A fraction of the training rows per tree, or an absolute row count
+    return float(value) if "." in value else int(value)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("csv", help=f"dataset CSV with the {len(CHANNELS)} channel columns and {LABEL_COLUMN}")
+    parser.add_argument("--trees", type=int, default=100)
+    parser.add_argument("--jobs", type=int, default=-1, help="trees fitted in parallel; -1 uses every core")
+    parser.add_argument("--max-samples", type=parse_max_samples, default=None,
+                        help="bootstrap rows per tree (fraction or count); bounds per-tree time and memory")
+    parser.add_argument("--max-depth", type=int, default=None)
+    parser.add_argument("--holdout", type=float, default=0.2, help="fraction of rows, from the end, kept for evaluation")
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--cache-dir", help="feature cache directory (default: features/ next to the CSV)")
+    parser.add_argument("--publish", default=DEFAULT_MODEL_PATH, help="model file the apps load")
+    parser.add_argument("--no-publish", action="store_true")
+    parser.add_argument("--npz", action="store_true", help="also export the flat forest for NumPy-only serving")
+    parser.add_argument("--verbose", type=int, default=0)
+    args = parser.parse_args()
+
+    if not os.path.exists(cache_paths(args.csv)[0]) or not os.path.exists(label_cache_paths(args.csv)[0]):
+        print("Building the binary dataset caches (once per CSV version)...")
+    model, metadata = train(args.csv, args.trees, args.jobs, args.max_samples, args.max_depth, args.holdout,
+                            verbose=args.verbose, cache_dir=args.cache_dir)
+    path = save_artifact(model, metadata, args.model_dir, None if args.no_publish else args.publish, args.npz)
+
+    print(f"Trained {args.trees} trees on {metadata['train_rows']:,} rows in {metadata['fit_seconds']:.2f} s "
+          f"({metadata['cpus']} CPUs; loading took {metadata['load_seconds']:.2f} s)")
+    if metadata["metrics"]:
+        print("Hold-out: " + ", ".join(f"{name} {value:.4f}" for name, value in metadata["metrics"].items()))
+    print(f"Wrote {path}" + ("" if args.no_publish else f" and published it to {args.publish}"))
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+from lookup import ReferenceIndex
+
 seiz = [
     [0.000023200000000, 0.000022500000000, -0.000002540000000, 0.000034200000000, 0.000036900000000, -0.000009180000000, 0.000043200000000],
     [0.000027900000000, 0.000019700000000, -0.000004490000000, 0.000036100000000, 0.000033000000000, -0.000009960000000, 0.000049400000000],
@@ -54,8 +56,26 @@ no_seiz = [
 ]
 
 
+_no_seiz_index = None
+
+def no_seiz_index():
+    """
+    Hashed/KD-tree index over no_seiz, built on first use.
+    """
+    global _no_seiz_index
+    if _no_seiz_index is None:
+        _no_seiz_index = ReferenceIndex(no_seiz)
+    return _no_seiz_index
+
+def predict_seizure_batch(inputs, tolerance=None):
+    """
+    Vectorized predict_seizure: 1 for rows found in no_seiz, 0 otherwise. Without a tolerance
+    rows must match on the 1e-9 grid; with one, the nearest no_seiz row must lie within it.
+    """
+    if tolerance is None:
+        return no_seiz_index().contains(inputs).astype(int)
+    _, indices = no_seiz_index().nearest(inputs, tolerance)
+    return (indices >= 0).astype(int)
+
 def predict_seizure(input_data):
-    if input_data in no_seiz:
-        return 1  
-    else:
-        return 0  
\ No newline at end of file
+    return int(predict_seizure_batch([input_data])[0])  
\ No newline at end of file
@@ -0,0 +1,100 @@
+import asyncio
+import threading
+import time
+from history import PatientHistories
+
+class ResultStore:
+    """
+    Thread-safe in-memory store the background worker publishes into and the Streamlit pages
+    read from. Reads return copies, so a rerun never sees a half-written update. Results are
+    kept as compact records in a bounded ring buffer per patient (see history.py).
+    """
+    def __init__(self, capacity=10_000, spill_dir=None):
+        self._lock = threading.Lock()
+        self.version = 0  # bumped on every publish, so pages can skip re-rendering unchanged data
+        self.latest_samples = {}
+        self.latest_features = {}
+        self.results = PatientHistories(capacity, spill_dir)
+        self.stream_stats = {}
+        self.model_stats = None
+        self.error = None
+
+    def publish_results(self, patient_id, sample, records):
+        with self._lock:
+            self.latest_samples[patient_id] = sample
+            self.results.extend(patient_id, records)
+            self.version += 1
+
+    def publish_features(self, patient_id, features):
+        with self._lock:
+            self.latest_features[patient_id] = features
+            self.version += 1
+
+    def publish_stats(self, stats, model_stats=None):
+        with self._lock:
+            self.stream_stats = {patient_id: s.as_dict() for patient_id, s in stats.items()}
+            self.model_stats = model_stats
+
+    def publish_error(self, error):
+        with self._lock:
+            self.error = error
+            self.version += 1
+
+    def clear_error(self):
+        self.publish_error(None)
+
+    def snapshot(self, max_results=10):
+        """
+        Copies the current state; only the latest max_results records per patient are copied,
+        newest first.
+        """
+        with self._lock:
+            return {
+                "version": self.version,
+                "latest_samples": dict(self.latest_samples),
+                "latest_features": dict(self.latest_features),
+                "results": self.results.latest(max_results),
+                "stream_stats": dict(self.stream_stats),
+                "model_stats": self.model_stats,
+                "error": self.error,
+            }
+
+class BackgroundWorker:
+    """
+    Runs one coroutine at a time on a long-lived event loop in a daemon thread, independent
+    of Streamlit script reruns. Meant to be created once per process (st.cache_resource).
+    """
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="prediction-worker", daemon=True)
+        self.thread.start()
+        self._future = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._future is not None and not self._future.done()
+
+    def start(self, coroutine_function, *args):
+        """
+        Starts coroutine_function(*args) on the worker loop unless something is already running.
+        Returns True if it was started.
+        """
+        with self._lock:
+            if self.running:
+                return False
+            self._future = asyncio.run_coroutine_threadsafe(coroutine_function(*args), self.loop)
+            return True
+
+    def stop(self, timeout=5.0):
+        """
+        Cancels the running coroutine and waits for it to unwind.
+        """
+        with self._lock:
+            future = self._future
+        if future is None or future.done():
+            return
+        future.cancel()
+        deadline = time.monotonic() + timeout
+        while not future.done() and time.monotonic() < deadline:
+            time.sleep(0.01)